@@ -1,22 +1,28 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from app.models.schema import GenerationRequest, GenerationResponse, GenerationStatus, ErrorResponse
 from app.services.redis import RedisService
 from app.services.fal_client import FalAIClient
 from app.services.queue_service import QueueService
+from app.services.generation_store import GenerationStore, TERMINAL_STATUSES
+from app.services.events import EventHub, LatestRecords
+from app.services.poll_schedule import LatencyTracker, next_poll_delay
 from app.core.config import get_settings
+from app.core.compression import EncodedBody, encoded_response
+from collections import OrderedDict
 from datetime import datetime
+import asyncio
 import uuid
-import logging
+import time
 import json
+import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-
-def serialize_for_redis(data):
-    """Convert data to JSON-serializable format"""
-    return json.loads(json.dumps(data, default=str))
+# request_id -> (record, rendered response) for completed / failed generations
+_terminal_responses: "OrderedDict[str, tuple]" = OrderedDict()
 
 
 @router.post(
@@ -52,21 +58,9 @@ async def generate_content_async(
         redis: RedisService = request.app.state.redis
         fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
 
-        # Get all models to validate
-        cache_key = "fal:models:all"
-        cached_models = await redis.get(cache_key)
-
-        if not cached_models:
-            # Fetch models if not cached
-            models = await fal_client._get_models_list()
-            if not models:
-                raise HTTPException(status_code=500, detail="Unable to fetch models from Fal.ai")
-            await redis.set(cache_key, serialize_for_redis(models), ttl=settings.CACHE_TTL_MODELS)
-        else:
-            models = cached_models
-
-        # Validate model exists
-        model_info = fal_client.get_model_info(gen_request.model_id, models)
+        # Validate model exists (indexed per-process catalog)
+        catalog = await request.app.state.catalog.get_catalog()
+        model_info = catalog.get(gen_request.model_id)
         if not model_info:
             raise HTTPException(
                 status_code=400,
@@ -75,6 +69,12 @@ async def generate_content_async(
 
         logger.info(f"Submitting async generation to {gen_request.model_id}")
 
+        # Predict completion time from latency history / catalog estimate
+        expected_duration = await LatencyTracker(redis).estimate(
+            gen_request.model_id,
+            model_info.get("metadata", {}).get("duration_estimate")
+        )
+
         # Submit to Fal.ai Queue API
         try:
             fal_response = await fal_client.submit_request(
@@ -82,10 +82,12 @@ async def generate_content_async(
                 input_data={
                     "prompt": gen_request.prompt,
                     **gen_request.parameters
-                }
+                },
+                webhook_url=settings.FAL_WEBHOOK_URL
             )
 
-            # Store request metadata in Redis
+            # Store request metadata in Redis and link the Fal.ai id right away:
+            # until the link exists, the webhook answers 404 and Fal.ai retries
             request_data = {
                 "request_id": request_id,
                 "model_id": gen_request.model_id,
@@ -97,14 +99,22 @@ async def generate_content_async(
                 "result": None,
                 "error": None,
                 "fal_request_id": fal_response.get("request_id"),
-                "queue_position": fal_response.get("queue_position")
+                "queue_position": fal_response.get("queue_position"),
+                "expected_duration": expected_duration,
+                "webhook": bool(settings.FAL_WEBHOOK_URL)
             }
 
-            await redis.set(
-                f"generation:{request_id}",
-                serialize_for_redis(request_data),
-                ttl=86400  # 24 hours
-            )
+            store = GenerationStore(redis)
+            await store.save(request_data)
+            if settings.FAL_WEBHOOK_URL:
+                await store.link_fal_request(fal_response.get("request_id"), request_id)
+
+            # Completion arrives via webhook when configured; the central status
+            # poller checks near the ETA, or only sweeps for missed callbacks
+            first_poll = next_poll_delay(0, expected_duration)
+            if settings.FAL_WEBHOOK_URL:
+                first_poll += settings.FAL_WEBHOOK_SWEEP_INTERVAL
+            await store.track(request_id, time.time() + first_poll)
 
             logger.info(
                 f"Generation request {request_id} submitted to Fal.ai "
@@ -163,20 +173,9 @@ async def generate_content_sync(
         redis: RedisService = request.app.state.redis
         fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
 
-        # Get models for validation
-        cache_key = "fal:models:all"
-        cached_models = await redis.get(cache_key)
-
-        if not cached_models:
-            models = await fal_client._get_models_list()
-            if not models:
-                raise HTTPException(status_code=500, detail="Unable to fetch models")
-            await redis.set(cache_key, serialize_for_redis(models), ttl=settings.CACHE_TTL_MODELS)
-        else:
-            models = cached_models
-
-        # Validate model exists
-        model_info = fal_client.get_model_info(gen_request.model_id, models)
+        # Validate model exists (indexed per-process catalog)
+        catalog = await request.app.state.catalog.get_catalog()
+        model_info = catalog.get(gen_request.model_id)
         if not model_info:
             raise HTTPException(
                 status_code=400,
@@ -210,11 +209,7 @@ async def generate_content_sync(
                 "queue_position": None
             }
 
-            await redis.set(
-                f"generation:{request_id}",
-                serialize_for_redis(request_data),
-                ttl=86400
-            )
+            await GenerationStore(redis).save(request_data)
 
             logger.info(f"Sync generation completed: {request_id}")
 
@@ -246,11 +241,7 @@ async def generate_content_sync(
                 "queue_position": None
             }
 
-            await redis.set(
-                f"generation:{request_id}",
-                serialize_for_redis(request_data),
-                ttl=86400
-            )
+            await GenerationStore(redis).save(request_data)
 
             raise HTTPException(
                 status_code=500,
@@ -267,13 +258,92 @@ async def generate_content_sync(
         )
 
 
+def build_status_response(request_data: dict) -> GenerationResponse:
+    """Convert a stored generation record into a GenerationResponse"""
+    request_data = dict(request_data)
+
+    # Ensure status is properly set
+    status_str = request_data.get("status", "queued")
+    if isinstance(status_str, str):
+        try:
+            request_data["status"] = GenerationStatus(status_str)
+        except ValueError:
+            request_data["status"] = GenerationStatus.QUEUED
+
+    # Parse datetime strings
+    if isinstance(request_data.get("created_at"), str):
+        try:
+            request_data["created_at"] = datetime.fromisoformat(
+                request_data["created_at"].replace("Z", "+00:00")
+            )
+        except:
+            request_data["created_at"] = datetime.utcnow()
+
+    if request_data.get("completed_at") and isinstance(request_data["completed_at"], str):
+        try:
+            request_data["completed_at"] = datetime.fromisoformat(
+                request_data["completed_at"].replace("Z", "+00:00")
+            )
+        except:
+            request_data["completed_at"] = None
+
+    return GenerationResponse(**request_data)
+
+
+def terminal_response_body(request_id: str, request_data: dict) -> EncodedBody:
+    """
+    Rendered (and lazily compressed) status response for a finished generation
+
+    Completed and failed records are read many times but no longer change,
+    so their response is built once per process and reused while the
+    stored record stays the same (LRU, GENERATION_RESPONSE_MEMO_SIZE).
+    """
+    cached = _terminal_responses.get(request_id)
+    if cached is not None and cached[0] == request_data:
+        _terminal_responses.move_to_end(request_id)
+        return cached[1]
+
+    body = EncodedBody(build_status_response(request_data).model_dump_json().encode("utf-8"))
+    _terminal_responses[request_id] = (request_data, body)
+    _terminal_responses.move_to_end(request_id)
+    while len(_terminal_responses) > settings.GENERATION_RESPONSE_MEMO_SIZE:
+        _terminal_responses.popitem(last=False)
+    return body
+
+
+async def _wait_for_status_change(queue: asyncio.Queue, request_data: dict, wait: float) -> dict:
+    """
+    Block until a record with a different status arrives on the watch
+    queue (or `wait` seconds pass) and return the latest record seen
+    """
+    initial_status = request_data.get("status")
+    if initial_status in TERMINAL_STATUSES:
+        return request_data
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while request_data.get("status") == initial_status:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            request_data = await asyncio.wait_for(queue.get(), timeout=remaining)
+        except asyncio.TimeoutError:
+            break
+    return request_data
+
+
 @router.get(
     "/status/{request_id}",
     response_model=GenerationResponse,
     summary="Check generation status",
     description="Get the current status and result of a generation request"
 )
-async def check_status(request: Request, request_id: str):
+async def check_status(
+    request: Request,
+    request_id: str,
+    wait: int = Query(0, ge=0, le=60, description="Seconds to wait for a status change (long-poll)")
+):
     """
     Check generation request status
 
@@ -283,52 +353,201 @@ async def check_status(request: Request, request_id: str):
     - error: Error message (if failed)
     - queue_position: Current position (if queued)
 
+    Prefer /status/{request_id}/stream or the /status/ws WebSocket to get
+    updates pushed instead of polling. Clients that can't use either can
+    long-poll with `wait`: the call then blocks until the status changes
+    (or `wait` seconds pass) and returns the latest record.
+
     - **request_id**: Request ID from /generate endpoint
+    - **wait**: Seconds to wait for a status change (0-60, default 0)
     """
     try:
         redis: RedisService = request.app.state.redis
+        events: EventHub = request.app.state.events
+        queue = events.watch(request_id) if wait else None
 
-        # Get request data from Redis
-        request_data = await redis.get(f"generation:{request_id}")
-
-        if not request_data:
-            # Check with Fal.ai directly if stored
-            raise HTTPException(
-                status_code=404,
-                detail=f"Request '{request_id}' not found"
-            )
-
-        # Ensure status is properly set
-        status_str = request_data.get("status", "queued")
-        if isinstance(status_str, str):
-            try:
-                request_data["status"] = GenerationStatus(status_str)
-            except ValueError:
-                request_data["status"] = GenerationStatus.QUEUED
-
-        # Parse datetime strings
-        if isinstance(request_data.get("created_at"), str):
-            try:
-                request_data["created_at"] = datetime.fromisoformat(
-                    request_data["created_at"].replace("Z", "+00:00")
+        try:
+            # Get request data from Redis
+            request_data = await GenerationStore(redis).get(request_id)
+
+            if not request_data:
+                # Check with Fal.ai directly if stored
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Request '{request_id}' not found"
                 )
-            except:
-                request_data["created_at"] = datetime.utcnow()
 
-        if request_data.get("completed_at") and isinstance(request_data["completed_at"], str):
-            try:
-                request_data["completed_at"] = datetime.fromisoformat(
-                    request_data["completed_at"].replace("Z", "+00:00")
-                )
-            except:
-                request_data["completed_at"] = None
+            if queue is not None:
+                request_data = await _wait_for_status_change(queue, request_data, wait)
+        finally:
+            if queue is not None:
+                events.unwatch(request_id, queue)
 
-        logger.debug(f"Status check for {request_id}: {request_data['status']}")
+        logger.debug(f"Status check for {request_id}: {request_data.get('status')}")
 
-        return GenerationResponse(**request_data)
+        if request_data.get("status") in TERMINAL_STATUSES:
+            body = terminal_response_body(request_id, request_data)
+            return await encoded_response(body, body.encoding_for(request.headers.get("accept-encoding")))
+        return build_status_response(request_data)
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error checking status: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to check status: {str(e)}")
+
+
+@router.get(
+    "/status/{request_id}/stream",
+    summary="Stream generation status (SSE)",
+    description="Server-sent events stream of status updates until the request completes or fails"
+)
+async def stream_status(request: Request, request_id: str):
+    """
+    Stream generation status updates as server-sent events
+
+    Sends the current record immediately, then one `status` event per
+    change, and closes once the request is completed or failed. A comment
+    line is sent every STATUS_STREAM_KEEPALIVE seconds to keep proxies from
+    timing out the connection.
+
+    - **request_id**: Request ID from /generate endpoint
+    """
+    events: EventHub = request.app.state.events
+    store = GenerationStore(request.app.state.redis)
+
+    # Subscribe before reading so no update between the read and the watch is lost
+    queue = events.watch(request_id)
+    request_data = await store.get(request_id)
+    if not request_data:
+        events.unwatch(request_id, queue)
+        raise HTTPException(status_code=404, detail=f"Request '{request_id}' not found")
+
+    async def event_stream():
+        current = request_data
+        try:
+            yield f"event: status\ndata: {build_status_response(current).model_dump_json()}\n\n"
+            while current.get("status") not in TERMINAL_STATUSES:
+                try:
+                    current = await asyncio.wait_for(queue.get(), timeout=settings.STATUS_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: status\ndata: {build_status_response(current).model_dump_json()}\n\n"
+        finally:
+            events.unwatch(request_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/status/ws")
+async def watch_status(websocket: WebSocket):
+    """
+    Multiplexed status updates over one WebSocket
+
+    Client messages:
+    - `{"action": "watch", "request_ids": ["req_..."]}`
+    - `{"action": "unwatch", "request_ids": ["req_..."]}`
+
+    For every watched request the server sends the current record, then
+    each update, as `{"type": "status", "data": {...GenerationResponse}}`.
+    Requests are unwatched automatically once completed or failed; unknown
+    ids get `{"type": "error", "request_id": ..., "message": ...}`, and
+    malformed messages `{"type": "error", "message": ...}` (the connection
+    stays open).
+    """
+    await websocket.accept()
+    events: EventHub = websocket.app.state.events
+    store = GenerationStore(websocket.app.state.redis)
+    # Latest record per request: a busy request can't push out another's final one
+    queue = LatestRecords()
+    watched = set()
+
+    def unwatch(request_id: str):
+        if request_id in watched:
+            watched.discard(request_id)
+            events.unwatch(request_id, queue)
+
+    async def send_updates():
+        try:
+            while True:
+                request_data = await queue.get()
+                if request_data.get("request_id") not in watched:
+                    continue
+                await websocket.send_json({
+                    "type": "status",
+                    "data": json.loads(build_status_response(request_data).model_dump_json())
+                })
+                if request_data.get("status") in TERMINAL_STATUSES:
+                    unwatch(request_data["request_id"])
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            # Don't leave the client connected without updates
+            logger.error(f"Error sending status updates, closing WebSocket: {e}", exc_info=True)
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+    sender = asyncio.create_task(send_updates())
+    try:
+        while True:
+            try:
+                # KeyError: a binary frame
+                message = json.loads(await websocket.receive_text())
+            except (KeyError, ValueError):
+                await websocket.send_json({"type": "error", "message": "Invalid JSON message"})
+                continue
+            request_ids = None
+            if isinstance(message, dict):
+                request_ids = message.get("request_ids") or []
+            if not isinstance(request_ids, list) or not all(isinstance(i, str) for i in request_ids):
+                await websocket.send_json({
+                    "type": "error",
+                    "message": 'Expected {"action": ..., "request_ids": [...]}'
+                })
+                continue
+            action = message.get("action")
+
+            if action == "watch":
+                for request_id in request_ids:
+                    if request_id in watched:
+                        continue
+                    if len(watched) >= settings.STATUS_WS_MAX_WATCHES:
+                        await websocket.send_json({
+                            "type": "error",
+                            "request_id": request_id,
+                            "message": f"Too many watched requests (max {settings.STATUS_WS_MAX_WATCHES})"
+                        })
+                        continue
+                    watched.add(request_id)
+                    events.watch(request_id, queue)
+                    request_data = await store.get(request_id)
+                    if not request_data:
+                        unwatch(request_id)
+                        await websocket.send_json({
+                            "type": "error",
+                            "request_id": request_id,
+                            "message": f"Request '{request_id}' not found"
+                        })
+                        continue
+                    await queue.put(request_data)
+            elif action == "unwatch":
+                for request_id in request_ids:
+                    unwatch(request_id)
+            else:
+                await websocket.send_json({"type": "error", "message": f"Unknown action '{action}'"})
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        for request_id in list(watched):
+            unwatch(request_id)
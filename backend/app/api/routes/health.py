@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, Request
 from app.services.redis import RedisService
 from app.services.queue_service import QueueService
 from app.core.config import get_settings
-import httpx
+from app.core.connection_pool import get_http_session
+import aiohttp
 
 router = APIRouter()
 settings = get_settings()
@@ -35,12 +36,11 @@ async def health_check(request: Request):
 
     # Check Fal.ai API
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.FAL_API_BASE_URL}/",
-                timeout=5.0
-            )
-            health_status["checks"]["fal_api"] = "reachable" if response.status_code < 500 else "degraded"
+        async with get_http_session().get(
+            f"{settings.FAL_API_BASE_URL}/",
+            timeout=aiohttp.ClientTimeout(total=5)
+        ) as response:
+            health_status["checks"]["fal_api"] = "reachable" if response.status < 500 else "degraded"
     except Exception as e:
         health_status["status"] = "degraded"
         health_status["checks"]["fal_api"] = f"unreachable: {str(e)}"
@@ -64,7 +64,8 @@ async def get_metrics(request: Request):
             "queue": metrics,
             "system": {
                 "max_concurrent": settings.MAX_CONCURRENT_REQUESTS,
-                "rate_limit": settings.RATE_LIMIT_PER_MINUTE
+                "rate_limit": settings.RATE_LIMIT_PER_MINUTE,
+                "rate_limit_tiers": settings.RATE_LIMIT_TIERS
             }
         }
     except Exception as e:
@@ -1,20 +1,66 @@
-from fastapi import APIRouter, Query, HTTPException, Request
-from typing import Optional, List
-from app.services.fal_client import FalAIClient
-from app.services.redis import RedisService
-from app.models.schema import ModelInfo, ModelsListResponse
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Optional, Dict
+from app.services.catalog import CatalogService
+from app.services.model_catalog import ModelCatalog, LITE_FIELDS, project_model
+from app.core.compression import EncodedBody, encoded_response
 from app.core.config import get_settings
+import hashlib
 import logging
-import json
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def serialize_models(models: List[dict]) -> List[dict]:
-    """Convert model dicts to JSON-serializable format"""
-    return json.loads(json.dumps(models, default=str))
+async def _json(request: Request, body: EncodedBody, headers: Dict[str, str]) -> Response:
+    """
+    Serve a pre-rendered body, precompressed if the client accepts it
+
+    Each encoding is a different representation, so it gets its own ETag
+    (suffixed with the coding). Content-Length is set from the bytes sent.
+    """
+    encoding = body.encoding_for(request.headers.get("accept-encoding"))
+    headers = dict(headers, Vary="Accept-Encoding")
+    if encoding:
+        headers["ETag"] = f'{headers["ETag"][:-1]}-{encoding}"'
+    not_modified = _not_modified(request, headers)
+    if not_modified:
+        return not_modified
+    return await encoded_response(body, encoding, headers)
+
+
+def _cache_headers(request: Request, catalog: ModelCatalog, surrogate_key: str) -> Dict[str, str]:
+    """
+    HTTP caching headers for a response derived from `catalog`
+
+    The strong ETag is the catalog version plus a hash of path and query:
+    the same request against the same version always renders the same
+    bytes. Surrogate-Key lets a CDN purge everything from one version
+    (catalog-v{n}), one route, or the whole catalog.
+    """
+    digest = hashlib.md5(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return {
+        "ETag": f'"v{catalog.version}-{digest}"',
+        "Cache-Control": (
+            f"public, max-age={settings.CATALOG_HTTP_MAX_AGE}, "
+            f"s-maxage={settings.CATALOG_HTTP_SHARED_MAX_AGE}, "
+            f"stale-while-revalidate={settings.CATALOG_HTTP_STALE_WHILE_REVALIDATE}"
+        ),
+        "Surrogate-Key": f"catalog catalog-v{catalog.version} {surrogate_key}"
+    }
+
+
+def _not_modified(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """304 response if If-None-Match matches the ETag (weak comparison, RFC 9110), else None"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = headers["ETag"]
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers=headers)
+    return None
 
 
 @router.post(
@@ -30,21 +76,17 @@ async def refresh_models(request: Request):
     and caches it. Useful for keeping the cache up-to-date.
     """
     try:
-        redis: RedisService = request.app.state.redis
-        fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
+        catalog_service: CatalogService = request.app.state.catalog
 
-        # Fetch fresh models from Fal.ai API
-        models = await fal_client._get_models_list()
+        # Fetch fresh models from Fal.ai API and publish them as a new catalog version
+        catalog = await catalog_service.refresh()
 
-        # Cache the models
-        cache_key = "fal:models:all"
-        await redis.set(cache_key, serialize_models(models), ttl=settings.CACHE_TTL_MODELS)
-
-        logger.info(f"Models cache refreshed with {len(models)} models")
+        logger.info(f"Models cache refreshed with {len(catalog)} models")
         return {
             "status": "success",
-            "total_models": len(models),
-            "message": f"Successfully loaded {len(models)} models from Fal.ai"
+            "total_models": len(catalog),
+            "version": catalog.version,
+            "message": f"Successfully loaded {len(catalog)} models from Fal.ai"
         }
     except Exception as e:
         logger.error(f"Error refreshing models: {e}", exc_info=True)
@@ -60,7 +102,9 @@ async def list_models(
     request: Request,
     category: Optional[str] = Query(None, description="Filter by category (e.g., text-to-image)"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of results"),
-    skip: int = Query(0, ge=0, description="Number of results to skip for pagination")
+    skip: int = Query(0, ge=0, description="Number of results to skip for pagination"),
+    view: str = Query("full", pattern="^(full|lite)$", description="'lite' returns only display_name, category, thumbnail_url and pinned"),
+    fields: Optional[str] = Query(None, max_length=500, description="Comma-separated metadata fields to return (e.g. display_name,category)")
 ):
     """
     List all available models
@@ -68,49 +112,37 @@ async def list_models(
     - **category**: Optional category filter
     - **limit**: Maximum results to return (1-100)
     - **skip**: Number of results to skip for pagination
+    - **view**: `full` (default) or `lite` for list views
+    - **fields**: Metadata fields to return; overrides `view`
 
-    Returns paginated list of models with their metadata.
+    Returns paginated list of models with their metadata. endpoint_id is
+    always included; projected models keep the {"endpoint_id", "metadata"} shape.
     """
     try:
-        redis: RedisService = request.app.state.redis
-        cache_key = "fal:models:all"
-
-        # Try to get from cache first
-        cached_models = await redis.get(cache_key)
-
-        if not cached_models:
-            # Fetch from Fal.ai API
-            fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-            models = await fal_client._get_models_list()
-
-            if not models:
-                raise Exception("No models returned from Fal.ai API")
-
-            # Cache for future requests
-            await redis.set(cache_key, serialize_models(models), ttl=settings.CACHE_TTL_MODELS)
-            logger.info(f"Fetched {len(models)} models from API and cached")
-        else:
-            models = cached_models
-            logger.debug("Using cached models list")
-
-        # Filter by category if provided
-        if category:
-            fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-            models = fal_client.get_models_by_category(models, category)
-            logger.info(f"Filtered to {len(models)} models in category '{category}'")
-
-        # Apply pagination
-        total = len(models)
-        paginated_models = models[skip : skip + limit]
-
-        response = {
-            "models": serialize_models(paginated_models),
-            "total": total,
-            "next_cursor": None  # Could implement cursor-based pagination here
-        }
-
-        logger.info(f"Listed {len(paginated_models)} of {total} models (category={category}, skip={skip})")
-        return response
+        catalog = await request.app.state.catalog.get_catalog()
+
+        projection = None
+        if fields:
+            names = (f.strip().removeprefix("metadata.") for f in fields.split(","))
+            projection = tuple(dict.fromkeys(n for n in names if n and n != "endpoint_id"))
+        elif view == "lite":
+            projection = LITE_FIELDS
+
+        def page():
+            # Filter by category if provided (posting list lookup)
+            models = catalog.in_category(category) if category else catalog.models
+            selected = models[skip : skip + limit]
+            if projection is not None:
+                selected = [project_model(model, projection) for model in selected]
+            return {
+                "models": selected,
+                "total": len(models),
+                "next_cursor": None  # Could implement cursor-based pagination here
+            }
+
+        # Each page (and projection of it) is rendered once per catalog version
+        key = ("models", category.lower() if category else None, skip, limit, projection)
+        return await _json(request, catalog.render(key, page), _cache_headers(request, catalog, "models"))
 
     except Exception as e:
         logger.error(f"Error listing models: {e}", exc_info=True)
@@ -130,11 +162,13 @@ async def search_models(
     """
     Search for models
 
-    Searches across:
-    - endpoint_id (highest priority)
+    Searches across (in order of weight):
+    - endpoint_id (an exact match always ranks first)
     - metadata.display_name
-    - metadata.description
     - metadata.tags
+    - metadata.description
+
+    Multi-word queries are supported; the last word also matches as a prefix.
 
     - **q**: Search query (required)
     - **limit**: Maximum results to return (1-100)
@@ -142,46 +176,63 @@ async def search_models(
     Returns matching models sorted by relevance.
     """
     try:
-        redis: RedisService = request.app.state.redis
-        cache_key = f"fal:models:search:{q.lower()}:{limit}"
-
-        # Try cache first
-        cached_results = await redis.get(cache_key)
-        if cached_results:
-            logger.debug(f"Returning cached search results for: {q}")
-            return {"models": cached_results, "total": len(cached_results), "query": q}
-
-        # Get all models
-        cache_key_all = "fal:models:all"
-        cached_models = await redis.get(cache_key_all)
-
-        if not cached_models:
-            # Fetch from API
-            fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-            models = await fal_client._get_models_list()
-            if not models:
-                raise Exception("No models available")
-            await redis.set(cache_key_all, serialize_models(models), ttl=settings.CACHE_TTL_MODELS)
-        else:
-            models = cached_models
-
-        # Perform search
-        fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-        results = fal_client.search_models(query=q, models=models, limit=limit)
-
-        # Cache search results
-        await redis.set(cache_key, serialize_models(results), ttl=3600)  # 1 hour
-
-        response = {"models": serialize_models(results), "total": len(results), "query": q}
-
+        # BM25 over the per-version inverted index; no per-query cache needed
+        catalog = await request.app.state.catalog.get_catalog()
+        headers = _cache_headers(request, catalog, "search")
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+
+        results = catalog.search(q, limit=limit)
         logger.info(f"Search for '{q}' found {len(results)} results")
-        return response
+        return JSONResponse({"models": results, "total": len(results), "query": q}, headers=headers)
 
     except Exception as e:
         logger.error(f"Error searching models: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+@router.get(
+    "/models/suggest",
+    summary="Model typeahead",
+    description="Prefix completions over model endpoint ids, display names and tags"
+)
+async def suggest_models(
+    request: Request,
+    prefix: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    limit: int = Query(8, ge=1, le=20, description="Maximum number of suggestions")
+):
+    """
+    Autocomplete model names
+
+    Served from an in-memory prefix index built once per catalog version,
+    so keystroke traffic never reaches Redis. Bypasses the response cache
+    and rate limiter.
+
+    - **prefix**: Text typed so far (required)
+    - **limit**: Maximum suggestions to return (1-20)
+
+    Returns at most one suggestion per model: whole-name matches first, then
+    endpoint path segments, words inside display names and tags.
+    """
+    try:
+        catalog = await request.app.state.catalog.get_catalog()
+        headers = _cache_headers(request, catalog, "suggest")
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+
+        suggestions = catalog.suggest(prefix, limit=limit)
+        return JSONResponse(
+            {"suggestions": suggestions, "total": len(suggestions), "prefix": prefix},
+            headers=headers
+        )
+
+    except Exception as e:
+        logger.error(f"Error suggesting models: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Suggest failed: {str(e)}")
+
+
 @router.get(
     "/models/categories",
     summary="List model categories",
@@ -194,37 +245,13 @@ async def list_categories(request: Request):
     Returns a sorted list of all unique categories available in the Fal.ai catalog.
     """
     try:
-        redis: RedisService = request.app.state.redis
-        cache_key = "fal:models:categories"
-
-        # Try cache
-        cached_categories = await redis.get(cache_key)
-        if cached_categories:
-            logger.debug("Returning cached categories")
-            return {"categories": cached_categories, "total": len(cached_categories)}
-
-        # Get all models first
-        cache_key_all = "fal:models:all"
-        cached_models = await redis.get(cache_key_all)
-
-        if not cached_models:
-            fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-            models = await fal_client._get_models_list()
-            if not models:
-                raise Exception("No models available")
-            await redis.set(cache_key_all, serialize_models(models), ttl=settings.CACHE_TTL_MODELS)
-        else:
-            models = cached_models
-
-        # Extract categories
-        fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-        categories = fal_client.get_categories(models)
-
-        # Cache categories
-        await redis.set(cache_key, categories, ttl=settings.CACHE_TTL_MODELS)
-
-        logger.info(f"Listed {len(categories)} unique categories")
-        return {"categories": categories, "total": len(categories)}
+        # Sorted category list is precomputed once per catalog version
+        catalog = await request.app.state.catalog.get_catalog()
+        body = catalog.render(
+            ("categories",),
+            lambda: {"categories": catalog.categories, "total": len(catalog.categories)}
+        )
+        return await _json(request, body, _cache_headers(request, catalog, "categories"))
 
     except Exception as e:
         logger.error(f"Error listing categories: {e}", exc_info=True)
@@ -245,41 +272,16 @@ async def get_model(request: Request, model_id: str):
     Returns complete model information including metadata, description, tags, etc.
     """
     try:
-        redis: RedisService = request.app.state.redis
-        cache_key = f"fal:models:detail:{model_id}"
-
-        # Check cache first
-        cached_model = await redis.get(cache_key)
-        if cached_model:
-            logger.debug(f"Returning cached model details for: {model_id}")
-            return cached_model
-
-        # Get all models
-        cache_key_all = "fal:models:all"
-        cached_models = await redis.get(cache_key_all)
-
-        if not cached_models:
-            fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-            models = await fal_client._get_models_list()
-            if not models:
-                raise Exception("No models available")
-            await redis.set(cache_key_all, serialize_models(models), ttl=settings.CACHE_TTL_MODELS)
-        else:
-            models = cached_models
-
-        # Find model
-        fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
-        model_info = fal_client.get_model_info(endpoint_id=model_id, models=models)
+        # Hash index lookup on endpoint_id
+        catalog = await request.app.state.catalog.get_catalog()
+        model_info = catalog.get(model_id)
 
         if not model_info:
             logger.warning(f"Model not found: {model_id}")
             raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
 
-        # Cache model details
-        await redis.set(cache_key, serialize_models([model_info]), ttl=settings.CACHE_TTL_MODELS)
-
-        logger.info(f"Retrieved model details for: {model_id}")
-        return serialize_models([model_info])[0]
+        body = catalog.render(("model", model_id), lambda: model_info)
+        return await _json(request, body, _cache_headers(request, catalog, f"model:{model_id}"))
 
     except HTTPException:
         raise
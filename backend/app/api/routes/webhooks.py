@@ -0,0 +1,105 @@
+from fastapi import APIRouter, HTTPException, Request
+from app.services.redis import RedisService
+from app.services.generation_store import GenerationStore
+from app.services.poll_schedule import LatencyTracker
+from app.services.webhooks import FalWebhookVerifier
+from app.models.schema import GenerationStatus
+from app.core.config import get_settings
+from datetime import datetime, timezone
+import json
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+verifier = FalWebhookVerifier()
+
+
+@router.post(
+    "/webhooks/fal",
+    summary="Fal.ai completion webhook",
+    description="Receives Fal.ai queue completion callbacks and updates the matching generation"
+)
+async def fal_webhook(request: Request):
+    """
+    Fal.ai completion callback
+
+    Fal.ai calls this once a queued request registered with `fal_webhook`
+    finishes. The payload's `request_id` is Fal.ai's id; it is mapped back
+    to our request id through the fal:request:{id} index and the
+    generation record is moved to completed/failed atomically. Callbacks
+    for requests that already finished (e.g. via the polling sweep) are
+    acknowledged and ignored. Unknown ids get a 404 so Fal.ai retries the
+    delivery: a fast callback can arrive before the submitting request has
+    linked the id.
+
+    Expected payload:
+    {
+        "request_id": "...",
+        "status": "OK" | "ERROR",
+        "payload": {...},   # Model output
+        "error": "..."      # Only on ERROR
+    }
+    """
+    body = await request.body()
+
+    if settings.FAL_WEBHOOK_VERIFY:
+        try:
+            valid = await verifier.verify(request.headers, body)
+        except Exception as e:
+            logger.error(f"Webhook verification error: {e}", exc_info=True)
+            raise HTTPException(status_code=503, detail="Unable to verify webhook signature")
+        if not valid:
+            logger.warning("Rejected Fal.ai webhook with invalid signature")
+            raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    fal_request_id = payload.get("request_id")
+    if not fal_request_id:
+        raise HTTPException(status_code=400, detail="Missing request_id")
+
+    redis: RedisService = request.app.state.redis
+    store = GenerationStore(redis)
+
+    request_id = await store.resolve_fal_request(fal_request_id)
+    if not request_id:
+        logger.warning(f"Webhook for unknown Fal.ai request {fal_request_id}, asking for a retry")
+        raise HTTPException(status_code=404, detail=f"Unknown Fal.ai request '{fal_request_id}'")
+
+    now = datetime.utcnow()
+    if payload.get("status") == "OK":
+        changes = {
+            "status": GenerationStatus.COMPLETED.value,
+            "result": payload.get("payload"),
+            "error": None,
+            "completed_at": now.isoformat(),
+            "queue_position": None
+        }
+    else:
+        error = payload.get("error") or payload.get("payload_error") or "Unknown error"
+        changes = {
+            "status": GenerationStatus.FAILED.value,
+            "error": error if isinstance(error, str) else json.dumps(error),
+            "completed_at": now.isoformat(),
+            "queue_position": None
+        }
+
+    request_data = await store.update(request_id, changes, if_active=True)
+    await store.untrack(request_id)
+
+    if not request_data:
+        logger.info(f"Webhook for {request_id} ignored (already finished or expired)")
+        return {"status": "ignored"}
+
+    if request_data["status"] == GenerationStatus.COMPLETED.value:
+        created_at = datetime.fromisoformat(request_data["created_at"]).replace(tzinfo=timezone.utc)
+        elapsed = (datetime.now(timezone.utc) - created_at).total_seconds()
+        await LatencyTracker(redis).record(request_data["model_id"], elapsed)
+
+    logger.info(f"Webhook moved {request_id} to {request_data['status']} (fal_id: {fal_request_id})")
+    return {"status": "accepted"}
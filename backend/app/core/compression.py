@@ -0,0 +1,120 @@
+"""
+Precompressed response bodies with Accept-Encoding negotiation
+"""
+from fastapi import Response
+from typing import Optional, Dict, Callable
+import asyncio
+import gzip
+import logging
+from app.core.config import get_settings
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip only
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Variants are computed once per body, in a worker thread, and reused for
+# every response, so the levels favour size over speed
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=9)
+if zstandard is not None:
+    ENCODERS["zstd"] = zstandard.ZstdCompressor(level=19).compress
+ENCODERS["gzip"] = lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for a response
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header
+
+    Returns:
+        The supported coding with the highest q-value (ties go to the
+        order of ENCODERS: br, zstd, gzip), or None for identity
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODERS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class EncodedBody:
+    """
+    A response body plus its compressed variants
+
+    Each variant is computed the first time a client asks for it, off the
+    event loop, and kept with the body, so a cached payload is never
+    compressed twice: concurrent requests for a missing variant wait on the
+    same compression. Bodies under COMPRESSION_MIN_SIZE are always sent as-is.
+    """
+
+    __slots__ = ("raw", "_variants", "_pending")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._variants: Dict[str, bytes] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def encoding_for(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """Content coding to serve this body with (None for identity)"""
+        if len(self.raw) < settings.COMPRESSION_MIN_SIZE:
+            return None
+        return negotiate(accept_encoding)
+
+    async def get(self, encoding: Optional[str]) -> bytes:
+        """Body bytes in `encoding` (None for the raw bytes)"""
+        if encoding is None:
+            return self.raw
+        variant = self._variants.get(encoding)
+        if variant is not None:
+            return variant
+
+        pending = self._pending.get(encoding)
+        if pending is None:
+            pending = asyncio.ensure_future(asyncio.to_thread(ENCODERS[encoding], self.raw))
+            self._pending[encoding] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(encoding, None))
+        # Shielded: a disconnecting client must not cancel a compression others wait on
+        variant = await asyncio.shield(pending)
+        self._variants[encoding] = variant
+        return variant
+
+
+async def encoded_response(
+    body: EncodedBody,
+    encoding: Optional[str],
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json"
+) -> Response:
+    """Response serving `body` in `encoding` (from EncodedBody.encoding_for)"""
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=await body.get(encoding), media_type=media_type, headers=headers)
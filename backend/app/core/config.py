@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class Settings(BaseSettings):
     # Application
@@ -15,6 +15,24 @@ class Settings(BaseSettings):
     FAL_API_KEY: str
     FAL_API_BASE_URL: str = "https://fal.run"
     FAL_API_TIMEOUT: int = 300
+    FAL_QUEUE_API_URL: str = "https://queue.fal.run"
+    FAL_CATALOG_PAGE_TIMEOUT: int = 30
+    FAL_CATALOG_PAGE_RETRIES: int = 3
+    FAL_CATALOG_PAGE_RETRY_BACKOFF: float = 0.5  # Doubled on each retry
+
+    # Fal.ai webhooks (completion callbacks instead of polling)
+    FAL_WEBHOOK_URL: Optional[str] = None  # Public URL of /webhooks/fal; unset disables webhooks
+    FAL_WEBHOOK_VERIFY: bool = True
+    FAL_WEBHOOK_JWKS_URL: str = "https://rest.alpha.fal.ai/.well-known/jwks.json"
+    FAL_WEBHOOK_TOLERANCE: int = 300  # Max clock skew for signed timestamps
+    FAL_WEBHOOK_SWEEP_INTERVAL: int = 30  # Fallback poll interval for webhook requests
+
+    # Outbound HTTP connection pool
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_CONNECTIONS_PER_HOST: int = 50
+    HTTP_POOL_KEEPALIVE_TIMEOUT: int = 60
+    HTTP_POOL_DNS_CACHE_TTL: int = 300
+    HTTP_POOL_PREWARM_CONNECTIONS: int = 2
 
     # Redis
     REDIS_HOST: str = "localhost"
@@ -27,13 +45,71 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
 
-    # Rate Limiting
-    RATE_LIMIT_PER_MINUTE: int = 60
+    # Rate Limiting (GCRA, in cost units per minute)
+    RATE_LIMIT_PER_MINUTE: int = 60  # Default tier
+    RATE_LIMIT_BURST_SECONDS: float = 60  # Burst allowance, in seconds' worth of the rate
+    # Per-tier limits, for API key callers only (Authorization: Bearer <key>);
+    # keys are assigned with HSET rate_limit:tiers key:<sha256 hex of the key> <tier>
+    RATE_LIMIT_TIERS: Dict[str, int] = {"pro": 600}
+    # Cost of a request by "METHOD /path" (longest prefix under API_V1_PREFIX); others cost 1
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, int] = {
+        "POST /generate": 5,
+        "POST /generate/sync": 10,
+        "POST /models/refresh": 10,
+    }
+    # Local token leases (0 disables): each process takes up to this many tokens
+    # per identity at once and spends them without a Redis round trip
+    RATE_LIMIT_LEASE_SIZE: int = 0
+    RATE_LIMIT_LEASE_TTL: float = 2.0  # Unspent tokens go back to the bucket after this
     MAX_CONCURRENT_REQUESTS: int = 5
 
+    # Generation queue (Redis Streams consumer group, one dispatcher at a time)
+    QUEUE_BLOCK_TIMEOUT: float = 5.0  # Longest blocking wait; the dispatcher renews its lease in between
+    QUEUE_LEADER_TTL: int = 15
+    QUEUE_RECLAIM_IDLE: float = 900  # Re-dispatch entries unacknowledged this long (> one task attempt)
+    QUEUE_RECLAIM_INTERVAL: int = 60
+
+    # Status polling
+    STATUS_POLL_TICK: float = 0.5  # Idle delay between poller rounds
+    STATUS_POLL_MIN_INTERVAL: float = 0.25  # Tightest gap between polls of one request
+    STATUS_POLL_MAX_INTERVAL: float = 15.0  # Backoff ceiling
+    STATUS_POLL_JITTER: float = 0.1
+    STATUS_POLL_DEFAULT_ESTIMATE: float = 10.0  # Used when a model has no duration data
+    STATUS_POLL_LATENCY_TTL: int = 604800  # Latency history of a model unused for a week is dropped
+    STATUS_POLL_BATCH_SIZE: int = 100
+    STATUS_POLL_CONCURRENCY: int = 20
+    STATUS_POLL_LEADER_TTL: int = 10
+    STATUS_POLL_TIMEOUT: int = 600  # Give up on unreachable requests after 10 minutes
+
+    # Status push (SSE / WebSocket)
+    STATUS_STREAM_KEEPALIVE: int = 15
+    STATUS_WS_MAX_WATCHES: int = 100
+
     # Caching
     CACHE_TTL_MODELS: int = 3600  # 1 hour
     CACHE_TTL_GENERATION: int = 86400  # 24 hours
+    CATALOG_VERSION_CHECK_INTERVAL: float = 5.0  # Max staleness of the per-process catalog
+    CATALOG_REFRESH_AHEAD: int = 300  # Start refreshing this long before the catalog goes stale
+    CATALOG_REFRESH_LOCK_TTL: int = 120
+    CATALOG_REFRESH_WAIT_INTERVAL: float = 0.25
+    CATALOG_REFRESH_RETRY_INTERVAL: int = 30  # Backoff after a failed background refresh
+    CATALOG_CHANGELOG_SIZE: int = 50  # Change sets kept for incremental catch-up
+    CATALOG_SNAPSHOT_PATH: Optional[str] = "/tmp/fallab/catalog.msgpack"  # Unset to disable warm starts
+    # Memory-mapped catalog shared by all workers on a host (replaces the snapshot when set)
+    CATALOG_SHARED_PATH: Optional[str] = None
+    CATALOG_SHARED_LOCK_WAIT: float = 10  # Max wait for another worker's build before building anyway
+    # HTTP caching of /models* responses (browsers / CDN), revalidated with ETags
+    CATALOG_HTTP_MAX_AGE: int = 60
+    CATALOG_HTTP_SHARED_MAX_AGE: int = 300
+    CATALOG_HTTP_STALE_WHILE_REVALIDATE: int = 600
+
+    # Shared HTTP response cache (CacheMiddleware)
+    RESPONSE_CACHE_MAX_TTL: int = 3600
+    RESPONSE_CACHE_MAX_BODY: int = 1048576  # Larger responses are streamed but not stored
+
+    # Response compression (gzip; br / zstd when brotli / zstandard are installed)
+    COMPRESSION_MIN_SIZE: int = 1024
+    GENERATION_RESPONSE_MEMO_SIZE: int = 1024  # Completed generation responses kept per process
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
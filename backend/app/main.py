@@ -3,15 +3,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
-import time
 import logging
 import asyncio
 
 # --- Core imports ---
 from app.core.config import get_settings
-from app.api.routes import models, generate, health
+from app.api.routes import models, generate, health, webhooks
 from app.services.redis import RedisService
+from app.services.events import EventHub
+from app.services.catalog import CatalogService
+from app.services.response_cache import ResponseCache
+from app.services.rate_limit import RateLimiter
 from app.workers.manager import start_worker_manager, stop_worker_manager
+from app.workers.poller import start_status_poller, stop_status_poller
 from app.models.schema import ErrorResponse
 
 # --- Custom middleware imports ---
@@ -20,7 +24,8 @@ from app.middleware.logging import RequestLoggingMiddleware
 from app.middleware.cache import CacheMiddleware
 
 # --- Connection pool import ---
-from app.core.connection_pool import get_http_client, close_http_client
+from app.core.connection_pool import get_http_session, prewarm_http_session, close_http_session
+from app.services.fal_client import FalAIClient
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,22 +46,48 @@ async def lifespan(app: FastAPI):
     app.state.redis = redis_service
     logger.info("Redis connected successfully")
 
-    # Initialize global HTTP connection pool
-    http_client = get_http_client()
-    app.state.http_client = http_client
+    # Per-process model catalog cache, invalidated through pub/sub
+    catalog = CatalogService(redis_service)
+    await catalog.warm_start()
+    app.state.catalog = catalog
+
+    # Per-identity GCRA rate limiter (RateLimitMiddleware)
+    app.state.rate_limiter = RateLimiter(redis_service)
+
+    # Shared response cache; catalog responses are dropped when the catalog changes
+    response_cache = ResponseCache(redis_service)
+    app.state.response_cache = response_cache
+
+    # Fan out generation status changes to SSE / WebSocket watchers
+    event_hub = EventHub(redis_service)
+    event_hub.add_listener(CatalogService.EVENTS_CHANNEL, catalog.on_catalog_event)
+    event_hub.add_listener(CatalogService.EVENTS_CHANNEL, response_cache.on_catalog_event)
+    await event_hub.start()
+    app.state.events = event_hub
+
+    # Initialize global HTTP connection pool and warm up Fal.ai hosts
+    app.state.http_session = get_http_session()
+    asyncio.create_task(prewarm_http_session(FalAIClient.API_URLS))
     logger.info("HTTP connection pool initialized")
 
     # Start worker manager in background
     asyncio.create_task(start_worker_manager())
     logger.info("Worker manager started")
 
+    # Start central Fal.ai status poller
+    await start_status_poller(redis_service)
+
     yield
 
     # Shutdown
     logger.info("Shutting down application...")
+    await stop_status_poller()
     await stop_worker_manager()
+    await event_hub.stop()
+    await app.state.rate_limiter.close()
+    await catalog.close()
     await redis_service.disconnect()
-    await close_http_client()
+    await close_http_session()
     logger.info("Application shutdown complete")
 
 # Create FastAPI app
@@ -71,10 +102,25 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# --- Middleware registration order ---
-# 1. Logging (first, logs all requests)
-app.add_middleware(RequestLoggingMiddleware)
-# 2. CORS
+# --- Middleware pipeline ---
+# Every stage is a pure ASGI middleware: no per-request task, memory
+# streams or body buffering, so the cost per request is a few function
+# calls (see stress-test/bench_middleware.py). add_middleware() wraps, so
+# stages are registered innermost first. Request order:
+#   logging/timing -> CORS -> rate limit -> response cache -> app
+# 4. Shared response cache (GET). Stores what the routes mark as publicly
+#    cacheable (the /models* responses); /health must always reflect live state
+#    and is never cached, and typeahead is faster answered from memory.
+app.add_middleware(CacheMiddleware, cacheable_paths=[
+    f"{settings.API_V1_PREFIX}/models",
+], excluded_paths=[
+    f"{settings.API_V1_PREFIX}/models/suggest",
+], catalog_paths=[
+    f"{settings.API_V1_PREFIX}/models",
+])
+# 3. Rate limiting (cache hits count too)
+app.add_middleware(RateLimitMiddleware)
+# 2. CORS (outside the limiter, so browsers can read 429s)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -82,39 +128,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# 3. Cache (for GET endpoints)
-app.add_middleware(CacheMiddleware, cacheable_paths=[
-    f"{settings.API_V1_PREFIX}/models",
-    f"{settings.API_V1_PREFIX}/models/categories",
-    f"{settings.API_V1_PREFIX}/models/search",
-    f"{settings.API_V1_PREFIX}/models/",
-    f"{settings.API_V1_PREFIX}/health",
-])
-# 4. Rate Limiting (after CORS, after cache)
-app.add_middleware(RateLimitMiddleware)
-
-
-
-# Request timing middleware (robust to error responses)
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    try:
-        response = await call_next(request)
-    except Exception as exc:
-        process_time = time.time() - start_time
-        # If exception, try to add header to a new response
-        resp = JSONResponse(
-            status_code=500,
-            content={"error": "InternalServerError", "message": str(exc)}
-        )
-        resp.headers["X-Process-Time"] = str(process_time)
-        return resp
-    process_time = time.time() - start_time
-    # Only add header if not already started
-    if not response.headers.get("X-Process-Time"):
-        response.headers["X-Process-Time"] = str(process_time)
-    return response
+# 1. Logging and timing (first, logs and times all requests)
+app.add_middleware(RequestLoggingMiddleware)
 
 # Request validation error handler
 @app.exception_handler(RequestValidationError)
@@ -171,6 +186,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(health.router, prefix=settings.API_V1_PREFIX, tags=["Health"])
 app.include_router(models.router, prefix=settings.API_V1_PREFIX, tags=["Models"])
 app.include_router(generate.router, prefix=settings.API_V1_PREFIX, tags=["Generation"])
+app.include_router(webhooks.router, prefix=settings.API_V1_PREFIX, tags=["Webhooks"])
 
 @app.get("/")
 async def root():
@@ -1,82 +1,189 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.core.compression import negotiate
+from app.core.config import get_settings
+from typing import Optional, List, Tuple, Dict
 import hashlib
-import json
+import logging
+import time
 
-class CacheMiddleware(BaseHTTPMiddleware):
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: argument}"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+class CacheMiddleware:
     """
-    Response caching middleware
+    Shared response cache (pure ASGI)
+
+    Caches GET responses under `cacheable_paths` in Redis as raw bytes plus
+    status and headers (ResponseCache, from app.state.response_cache):
+    - A hit is one Redis GET and a single body send; no JSON work, and the
+      original headers (ETag, Content-Encoding, Cache-Control...) are
+      replayed with Age and X-Cache: HIT. A matching If-None-Match gets a 304.
+    - A miss streams the response to the client while teeing the chunks,
+      and stores it once complete.
+    - Only 200 responses whose Cache-Control allows shared caching
+      (public, s-maxage / max-age, no private / no-store / no-cache, no
+      Set-Cookie) are stored, for s-maxage (else max-age) seconds, capped
+      at RESPONSE_CACHE_MAX_TTL.
+    - The key includes the request headers in VARY_HEADERS (Accept-Encoding
+      normalised to the coding the app would pick); responses that Vary on
+      anything else are not stored.
+    - Under `catalog_paths` the key also carries the installed catalog
+      version, so a response rendered from an older version can never be
+      served once the process has moved on, even if it is stored after the
+      tag invalidation below has run.
+    - Requests with Cache-Control: no-cache / no-store skip the lookup.
+    - Entries are tagged with the response's Surrogate-Key values, so e.g.
+      every catalog response is dropped when the catalog changes.
     """
 
-    def __init__(self, app, cacheable_paths: list):
-        super().__init__(app)
-        self.cacheable_paths = cacheable_paths
+    # CORS runs outside the cache, so Origin never reaches stored responses
+    VARY_HEADERS = ("accept-encoding",)
 
-    async def dispatch(self, request: Request, call_next):
-        # Only cache GET requests
-        if request.method != "GET":
-            return await call_next(request)
+    def __init__(self, app: ASGIApp, cacheable_paths: list, excluded_paths: list = None, catalog_paths: list = None):
+        self.app = app
+        self.cacheable_paths = tuple(cacheable_paths)
+        self.excluded_paths = tuple(excluded_paths or [])
+        self.catalog_paths = tuple(catalog_paths or [])
 
-        # Check if path is cacheable
-        is_cacheable = any(
-            request.url.path.startswith(path)
-            for path in self.cacheable_paths
-        )
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
 
-        if not is_cacheable:
-            return await call_next(request)
+        path = scope["path"]
+        if not path.startswith(self.cacheable_paths) or path.startswith(self.excluded_paths):
+            return await self.app(scope, receive, send)
 
-        # Generate cache key
-        cache_key = self._generate_cache_key(request)
+        cache = getattr(scope["app"].state, "response_cache", None) if "app" in scope else None
+        if cache is None:
+            return await self.app(scope, receive, send)
 
-        try:
-            redis = request.app.state.redis
-
-            # Check cache
-            cached = await redis.get(cache_key)
-            if cached:
-                return Response(
-                    content=json.dumps(cached),
-                    media_type="application/json",
-                    headers={"X-Cache": "HIT"}
-                )
-
-            # Process request
-            response = await call_next(request)
-
-            # Cache successful responses
-            if response.status_code == 200:
-                # Read response body
-                body = b""
-                async for chunk in response.body_iterator:
-                    body += chunk
-
-                # Cache it
-                try:
-                    data = json.loads(body)
-                    await redis.set(cache_key, data, ttl=300)  # 5 minutes
-                except:
-                    pass
-
-                # Return response
-                return Response(
-                    content=body,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    media_type=response.media_type
-                )
-
-            return response
-
-        except Exception as e:
-            print(f"Cache error: {e}")
-            return await call_next(request)
-
-    def _generate_cache_key(self, request: Request) -> str:
-        """Generate cache key from request"""
-        key_parts = [
-            request.url.path,
-            str(request.url.query)
+        headers = Headers(scope=scope)
+        key = await self._cache_key(scope, headers)
+        if key is None:
+            return await self.app(scope, receive, send)
+        request_directives = _cache_control(headers.get("cache-control"))
+
+        if "no-cache" not in request_directives and "no-store" not in request_directives:
+            cached = await cache.get(key)
+            if cached is not None:
+                return await self._send_hit(cached, headers, send)
+
+        await self._send_miss(scope, receive, send, cache, key)
+
+    async def _cache_key(self, scope: Scope, headers: Headers) -> Optional[str]:
+        """
+        Hash of path, query and the request headers responses may vary on,
+        prefixed with the current catalog version for catalog paths (None
+        if there is no catalog to be had)
+        """
+        parts = [
+            scope["path"],
+            scope["query_string"].decode("latin-1"),
+            negotiate(headers.get("accept-encoding")) or ""
         ]
-        key_string = "|".join(key_parts)
-        return f"cache:{hashlib.md5(key_string.encode()).hexdigest()}"
+        digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+
+        if scope["path"].startswith(self.catalog_paths):
+            catalog_service = getattr(scope["app"].state, "catalog", None)
+            if catalog_service is None:
+                return None
+            try:
+                # Catches up with a newer version first, as the route will
+                catalog = await catalog_service.get_catalog()
+            except Exception as e:
+                logger.warning(f"Catalog unavailable for cache key: {e}")
+                return None
+            return f"v{catalog.version}:{digest}"
+        return digest
+
+    async def _send_hit(self, cached, request_headers: Headers, send: Send):
+        status, headers, body, stored_at = cached
+        extra = [(b"age", str(max(int(time.time() - stored_at), 0)).encode()), (b"x-cache", b"HIT")]
+
+        etag = next((value for name, value in headers if name == b"etag"), None)
+        if_none_match = request_headers.get("if-none-match")
+        if etag and if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if "*" in tags or etag.decode("latin-1") in tags:
+                kept = [
+                    (name, value) for name, value in headers
+                    if name not in (b"content-length", b"content-type", b"content-encoding")
+                ]
+                await send({"type": "http.response.start", "status": 304, "headers": kept + extra})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        await send({"type": "http.response.start", "status": status, "headers": headers + extra})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_miss(self, scope: Scope, receive: Receive, send: Send, cache, key: str):
+        chunks: List[bytes] = []
+        size = 0
+        start: Dict = {}
+        store: Dict = {"ttl": None}
+
+        async def tee(message: Message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                start.update(message)
+                store["ttl"], store["tags"] = self._storable(message)
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-cache", b"MISS")])
+            elif message["type"] == "http.response.body" and store["ttl"]:
+                body = message.get("body", b"")
+                size += len(body)
+                if size > settings.RESPONSE_CACHE_MAX_BODY:
+                    store["ttl"] = None
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                    store["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        await self.app(scope, receive, tee)
+
+        if store["ttl"] and store.get("complete"):
+            await cache.put(
+                key,
+                start["status"],
+                list(start.get("headers", [])),
+                b"".join(chunks),
+                store["ttl"],
+                tags=store["tags"]
+            )
+
+    def _storable(self, message: Message) -> Tuple[Optional[int], List[str]]:
+        """TTL and tags for a response, or (None, []) if it must not be stored"""
+        if message["status"] != 200:
+            return None, []
+        headers = Headers(raw=message.get("headers", []))
+        if "set-cookie" in headers:
+            return None, []
+
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+        if not vary.issubset(self.VARY_HEADERS):
+            return None, []
+
+        directives = _cache_control(headers.get("cache-control"))
+        if "public" not in directives or directives.keys() & {"private", "no-store", "no-cache"}:
+            return None, []
+        max_age = directives.get("s-maxage") or directives.get("max-age")
+        try:
+            ttl = min(int(max_age), settings.RESPONSE_CACHE_MAX_TTL)
+        except (TypeError, ValueError):
+            return None, []
+        if ttl <= 0:
+            return None, []
+
+        return ttl, headers.get("surrogate-key", "").split()
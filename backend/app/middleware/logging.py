@@ -1,64 +1,83 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
 import time
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """
-    Structured logging for all requests
+    Structured logging and timing for all requests (pure ASGI)
+
+    Logs request_started / request_completed / request_failed and adds
+    X-Request-ID, X-Response-Time and X-Process-Time to the response start
+    message. No per-request task or body buffering: the response passes
+    straight through.
     """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # Start timer
-        start_time = time.time()
+        start_time = time.perf_counter()
+        log_enabled = logger.isEnabledFor(logging.INFO)
 
         # Generate request ID
-        request_id = request.headers.get("X-Request-ID", f"req_{time.time()}")
+        request_id = Headers(scope=scope).get("x-request-id") or f"req_{time.time()}"
+        method, path = scope["method"], scope["path"]
 
         # Log request
-        logger.info(json.dumps({
-            "event": "request_started",
-            "request_id": request_id,
-            "method": request.method,
-            "path": request.url.path,
-            "client": request.client.host,
-        }))
-
-        # Process request
-        try:
-            response = await call_next(request)
-            duration = time.time() - start_time
-
-            # Log response
+        if log_enabled:
+            client = scope.get("client")
             logger.info(json.dumps({
-                "event": "request_completed",
+                "event": "request_started",
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": round(duration * 1000, 2),
+                "method": method,
+                "path": path,
+                "client": client[0] if client else None,
             }))
 
-            # Add headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time"] = f"{duration:.3f}"
+        status_code = None
 
-            return response
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration = time.perf_counter() - start_time
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"x-response-time", f"{duration:.3f}".encode()),
+                    (b"x-process-time", str(duration).encode()),
+                ])
+            await send(message)
 
+        # Process request
+        try:
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
-            duration = time.time() - start_time
-
-            # Log error
+            # Log error; ServerErrorMiddleware renders the 500
             logger.error(json.dumps({
                 "event": "request_failed",
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "duration_ms": round(duration * 1000, 2),
+                "method": method,
+                "path": path,
+                "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
                 "error": str(e),
             }))
-
             raise
+
+        # Log response
+        if log_enabled:
+            logger.info(json.dumps({
+                "event": "request_completed",
+                "request_id": request_id,
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            }))
@@ -1,62 +1,95 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.services.redis import RedisService
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.services.rate_limit import RateLimiter
+from app.models.schema import ErrorResponse
 from app.core.config import get_settings
+import hashlib
+import math
 import time
+import logging
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """
-    Rate limiting middleware using Redis
+    Rate limiting middleware using Redis (pure ASGI)
+
+    Charges each request its route's cost against the caller's GCRA bucket
+    (RateLimiter, from app.state.rate_limiter), keyed by API key (bearer
+    token), user (X-User-ID) or client IP; only API keys can hold a tier. Over
+    the limit, a 429 in the API's error format is sent directly with the exact
+    Retry-After; otherwise the X-RateLimit-* headers are added to the response
+    start message. Requests are let through if Redis is unavailable.
     """
 
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.exempt_prefixes = (
+            "/health",
+            f"{settings.API_V1_PREFIX}/health",
+            f"{settings.API_V1_PREFIX}/webhooks/",
+        )
+        # API docs, and in-memory typeahead: keystroke traffic shouldn't cost a Redis round trip
+        self.exempt_paths = ("/", "/docs", "/redoc", "/openapi.json", f"{settings.API_V1_PREFIX}/models/suggest")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip rate limiting for health checks, Fal.ai callbacks, docs and typeahead
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path.startswith(self.exempt_prefixes) or path in self.exempt_paths:
+            return await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health checks
-        if request.url.path.startswith("/health") or request.url.path == "/":
-            return await call_next(request)
+        limiter: RateLimiter = getattr(scope["app"].state, "rate_limiter", None) if "app" in scope else None
+        if limiter is None:
+            return await self.app(scope, receive, send)
 
+        headers = Headers(scope=scope)
+        scheme, _, api_key = headers.get("authorization", "").partition(" ")
         # Support custom user header for per-user rate limiting (for stress tests)
-        user_id = request.headers.get("X-User-ID")
-        if user_id:
-            rate_key = f"user:{user_id}"
+        user_id = headers.get("x-user-id")
+        if scheme.lower() == "bearer" and api_key:
+            # Only the key's hash is kept (in Redis keys and the tiers hash)
+            identity = f"{RateLimiter.TIERED_PREFIX}{hashlib.sha256(api_key.encode()).hexdigest()}"
+        elif user_id:
+            identity = f"user:{user_id}"
         else:
             # Fallback to client IP
-            rate_key = f"ip:{request.client.host}"
-
-        # Rate limit key (per minute)
-        now = int(time.time() / 60)
-        key = f"rate_limit:{rate_key}:{now}"
-
-        try:
-            redis: RedisService = request.app.state.redis
+            client = scope.get("client")
+            identity = f"ip:{client[0] if client else 'unknown'}"
 
-            # Increment counter
-            count = await redis.increment(key)
-
-            # Set expiry on first request
-            if count == 1:
-                await redis.expire(key, 60)
+        result = await limiter.hit(identity, limiter.cost(scope["method"], path))
+        if result is None:
+            # Don't block requests if rate limiting fails
+            return await self.app(scope, receive, send)
 
-            # Check limit
-            if count > settings.RATE_LIMIT_PER_MINUTE:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Rate limit exceeded. Please try again later."
-                )
+        limit_headers = [
+            (b"x-ratelimit-limit", str(result.limit).encode()),
+            (b"x-ratelimit-remaining", str(result.remaining).encode()),
+            (b"x-ratelimit-reset", str(math.ceil(time.time() + result.reset_after)).encode()),
+        ]
 
-            # Add headers
-            response = await call_next(request)
-            response.headers["X-RateLimit-Limit"] = str(settings.RATE_LIMIT_PER_MINUTE)
-            response.headers["X-RateLimit-Remaining"] = str(max(0, settings.RATE_LIMIT_PER_MINUTE - count))
-            response.headers["X-RateLimit-Reset"] = str((now + 1) * 60)
+        # Check limit
+        if not result.allowed:
+            body = ErrorResponse(
+                error="RateLimitExceeded",
+                message="Rate limit exceeded. Please try again later.",
+                details=None
+            ).model_dump_json().encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(math.ceil(result.retry_after), 1)).encode()),
+                ] + limit_headers
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
 
-            return response
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + limit_headers)
+            await send(message)
 
-        except HTTPException:
-            raise
-        except Exception as e:
-            # Don't block requests if rate limiting fails
-            print(f"Rate limiting error: {e}")
-            return await call_next(request)
+        await self.app(scope, receive, send_with_headers)
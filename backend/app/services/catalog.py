@@ -0,0 +1,542 @@
+from app.services.redis import RedisService
+from app.services.fal_client import FalAIClient
+from app.services.model_catalog import ModelCatalog
+from app.services.shared_catalog import SharedCatalogFile
+from app.services.snapshot import read_snapshot, write_snapshot
+from app.core.config import get_settings
+from typing import Optional, List, Dict, Any
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CatalogService:
+    """
+    Per-process (L1) cache of the parsed Fal.ai model catalog
+
+    Redis layout:
+    - fal:models:entries     hash endpoint_id -> model
+    - fal:models:signatures  hash endpoint_id -> updated_at or content hash
+    - fal:models:order       list of endpoint ids in catalog order
+    - fal:models:changes     hash version -> change set (last CATALOG_CHANGELOG_SIZE)
+    - fal:models:version     stamp {"version": n, "fresh_until": ts}
+
+    Refreshes are incremental syncs: the fetched catalog is compared with the
+    stored signatures and only changed entries are written, together with a
+    change set, under a new version (a sync with no changes just moves
+    fresh_until). Each process keeps the parsed, indexed ModelCatalog in
+    memory, checks the stamp with one small GET at most every
+    CATALOG_VERSION_CHECK_INTERVAL seconds (and immediately on
+    fal:models:events), and catches up by applying the change sets since its
+    version, falling back to a full load when the changelog has a gap.
+
+    Expiry never blocks a request:
+    - CACHE_TTL_MODELS is a soft TTL (fresh_until); the keys don't expire,
+      so a stale catalog is always there to serve
+    - Once within CATALOG_REFRESH_AHEAD of fresh_until, a background refresh
+      is started while callers keep getting the current catalog
+    - Refreshes are single-flight: one task per process, and a Redis lock so
+      only one process fetches from Fal.ai; the others pick up the new
+      version through pub/sub
+    Only a cold start (nothing in memory or Redis) waits for a fetch.
+
+    Each installed version is also written, with its prebuilt indexes, to a
+    local msgpack snapshot (CATALOG_SNAPSHOT_PATH). warm_start() loads it
+    before the app accepts traffic, so a restart serves the catalog right
+    away and keeps serving it through Fal.ai or Redis outages.
+
+    With CATALOG_SHARED_PATH set, versions are instead materialised into a
+    memory-mapped file shared by all workers on the host (SharedCatalogFile).
+    The first worker to need a version builds the file under a host-wide
+    lock; the others keep serving their installed version and map the new
+    one once it is published, so each version is parsed once per host and
+    per-worker memory doesn't grow with the catalog. The mapped file also
+    serves as the warm-start snapshot.
+    """
+
+    SNAPSHOT_FORMAT = 1
+
+    ENTRIES_KEY = "fal:models:entries"
+    SIGNATURES_KEY = "fal:models:signatures"
+    ORDER_KEY = "fal:models:order"
+    CHANGES_KEY = "fal:models:changes"
+    VERSION_KEY = "fal:models:version"
+    SEQUENCE_KEY = "fal:models:seq"
+    REFRESH_LOCK_KEY = "fal:models:refresh:lock"
+    EVENTS_CHANNEL = "fal:models:events"
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+        self.fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
+        self.catalog: Optional[ModelCatalog] = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_waits = False
+        self._retry_at = 0.0
+        self._snapshot_version: Optional[int] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._shared_task: Optional[asyncio.Task] = None
+        self.shared = SharedCatalogFile(settings.CATALOG_SHARED_PATH) if settings.CATALOG_SHARED_PATH else None
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.catalog.version if self.catalog else None
+
+    def on_catalog_event(self, event: Dict[str, Any]):
+        """Pub/sub callback: a refresh elsewhere published a new version"""
+        if event.get("version") != self.version:
+            self._stale = True
+
+    def _is_fresh(self) -> bool:
+        return (
+            self.catalog is not None
+            and not self._stale
+            and time.monotonic() - self._checked_at < settings.CATALOG_VERSION_CHECK_INTERVAL
+        )
+
+    def _install(self, catalog: ModelCatalog) -> ModelCatalog:
+        # The Redis stamp is authoritative, so a lower version is installed
+        # too (e.g. after a Redis flush restarted the sequence). Installs
+        # happen under self._lock, which orders them with stamp reads.
+        self.catalog = catalog
+        self._stale = False
+        self._checked_at = time.monotonic()
+        if self.shared is None and settings.CATALOG_SNAPSHOT_PATH and catalog.version != self._snapshot_version:
+            if self._snapshot_task is None or self._snapshot_task.done():
+                self._snapshot_task = asyncio.create_task(self._save_snapshot())
+        return catalog
+
+    async def warm_start(self) -> bool:
+        """
+        Load the local catalog snapshot, if any, as the in-memory catalog
+
+        The first request still checks the Redis stamp and catches up (or
+        refreshes in the background) from there.
+
+        Returns:
+            True if a snapshot was loaded
+        """
+        started = time.perf_counter()
+        if self.shared is not None:
+            catalog = await asyncio.to_thread(self.shared.open)
+            if catalog is None:
+                return False
+        else:
+            if not settings.CATALOG_SNAPSHOT_PATH:
+                return False
+            state = await asyncio.to_thread(read_snapshot, settings.CATALOG_SNAPSHOT_PATH)
+            if not state or state.get("format") != self.SNAPSHOT_FORMAT:
+                return False
+            try:
+                catalog = ModelCatalog(state["models"], state["version"], indexes=state["indexes"])
+            except Exception as e:
+                logger.warning(f"Ignoring catalog snapshot: {e}")
+                return False
+
+        async with self._lock:
+            if self.catalog is None:
+                self.catalog = catalog
+                self._snapshot_version = catalog.version
+        logger.info(
+            f"Loaded catalog snapshot v{catalog.version} ({len(catalog)} models) "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return True
+
+    async def _save_snapshot(self):
+        """Write the current catalog to disk (off the event loop) until the snapshot is current"""
+        while self.catalog is not None and self.catalog.version != self._snapshot_version:
+            catalog = self.catalog
+            state = {
+                "format": self.SNAPSHOT_FORMAT,
+                "version": catalog.version,
+                "saved_at": time.time(),
+                "models": catalog.models,
+                "indexes": catalog.index_state()
+            }
+            try:
+                await asyncio.to_thread(write_snapshot, settings.CATALOG_SNAPSHOT_PATH, state)
+            except Exception as e:
+                logger.warning(f"Failed to write catalog snapshot: {e}")
+                return
+            self._snapshot_version = catalog.version
+            logger.debug(f"Wrote catalog snapshot v{catalog.version}")
+
+    @staticmethod
+    def signature(model: Dict[str, Any]) -> str:
+        """Change detector for one model: its updated_at, else a hash of its content"""
+        updated_at = model.get('updated_at') or (model.get('metadata') or {}).get('updated_at')
+        if updated_at:
+            return str(updated_at)
+        return hashlib.sha1(json.dumps(model, sort_keys=True).encode()).hexdigest()
+
+    async def _load(self, version: int) -> Optional[ModelCatalog]:
+        """Bring the in-memory catalog up to `version` (or newer) from Redis"""
+        catalog = None
+        if self.catalog is not None and self.version < version:
+            catalog = await self._apply_changes(version)
+        if catalog is None:
+            catalog = await self._load_full(version)
+        return catalog
+
+    async def _apply_changes(self, version: int) -> Optional[ModelCatalog]:
+        """Patch the current catalog with the change sets up to `version`; None if any is missing"""
+        versions = [str(v) for v in range(self.version + 1, version + 1)]
+        if len(versions) > settings.CATALOG_CHANGELOG_SIZE:
+            return None
+        change_sets = await self.redis.hmget(self.CHANGES_KEY, versions)
+        if any(change is None or change["full"] for change in change_sets):
+            return None
+
+        upserted, removed, reordered = set(), set(), False
+        for change in change_sets:
+            upserted.difference_update(change["removed"])
+            removed.update(change["removed"])
+            removed.difference_update(change["upserted"])
+            upserted.update(change["upserted"])
+            reordered = reordered or change["reordered"]
+
+        models = {m['endpoint_id']: m for m in self.catalog.models}
+        ids = list(upserted)
+        for endpoint_id, model in zip(ids, await self.redis.hmget(self.ENTRIES_KEY, ids)):
+            if model is not None:
+                models[endpoint_id] = model
+        for endpoint_id in removed:
+            models.pop(endpoint_id, None)
+
+        order = await self.redis.get(self.ORDER_KEY) if reordered else list(models)
+        if order is None:
+            return None
+        catalog = self._install(ModelCatalog([models[i] for i in order if i in models], version))
+        logger.info(
+            f"Applied catalog changes up to v{version} "
+            f"({len(upserted)} updated, {len(removed)} removed)"
+        )
+        return catalog
+
+    async def _load_full(self, version: int) -> Optional[ModelCatalog]:
+        order = await self.redis.get(self.ORDER_KEY)
+        if not order:
+            return None
+        entries = await self.redis.hgetall(self.ENTRIES_KEY)
+        catalog = self._install(ModelCatalog([entries[i] for i in order if i in entries], version))
+        logger.info(f"Loaded catalog v{catalog.version} ({len(catalog)} models)")
+        return catalog
+
+    async def get_catalog(self) -> ModelCatalog:
+        """
+        Get the indexed catalog, re-reading Redis only on version change
+
+        Returns:
+            ModelCatalog (shared; callers must not mutate it)
+
+        Raises:
+            Exception: If there is no catalog anywhere and Fal.ai can't be reached
+        """
+        if self._is_fresh():
+            return self.catalog
+
+        async with self._lock:
+            if self._is_fresh():
+                return self.catalog
+
+            stamp = await self._stamp()
+            if stamp:
+                catalog = await self._catch_up(stamp)
+                if self.version == stamp["version"]:
+                    if time.time() >= stamp["fresh_until"] - settings.CATALOG_REFRESH_AHEAD:
+                        self._start_refresh()
+                    return self.catalog
+                if catalog is not None:
+                    # Another worker is still building this version for the host
+                    return catalog
+
+            if self.catalog is not None:
+                # Redis lost the catalog (or is unreachable): keep serving ours
+                self._install(self.catalog)
+                self._start_refresh()
+                return self.catalog
+
+        # Cold start: nothing to serve until the first fetch completes
+        return await asyncio.shield(self._start_refresh(wait=True))
+
+    async def get_models(self) -> List[Dict[str, Any]]:
+        """Get the full model list of the current catalog"""
+        return (await self.get_catalog()).models
+
+    async def refresh(self) -> ModelCatalog:
+        """
+        Fetch the catalog from Fal.ai, store it under a new version and notify all processes
+
+        Joins a refresh already running in this process; if another process
+        holds the refresh lock, waits for the version it publishes instead.
+        """
+        return await asyncio.shield(self._start_refresh(wait=True))
+
+    async def close(self):
+        """Cancel in-flight background refresh / shared catalog catch-up and finish a pending snapshot write"""
+        for task in (self._refresh_task, self._shared_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        if self._snapshot_task and not self._snapshot_task.done():
+            await self._snapshot_task
+
+    def _start_refresh(self, wait: bool = False) -> Optional[asyncio.Task]:
+        """
+        Start (or join) this process's single refresh task
+
+        Args:
+            wait: Whether the caller will await the result; background
+                refreshes give up when another process holds the lock and
+                respect the retry backoff after a failure
+        """
+        running = self._refresh_task
+        if running and not running.done() and (self._refresh_waits or not wait):
+            return running
+        if not wait and time.monotonic() < self._retry_at:
+            return None
+
+        task = asyncio.create_task(self._refresh_singleflight(wait))
+        task.add_done_callback(lambda t: self._on_refresh_done(t, wait))
+        self._refresh_task = task
+        self._refresh_waits = wait
+        return task
+
+    def _on_refresh_done(self, task: asyncio.Task, waited: bool):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self._retry_at = time.monotonic() + settings.CATALOG_REFRESH_RETRY_INTERVAL
+            if not waited:
+                # Nobody awaits background refreshes; report the failure here
+                logger.error(f"Background catalog refresh failed, serving v{self.version}: {error}")
+
+    async def _stamp(self) -> Optional[Dict[str, Any]]:
+        stamp = await self.redis.get(self.VERSION_KEY)
+        return stamp if isinstance(stamp, dict) else None
+
+    async def _catch_up(self, stamp: Dict[str, Any]) -> Optional[ModelCatalog]:
+        if stamp["version"] == self.version:
+            return self._install(self.catalog)
+        if self.shared is not None:
+            return await self._catch_up_shared(stamp["version"])
+        return await self._load(stamp["version"])
+
+    async def _catch_up_shared(self, version: int) -> Optional[ModelCatalog]:
+        """
+        Map `version` from the host's shared file, building it if no other worker has
+
+        Called under self._lock, so it doesn't wait there for another
+        worker's build: the installed catalog is returned (and kept serving)
+        while a background task maps the version once it is published. Only a
+        cold start, with nothing to serve, waits here.
+        """
+        if self.catalog is not None and self._shared_task is not None and not self._shared_task.done():
+            return self.catalog
+
+        mapped = await asyncio.to_thread(self.shared.open, version)
+        if mapped is not None:
+            return self._install(mapped)
+
+        if self.catalog is None:
+            # Cold start: nothing to serve meanwhile (the wait is bounded)
+            locked = await self._lock_shared()
+        elif self.shared.try_lock():
+            locked = True
+        else:
+            self._shared_task = asyncio.create_task(self._await_shared(version))
+            return self.catalog
+
+        try:
+            return await self._build_shared(version)
+        finally:
+            if locked:
+                self.shared.unlock()
+
+    async def _await_shared(self, version: int):
+        """Wait, outside self._lock, for another worker to build `version`, then map it"""
+        locked = await self._lock_shared()
+        try:
+            async with self._lock:
+                stamp = await self._stamp()
+                if stamp and stamp["version"] == version and self.version != version:
+                    await self._build_shared(version)
+        except Exception as e:
+            logger.warning(f"Failed to catch up with shared catalog v{version}, serving v{self.version}: {e}")
+        finally:
+            if locked:
+                self.shared.unlock()
+
+    async def _build_shared(self, version: int) -> Optional[ModelCatalog]:
+        """Map `version`, or load it and publish it to the shared file (build lock held)"""
+        # Another worker may have published it while we waited
+        mapped = await asyncio.to_thread(self.shared.open, version)
+        if mapped is None:
+            catalog = await self._load(version)
+            if catalog is None:
+                return None
+            mapped = await self._publish_shared(catalog)
+        return self._install(mapped)
+
+    async def _lock_shared(self) -> bool:
+        """Wait for the host-wide build lock; False if it was never acquired"""
+        deadline = time.monotonic() + settings.CATALOG_SHARED_LOCK_WAIT
+        while not self.shared.try_lock():
+            if time.monotonic() > deadline:
+                logger.warning("Timed out waiting for the shared catalog lock, building without it")
+                return False
+            await asyncio.sleep(settings.CATALOG_REFRESH_WAIT_INTERVAL)
+        return True
+
+    async def _publish_shared(self, catalog: ModelCatalog) -> ModelCatalog:
+        """Write `catalog` to the shared file and return its mapped view (or `catalog` on failure)"""
+        try:
+            mapped = await asyncio.to_thread(self.shared.publish, catalog)
+        except Exception as e:
+            logger.warning(f"Failed to publish shared catalog v{catalog.version}: {e}")
+            return catalog
+        return mapped if mapped is not None else catalog
+
+    async def _refresh_singleflight(self, wait: bool) -> Optional[ModelCatalog]:
+        token = uuid.uuid4().hex
+        # Any new stamp (a new version, or the same one re-marked fresh by a
+        # sync that found no changes) means someone else completed a refresh
+        baseline = await self._stamp()
+        deadline = time.monotonic() + settings.CATALOG_REFRESH_LOCK_TTL
+
+        while True:
+            if await self.redis.acquire_lock(self.REFRESH_LOCK_KEY, token, settings.CATALOG_REFRESH_LOCK_TTL):
+                try:
+                    stamp = await self._stamp()
+                    if stamp and stamp != baseline:
+                        async with self._lock:
+                            catalog = await self._catch_up(stamp)
+                        if catalog:
+                            return catalog
+                    return await self._refresh(token)
+                finally:
+                    await self.redis.release_lock(self.REFRESH_LOCK_KEY, token)
+
+            if not wait:
+                logger.debug("Catalog refresh already running in another process")
+                return self.catalog
+
+            # Another process is fetching: wait for the stamp it writes
+            await asyncio.sleep(settings.CATALOG_REFRESH_WAIT_INTERVAL)
+            stamp = await self._stamp()
+            if stamp and stamp != baseline:
+                async with self._lock:
+                    catalog = await self._catch_up(stamp)
+                if catalog:
+                    return catalog
+            if time.monotonic() > deadline:
+                raise Exception("Timed out waiting for the catalog refresh in another process")
+
+    async def _refresh(self, lock_token: str) -> ModelCatalog:
+        """
+        Sync the stored catalog with Fal.ai, writing only what changed
+
+        Pages are diffed as they stream in. Changed entries are held until
+        the end and committed together with signatures, order, removals, the
+        change set and the version, so the stored entries always match the
+        stamped version: a sync that fails halfway leaves nothing behind and
+        is redone by the next one.
+        """
+        stamp = await self._stamp()
+        base = stamp["version"] if stamp else 0
+        stored = await self.redis.hgetall(self.SIGNATURES_KEY) if base else {}
+
+        models: Dict[str, Dict[str, Any]] = {}
+        signatures: Dict[str, str] = {}
+        upserted: List[str] = []
+        async for page in self.fal_client.iter_model_pages():
+            for model in json.loads(json.dumps(page, default=str)):
+                endpoint_id = model.get('endpoint_id')
+                if not endpoint_id or endpoint_id in models:
+                    continue
+                models[endpoint_id] = model
+                signatures[endpoint_id] = self.signature(model)
+                if stored.get(endpoint_id) != signatures[endpoint_id]:
+                    upserted.append(endpoint_id)
+            await self.redis.extend_lock(self.REFRESH_LOCK_KEY, lock_token, settings.CATALOG_REFRESH_LOCK_TTL)
+
+        if not models:
+            raise Exception("No models returned from Fal.ai API")
+
+        order = list(models)
+        fresh_until = time.time() + settings.CACHE_TTL_MODELS
+        removed = [i for i in stored if i not in models]
+        reordered = not base or order != await self.redis.get(self.ORDER_KEY)
+
+        if base and not (upserted or removed or reordered):
+            async with self._lock:
+                current = await self._catch_up(stamp)
+            if current is not None:
+                await self.redis.set(self.VERSION_KEY, {"version": base, "fresh_until": fresh_until})
+                logger.info(f"Catalog v{base} unchanged on Fal.ai ({len(models)} models)")
+                return current
+
+        version = await self.redis.increment(self.SEQUENCE_KEY)
+        # Build the indexes before publishing, so this process switches over instantly
+        catalog = ModelCatalog([models[i] for i in order], version)
+        # Large change sets are cheaper to reload than to replay
+        full = not base or len(upserted) > len(models) // 2
+        change_set = {
+            "base": base,
+            "full": full,
+            "upserted": [] if full else upserted,
+            "removed": [] if full else removed,
+            "reordered": reordered
+        }
+        mapping = {self.VERSION_KEY: {"version": version, "fresh_until": fresh_until}}
+        if reordered:
+            mapping[self.ORDER_KEY] = order
+        committed = await self.redis.set_many(
+            mapping,
+            hashes={
+                self.ENTRIES_KEY: {
+                    **{i: models[i] for i in upserted},
+                    **{i: None for i in removed}
+                },
+                self.SIGNATURES_KEY: {
+                    **{i: signatures[i] for i in upserted},
+                    **{i: None for i in removed}
+                },
+                self.CHANGES_KEY: {
+                    str(version): change_set,
+                    str(version - settings.CATALOG_CHANGELOG_SIZE): None
+                }
+            },
+            channel=self.EVENTS_CHANNEL,
+            message={"version": version, **change_set}
+        )
+        if not committed:
+            raise Exception("Failed to store the catalog in Redis")
+
+        async with self._lock:
+            if self.shared is not None:
+                locked = await self._lock_shared()
+                try:
+                    catalog = await self._publish_shared(catalog)
+                finally:
+                    if locked:
+                        self.shared.unlock()
+            self._install(catalog)
+        logger.info(
+            f"Catalog synced from Fal.ai as v{version} ({len(models)} models, "
+            f"{len(upserted)} updated, {len(removed)} removed)"
+        )
+        return catalog
@@ -0,0 +1,156 @@
+from app.services.redis import RedisService
+from app.services.generation_store import GenerationStore, TERMINAL_STATUSES
+from typing import Optional, Dict, Set, Any, Callable, List
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LatestRecords:
+    """
+    Watcher queue keeping only the newest record per request_id
+
+    Stands in for an asyncio.Queue when one consumer multiplexes many
+    requests (e.g. the status WebSocket). A bounded queue drops the oldest
+    updates for a slow reader, which can be another request's final record;
+    here each request's pending update is simply replaced by the newer one,
+    and a completed/failed record is never replaced.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    def full(self) -> bool:
+        return False
+
+    def put_nowait(self, request_data: Dict[str, Any]):
+        request_id = request_data.get("request_id")
+        pending = self._records.get(request_id)
+        if pending is not None and pending.get("status") in TERMINAL_STATUSES:
+            return
+        self._records[request_id] = request_data
+        self._ready.set()
+
+    async def put(self, request_data: Dict[str, Any]):
+        self.put_nowait(request_data)
+
+    async def get(self) -> Dict[str, Any]:
+        """Next pending record, oldest request first"""
+        while not self._records:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._records.pop(next(iter(self._records)))
+
+
+class EventHub:
+    """
+    Per-process fan-out of Redis pub/sub events
+
+    Holds a single Redis pub/sub subscription per process. Records
+    published on generation:events are dispatched to the local asyncio
+    queues watching their request_id, so any number of SSE streams,
+    WebSocket watchers and long-polls cost one Redis connection per
+    process. Other channels (e.g. catalog invalidation) are delivered to
+    callbacks registered with add_listener().
+    """
+
+    QUEUE_SIZE = 100
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+        self.watchers: Dict[str, Set[asyncio.Queue]] = {}
+        self.listeners: Dict[str, List[Callable[[Any], None]]] = {
+            GenerationStore.EVENTS_CHANNEL: [self._dispatch]
+        }
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, channel: str, callback: Callable[[Any], None]):
+        """
+        Call `callback` with every decoded message published on `channel`
+
+        Must be registered before start().
+        """
+        self.listeners.setdefault(channel, []).append(callback)
+
+    async def start(self):
+        """Subscribe and start dispatching events"""
+        self.running = True
+        self._task = asyncio.create_task(self._listen())
+        logger.info("Event hub started")
+
+    async def stop(self):
+        """Stop dispatching events"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("Event hub stopped")
+
+    def watch(self, request_id: str, queue: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """
+        Start receiving updates for a request
+
+        Args:
+            request_id: Request to watch
+            queue: Existing queue (or LatestRecords) to deliver into, letting
+                one consumer multiplex many request ids; a new one is
+                created if omitted
+
+        Returns:
+            Queue that receives each updated generation record
+        """
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.watchers.setdefault(request_id, set()).add(queue)
+        return queue
+
+    def unwatch(self, request_id: str, queue: asyncio.Queue):
+        """Stop delivering updates for a request into a queue"""
+        queues = self.watchers.get(request_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.watchers[request_id]
+
+    def _dispatch(self, request_data: Dict[str, Any]):
+        """Deliver a record to every queue watching its request_id"""
+        for queue in self.watchers.get(request_data.get("request_id"), ()):
+            if queue.full():
+                # Slow consumer: drop the oldest update, the newest record supersedes it
+                queue.get_nowait()
+            queue.put_nowait(request_data)
+
+    async def _listen(self):
+        """Pub/sub receive loop (resubscribes after connection errors)"""
+        while self.running:
+            pubsub = self.redis.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self.listeners)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                    except (json.JSONDecodeError, TypeError) as e:
+                        logger.warning(f"Malformed event on {message.get('channel')}: {e}")
+                        continue
+                    for callback in self.listeners.get(message["channel"], ()):
+                        try:
+                            callback(data)
+                        except Exception as e:
+                            logger.error(f"Event listener error on {message['channel']}: {e}", exc_info=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event hub subscription error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
@@ -1,10 +1,14 @@
 import aiohttp
 import logging
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from datetime import datetime
+from app.core.config import get_settings
+from app.core.connection_pool import get_http_session
+from app.services.poll_schedule import next_poll_delay
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class FalAIClient:
@@ -16,27 +20,61 @@ class FalAIClient:
     """
 
     PLATFORM_API_URL = "https://api.fal.ai/v1"
-    QUEUE_API_URL = "https://queue.fal.run"
+    QUEUE_API_URL = settings.FAL_QUEUE_API_URL
     SYNC_API_URL = "https://fal.run"
-
-    def __init__(self, api_key: str):
+    API_URLS = (PLATFORM_API_URL, QUEUE_API_URL, SYNC_API_URL)
+
+    # Queue API status values mapped to our generation statuses
+    STATUS_MAP = {
+        "IN_QUEUE": "queued",
+        "IN_PROGRESS": "processing",
+        "COMPLETED": "completed",
+        "FAILED": "failed",
+        "ERROR": "failed",
+    }
+
+    def __init__(self, api_key: str, session: Optional[aiohttp.ClientSession] = None):
         """
         Initialize Fal.ai client
 
         Args:
             api_key: Fal.ai API key for authentication
+            session: HTTP session to use (defaults to the shared pooled session)
         """
         self.api_key = api_key
+        self._session = session
         self.headers = {
             "Authorization": f"Key {api_key}",
             "Content-Type": "application/json"
         }
 
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """HTTP session used for all Fal.ai calls (keep-alive pooled)"""
+        return self._session or get_http_session()
+
     async def _get_models_list(self) -> List[Dict[str, Any]]:
         """
         Fetch complete list of available models from Fal.ai Platform API
         Handles pagination automatically
 
+        Prefer iter_model_pages() for large catalogs; this collects every page.
+
+        Returns:
+            List of model dictionaries with endpoint_id and metadata
+
+        Raises:
+            Exception: If API request fails
+        """
+        models = []
+        async for page in self.iter_model_pages():
+            models.extend(page)
+        return models
+
+    async def iter_model_pages(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream the model catalog from Fal.ai Platform API page by page
+
         API Endpoint: GET https://api.fal.ai/v1/models
 
         Expected Response Structure:
@@ -61,209 +99,87 @@ class FalAIClient:
             "next_cursor": "..." (optional)
         }
 
-        Returns:
-            List of model dictionaries with endpoint_id and metadata
+        Pages are cursor-linked, so they can't be requested in parallel; instead
+        the next page is requested as soon as its cursor is known, before the
+        current one is yielded, so the caller's processing overlaps the download.
+        Each page is retried independently (see _fetch_models_page).
+
+        Yields:
+            Lists of model dictionaries, one per page
 
         Raises:
-            Exception: If API request fails
+            Exception: If a page still fails after its retries
         """
+        next_page = asyncio.create_task(self._fetch_models_page(None))
+        total_fetched = 0
         try:
-            models = []
-            cursor = None
-            total_fetched = 0
-
-            async with aiohttp.ClientSession() as session:
-                while True:
-                    url = f"{self.PLATFORM_API_URL}/models"
-                    params = {"cursor": cursor} if cursor else {}
-
-                    logger.debug(f"Fetching models from {url}" + (f" with cursor={cursor}" if cursor else ""))
-
-                    async with session.get(
-                        url,
-                        headers=self.headers,
-                        params=params,
-                        timeout=aiohttp.ClientTimeout(total=30)
-                    ) as response:
-                        if response.status != 200:
-                            error_text = await response.text()
-                            logger.error(f"Fal.ai API error {response.status}: {error_text}")
-                            raise Exception(f"Failed to fetch models: HTTP {response.status}")
-
-                        data = await response.json()
-
-                        # Extract models from response
-                        batch = data.get('models', [])
-                        models.extend(batch)
-                        total_fetched += len(batch)
-                        logger.info(f"Fetched {len(batch)} models (total so far: {total_fetched})")
-
-                        # Check for pagination
-                        cursor = data.get('next_cursor')
-                        if not cursor:
-                            logger.info(f"Successfully fetched all {len(models)} models from Fal.ai")
-                            break
-
-            return models
+            while next_page is not None:
+                data = await next_page
+                cursor = data.get('next_cursor')
+                next_page = asyncio.create_task(self._fetch_models_page(cursor)) if cursor else None
 
+                batch = data.get('models', [])
+                total_fetched += len(batch)
+                logger.info(f"Fetched {len(batch)} models (total so far: {total_fetched})")
+                yield batch
+
+            logger.info(f"Successfully fetched all {total_fetched} models from Fal.ai")
         except Exception as e:
             logger.error(f"Error fetching models from Fal.ai: {str(e)}", exc_info=True)
             raise
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
 
-    def search_models(
-        self,
-        query: str,
-        models: List[Dict[str, Any]],
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
+    async def _fetch_models_page(self, cursor: Optional[str]) -> Dict[str, Any]:
         """
-        Perform client-side search on cached models list.
-        Since Fal.ai doesn't provide a dedicated search API, we search locally.
-
-        Searches in:
-        - endpoint_id (highest priority)
-        - metadata.display_name
-        - metadata.description
-        - metadata.tags
+        Fetch one catalog page, retrying timeouts, connection errors, 429 and 5xx
 
         Args:
-            query: Search query string
-            models: List of models to search in
-            limit: Maximum number of results to return
+            cursor: Pagination cursor (None for the first page)
 
         Returns:
-            List of matching models sorted by relevance
-        """
-        if not query or not query.strip():
-            return models[:limit]
-
-        query_lower = query.lower()
-        results = []
+            Raw page response
 
-        for model in models:
-            score = 0
-
-            # Priority 1: endpoint_id match (exact or partial)
-            endpoint_id = model.get('endpoint_id', '').lower()
-            if query_lower in endpoint_id:
-                score += 5
-                if endpoint_id == query_lower:  # Exact match bonus
-                    score += 10
-
-            metadata = model.get('metadata', {})
-
-            # Priority 2: display_name match
-            display_name = metadata.get('display_name', '').lower()
-            if query_lower in display_name:
-                score += 3
-                if display_name == query_lower:  # Exact match bonus
-                    score += 5
-
-            # Priority 3: description match
-            description = metadata.get('description', '').lower()
-            if query_lower in description:
-                score += 1
-
-            # Priority 3: tag match
-            tags = metadata.get('tags', [])
-            if any(query_lower in tag.lower() for tag in tags):
-                score += 2
-
-            if score > 0:
-                results.append((model, score))
-
-        # Sort by score (highest first) and extract models
-        results.sort(key=lambda x: x[1], reverse=True)
-        sorted_results = [m for m, _ in results[:limit]]
-
-        logger.debug(f"Search for '{query}' found {len(sorted_results)} results")
-        return sorted_results
-
-    def get_models_by_category(
-        self,
-        models: List[Dict[str, Any]],
-        category: str
-    ) -> List[Dict[str, Any]]:
-        """
-        Filter models by category
-
-        Args:
-            models: List of models to filter
-            category: Category to filter by (e.g., 'text-to-image')
-
-        Returns:
-            List of models in the specified category
-        """
-        category_lower = category.lower()
-        filtered = [
-            m for m in models
-            if m.get('metadata', {}).get('category', '').lower() == category_lower
-        ]
-        logger.debug(f"Found {len(filtered)} models in category '{category}'")
-        return filtered
-
-    def get_model_info(
-        self,
-        endpoint_id: str,
-        models: List[Dict[str, Any]]
-    ) -> Optional[Dict[str, Any]]:
-        """
-        Get detailed information for a specific model
-
-        Args:
-            endpoint_id: Model endpoint ID (e.g., 'fal-ai/flux/dev')
-            models: List of models to search in
-
-        Returns:
-            Model information dict or None if not found
-        """
-        for model in models:
-            if model.get('endpoint_id') == endpoint_id:
-                logger.debug(f"Found model info for: {endpoint_id}")
-                return model
-        logger.warning(f"Model not found: {endpoint_id}")
-        return None
-
-    def get_active_models(self, models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        Raises:
+            Exception: On a non-retryable error or once retries are exhausted
         """
-        Filter to only active models
+        url = f"{self.PLATFORM_API_URL}/models"
+        params = {"cursor": cursor} if cursor else {}
+        session = self.session
 
-        Args:
-            models: List of models to filter
+        for attempt in range(settings.FAL_CATALOG_PAGE_RETRIES + 1):
+            logger.debug(f"Fetching models from {url}" + (f" with cursor={cursor}" if cursor else ""))
+            try:
+                async with session.get(
+                    url,
+                    headers=self.headers,
+                    params=params,
+                    timeout=aiohttp.ClientTimeout(total=settings.FAL_CATALOG_PAGE_TIMEOUT)
+                ) as response:
+                    if response.status == 200:
+                        return await response.json()
 
-        Returns:
-            List of active models only
-        """
-        active = [
-            m for m in models
-            if m.get('metadata', {}).get('status') == 'active'
-        ]
-        logger.debug(f"Filtered {len(active)} active models from {len(models)} total")
-        return active
-
-    def get_categories(self, models: List[Dict[str, Any]]) -> List[str]:
-        """
-        Get list of unique categories from models
+                    error_text = await response.text()
+                    logger.error(f"Fal.ai API error {response.status}: {error_text}")
+                    error = Exception(f"Failed to fetch models: HTTP {response.status}")
+                    if response.status != 429 and response.status < 500:
+                        raise error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
 
-        Args:
-            models: List of models
+            if attempt < settings.FAL_CATALOG_PAGE_RETRIES:
+                delay = settings.FAL_CATALOG_PAGE_RETRY_BACKOFF * 2 ** attempt
+                logger.warning(f"Retrying models page (cursor={cursor}) in {delay:.1f}s after: {error!r}")
+                await asyncio.sleep(delay)
 
-        Returns:
-            Sorted list of unique category names
-        """
-        categories = set()
-        for model in models:
-            category = model.get('metadata', {}).get('category')
-            if category:
-                categories.add(category)
-        result = sorted(list(categories))
-        logger.debug(f"Found {len(result)} unique categories")
-        return result
+        raise error
 
     async def submit_request(
         self,
         model_id: str,
-        input_data: Dict[str, Any]
+        input_data: Dict[str, Any],
+        webhook_url: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Submit a generation request to Fal.ai Queue API (async)
@@ -288,6 +204,7 @@ class FalAIClient:
         Args:
             model_id: Model endpoint ID
             input_data: Input parameters for the model
+            webhook_url: URL Fal.ai should call with the result on completion
 
         Returns:
             Response containing request_id and status
@@ -296,26 +213,27 @@ class FalAIClient:
             Exception: If request submission fails
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.QUEUE_API_URL}/{model_id}"
-
-                logger.info(f"Submitting async request to {model_id}")
-
-                async with session.post(
-                    url,
-                    json=input_data,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status not in (200, 201):
-                        error_text = await response.text()
-                        logger.error(f"Queue API error {response.status}: {error_text}")
-                        raise Exception(f"Failed to submit request: HTTP {response.status}")
-
-                    result = await response.json()
-                    request_id = result.get('request_id')
-                    logger.info(f"Request submitted for {model_id}: {request_id}")
-                    return result
+            session = self.session
+            url = f"{self.QUEUE_API_URL}/{model_id}"
+
+            logger.info(f"Submitting async request to {model_id}")
+
+            async with session.post(
+                url,
+                json=input_data,
+                headers=self.headers,
+                params={"fal_webhook": webhook_url} if webhook_url else None,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status not in (200, 201):
+                    error_text = await response.text()
+                    logger.error(f"Queue API error {response.status}: {error_text}")
+                    raise Exception(f"Failed to submit request: HTTP {response.status}")
+
+                result = await response.json()
+                request_id = result.get('request_id')
+                logger.info(f"Request submitted for {model_id}: {request_id}")
+                return result
 
         except Exception as e:
             logger.error(f"Error submitting request to {model_id}: {str(e)}", exc_info=True)
@@ -346,25 +264,35 @@ class FalAIClient:
             Exception: If status check fails
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.QUEUE_API_URL}/requests/{request_id}"
+            session = self.session
+            url = f"{self.QUEUE_API_URL}/requests/{request_id}"
 
-                async with session.get(
-                    url,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Status API error {response.status}: {error_text}")
-                        raise Exception(f"Failed to get status: HTTP {response.status}")
+            async with session.get(
+                url,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Status API error {response.status}: {error_text}")
+                    raise Exception(f"Failed to get status: HTTP {response.status}")
 
-                    return await response.json()
+                return await response.json()
 
         except Exception as e:
             logger.error(f"Error getting status for request {request_id}: {str(e)}", exc_info=True)
             raise
 
+    @classmethod
+    def normalize_status(cls, status: Optional[str]) -> str:
+        """
+        Map a Queue API status ("IN_QUEUE", "processing", ...) to one of
+        queued / processing / completed / failed
+        """
+        if not status:
+            return "queued"
+        return cls.STATUS_MAP.get(status.upper(), status.lower())
+
     async def generate_sync(
         self,
         model_id: str,
@@ -390,25 +318,25 @@ class FalAIClient:
             Exception: If generation fails or times out
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.SYNC_API_URL}/{model_id}"
-
-                logger.info(f"Submitting sync request to {model_id}")
-
-                async with session.post(
-                    url,
-                    json=input_data,
-                    headers=self.headers,
-                    timeout=aiohttp.ClientTimeout(total=300)  # 5 minute timeout
-                ) as response:
-                    if response.status not in (200, 201):
-                        error_text = await response.text()
-                        logger.error(f"Sync API error {response.status}: {error_text}")
-                        raise Exception(f"Generation failed: HTTP {response.status}")
-
-                    result = await response.json()
-                    logger.info(f"Sync generation completed for {model_id}")
-                    return result
+            session = self.session
+            url = f"{self.SYNC_API_URL}/{model_id}"
+
+            logger.info(f"Submitting sync request to {model_id}")
+
+            async with session.post(
+                url,
+                json=input_data,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=300)  # 5 minute timeout
+            ) as response:
+                if response.status not in (200, 201):
+                    error_text = await response.text()
+                    logger.error(f"Sync API error {response.status}: {error_text}")
+                    raise Exception(f"Generation failed: HTTP {response.status}")
+
+                result = await response.json()
+                logger.info(f"Sync generation completed for {model_id}")
+                return result
 
         except asyncio.TimeoutError:
             logger.error(f"Sync generation timeout for {model_id}")
@@ -420,8 +348,8 @@ class FalAIClient:
     async def poll_request(
         self,
         request_id: str,
-        max_attempts: int = 120,
-        poll_interval: int = 1
+        expected_duration: Optional[float] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Poll a request until completion.
@@ -431,10 +359,14 @@ class FalAIClient:
         - status == "failed" → Raises exception
         - Timeout exceeded → Raises exception
 
+        Checks are scheduled around the expected completion time (see
+        poll_schedule.next_poll_delay) instead of a fixed interval.
+
         Args:
             request_id: Request ID to poll
-            max_attempts: Maximum number of poll attempts
-            poll_interval: Seconds between polls (default: 1 second)
+            expected_duration: Predicted generation time in seconds
+                (defaults to STATUS_POLL_DEFAULT_ESTIMATE)
+            timeout: Seconds to wait before giving up (defaults to STATUS_POLL_TIMEOUT)
 
         Returns:
             Final result when completed
@@ -442,17 +374,22 @@ class FalAIClient:
         Raises:
             Exception: If request fails or times out
         """
+        expected = expected_duration or settings.STATUS_POLL_DEFAULT_ESTIMATE
+        timeout = timeout or settings.STATUS_POLL_TIMEOUT
+        loop = asyncio.get_running_loop()
+        started = loop.time()
         attempts = 0
 
-        while attempts < max_attempts:
+        # First check near the expected completion time
+        await asyncio.sleep(next_poll_delay(0, expected))
+
+        while loop.time() - started < timeout:
             try:
                 status_response = await self.get_request_status(request_id)
-                current_status = status_response.get('status')
+                current_status = self.normalize_status(status_response.get('status'))
+                attempts += 1
 
-                logger.debug(
-                    f"Poll {request_id}: status={current_status} "
-                    f"(attempt {attempts + 1}/{max_attempts})"
-                )
+                logger.debug(f"Poll {request_id}: status={current_status} (attempt {attempts})")
 
                 if current_status == 'completed':
                     logger.info(f"Request {request_id} completed successfully")
@@ -464,9 +401,7 @@ class FalAIClient:
                     raise Exception(f"Generation failed: {error_msg}")
 
                 # Still processing, wait before next poll
-                attempts += 1
-                if attempts < max_attempts:
-                    await asyncio.sleep(poll_interval)
+                await asyncio.sleep(next_poll_delay(loop.time() - started, expected))
 
             except Exception as e:
                 if "Generation failed" in str(e):
@@ -474,8 +409,8 @@ class FalAIClient:
                 logger.error(f"Error polling request {request_id}: {str(e)}")
                 raise
 
-        logger.error(f"Request {request_id} timeout after {max_attempts * poll_interval} seconds")
+        logger.error(f"Request {request_id} timeout after {timeout} seconds ({attempts} polls)")
         raise Exception(
             f"Request timeout - generation did not complete within "
-            f"{max_attempts * poll_interval} seconds"
+            f"{timeout} seconds"
         )
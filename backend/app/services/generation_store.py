@@ -0,0 +1,121 @@
+from app.services.redis import RedisService
+from app.models.schema import GenerationStatus
+from app.core.config import get_settings
+from typing import Optional, Dict, Any, List
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TERMINAL_STATUSES = {GenerationStatus.COMPLETED.value, GenerationStatus.FAILED.value}
+
+
+def serialize_for_redis(data):
+    """Convert data to JSON-serializable format"""
+    return json.loads(json.dumps(data, default=str))
+
+
+class GenerationStore:
+    """
+    Storage for generation records (generation:{request_id}) and the
+    index of in-flight Fal.ai requests that still need status updates.
+    Every write is also published on generation:events.
+    """
+
+    INFLIGHT_KEY = "generation:inflight"
+    EVENTS_CHANNEL = "generation:events"
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+
+    @staticmethod
+    def record_key(request_id: str) -> str:
+        return f"generation:{request_id}"
+
+    async def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get a generation record"""
+        return await self.redis.get(self.record_key(request_id))
+
+    async def save(self, request_data: Dict[str, Any]) -> bool:
+        """
+        Store a generation record with the generation TTL and notify
+        watchers on the generation events channel
+        """
+        return await self.redis.set_and_publish(
+            self.record_key(request_data["request_id"]),
+            serialize_for_redis(request_data),
+            self.EVENTS_CHANNEL,
+            ttl=settings.CACHE_TTL_GENERATION
+        )
+
+    async def update(
+        self,
+        request_id: str,
+        changes: Dict[str, Any],
+        if_active: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Atomically apply changes to an existing generation record
+
+        Concurrent writers (status poller, webhook, workers) never lose each
+        other's updates; the write is retried if the record changed underneath.
+
+        Args:
+            request_id: Request to update
+            changes: Fields to set
+            if_active: Leave records that are already completed/failed untouched
+
+        Returns:
+            The updated record, or None if the record does not exist (or
+            was already terminal with if_active)
+        """
+        def apply(request_data):
+            if not request_data:
+                return None
+            if if_active and request_data.get("status") in TERMINAL_STATUSES:
+                return None
+            request_data.update(changes)
+            return serialize_for_redis(request_data)
+
+        return await self.redis.update_json(
+            self.record_key(request_id),
+            apply,
+            ttl=settings.CACHE_TTL_GENERATION,
+            channel=self.EVENTS_CHANNEL
+        )
+
+    # Fal.ai request id -> our request id (for webhooks)
+    @staticmethod
+    def fal_index_key(fal_request_id: str) -> str:
+        return f"fal:request:{fal_request_id}"
+
+    async def link_fal_request(self, fal_request_id: str, request_id: str):
+        """Remember which generation a Fal.ai request belongs to"""
+        await self.redis.set(
+            self.fal_index_key(fal_request_id),
+            request_id,
+            ttl=settings.CACHE_TTL_GENERATION
+        )
+
+    async def resolve_fal_request(self, fal_request_id: str) -> Optional[str]:
+        """Map a Fal.ai request id back to our request id"""
+        return await self.redis.get(self.fal_index_key(fal_request_id))
+
+    # In-flight tracking
+    async def track(self, request_id: str, next_poll_at: Optional[float] = None):
+        """Schedule a request for status polling at next_poll_at (epoch seconds)"""
+        await self.redis.zadd(self.INFLIGHT_KEY, {request_id: next_poll_at or time.time()})
+
+    async def untrack(self, request_id: str):
+        """Stop polling a request"""
+        await self.redis.zrem(self.INFLIGHT_KEY, request_id)
+
+    async def due(self, now: float, limit: int) -> List[str]:
+        """Get up to `limit` in-flight requests whose next poll is due"""
+        return await self.redis.zrangebyscore(self.INFLIGHT_KEY, 0, now, start=0, num=limit)
+
+    async def inflight_count(self) -> int:
+        """Number of requests still being tracked"""
+        return await self.redis.zcard(self.INFLIGHT_KEY)
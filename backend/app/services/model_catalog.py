@@ -0,0 +1,136 @@
+from app.services.search import SearchIndex, SuggestIndex
+from app.core.compression import EncodedBody
+from typing import Optional, List, Dict, Any, Tuple, Callable
+import json
+
+# Metadata kept by view=lite: what the model grid and selector render.
+# "pinned" is deliberately included: both show a badge for pinned models.
+LITE_FIELDS = ("display_name", "category", "thumbnail_url", "pinned")
+
+
+def project_model(model: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Copy of `model` with only endpoint_id and the given metadata fields"""
+    metadata = model.get('metadata') or {}
+    return {
+        "endpoint_id": model.get('endpoint_id'),
+        "metadata": {field: metadata[field] for field in fields if field in metadata}
+    }
+
+
+class ModelCatalog:
+    """
+    Indexed, read-only view of one catalog version
+
+    Built once per version so lookups never scan the model list:
+    - endpoint_id hash index
+    - per-category, per-status and per-tag posting lists (case-insensitive keys)
+    - precomputed sorted category list
+    - BM25 full-text SearchIndex
+    - prefix SuggestIndex for typeahead
+    Posting lists preserve catalog order. The text indexes are the expensive
+    part to build; pass `indexes` (from index_state()) to restore them.
+
+    Responses derived from a version are rendered to JSON bytes once
+    (render()) and kept with it, along with their compressed variants, so
+    they are dropped with the version.
+    """
+
+    RENDER_MEMO_SIZE = 1024
+
+    def __init__(
+        self,
+        models: List[Dict[str, Any]],
+        version: int,
+        indexes: Optional[Dict[str, Any]] = None
+    ):
+        self.models = models
+        self.version = version
+        self.by_endpoint: Dict[str, Dict[str, Any]] = {}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_status: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_tag: Dict[str, List[Dict[str, Any]]] = {}
+        self._rendered: Dict[Tuple, EncodedBody] = {}
+        categories = set()
+
+        for model in models:
+            endpoint_id = model.get('endpoint_id')
+            if endpoint_id:
+                self.by_endpoint.setdefault(endpoint_id, model)
+
+            metadata = model.get('metadata') or {}
+            category = metadata.get('category')
+            if category:
+                categories.add(category)
+                self.by_category.setdefault(category.lower(), []).append(model)
+            status = metadata.get('status')
+            if status:
+                self.by_status.setdefault(status, []).append(model)
+            for tag in set(t.lower() for t in metadata.get('tags') or []):
+                self.by_tag.setdefault(tag, []).append(model)
+
+        self.categories: List[str] = sorted(categories)
+        if indexes:
+            self.search_index = SearchIndex.from_state(models, indexes["search"])
+            self.suggest_index = SuggestIndex.from_state(models, indexes["suggest"])
+        else:
+            self.search_index = SearchIndex(models)
+            self.suggest_index = SuggestIndex(models)
+
+    def index_state(self) -> Dict[str, Any]:
+        """Plain-data form of the text indexes (for snapshots)"""
+        return {
+            "search": self.search_index.to_state(),
+            "suggest": self.suggest_index.to_state()
+        }
+
+    def render(self, key: Tuple, content: Callable[[], Any]) -> EncodedBody:
+        """
+        JSON body of a response derived from this version, rendered on first use
+
+        Args:
+            key: Identifies the response within this version (e.g. ("models", category, skip, limit))
+            content: Builds the JSON-serializable response body
+
+        Returns:
+            EncodedBody whose raw bytes are identical to what JSONResponse would produce
+        """
+        body = self._rendered.get(key)
+        if body is None:
+            body = EncodedBody(json.dumps(
+                content(), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8"))
+            if len(self._rendered) >= self.RENDER_MEMO_SIZE:
+                self._rendered.clear()
+            self._rendered[key] = body
+        return body
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def get(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
+        """Model by endpoint_id (e.g. 'fal-ai/flux/dev'), or None"""
+        return self.by_endpoint.get(endpoint_id)
+
+    def in_category(self, category: str) -> List[Dict[str, Any]]:
+        """Models in a category (case-insensitive)"""
+        return self.by_category.get(category.lower(), [])
+
+    def with_status(self, status: str) -> List[Dict[str, Any]]:
+        """Models with a given metadata.status"""
+        return self.by_status.get(status, [])
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Models with status 'active'"""
+        return self.with_status('active')
+
+    def with_tag(self, tag: str) -> List[Dict[str, Any]]:
+        """Models carrying a tag (case-insensitive)"""
+        return self.by_tag.get(tag.lower(), [])
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Full-text search ranked by relevance"""
+        return self.search_index.search(query, limit)
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Typeahead completions for a prefix"""
+        return self.suggest_index.suggest(prefix, limit)
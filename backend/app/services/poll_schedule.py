@@ -0,0 +1,99 @@
+from app.services.redis import RedisService
+from app.core.config import get_settings
+from typing import Optional
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def next_poll_delay(
+    elapsed: float,
+    expected: float,
+    min_interval: Optional[float] = None,
+    max_interval: Optional[float] = None,
+    jitter: Optional[float] = None
+) -> float:
+    """
+    Seconds to wait before the next status check of a generation
+
+    The schedule has three phases around the predicted finish time:
+    - before the ETA window: sleep straight to the start of the window
+    - inside the window (ETA ± 10%): tight checks
+    - past the window: back off proportionally to the overrun, so the gaps
+      grow geometrically (each poll waits half the time already overdue)
+
+    Args:
+        elapsed: Seconds since the request was submitted
+        expected: Predicted total duration in seconds
+        min_interval: Smallest allowed delay (defaults to STATUS_POLL_MIN_INTERVAL)
+        max_interval: Backoff ceiling once past the ETA window (defaults to STATUS_POLL_MAX_INTERVAL)
+        jitter: Relative random spread applied to the delay (defaults to STATUS_POLL_JITTER)
+
+    Returns:
+        Delay in seconds
+    """
+    min_interval = settings.STATUS_POLL_MIN_INTERVAL if min_interval is None else min_interval
+    max_interval = settings.STATUS_POLL_MAX_INTERVAL if max_interval is None else max_interval
+    jitter = settings.STATUS_POLL_JITTER if jitter is None else jitter
+
+    window = max(expected * 0.1, min_interval)
+
+    if elapsed < expected - window:
+        # Land somewhere in the first half of the window so requests
+        # submitted together don't all wake up at once
+        delay = (expected - window) - elapsed + random.uniform(0, window / 2)
+    else:
+        if elapsed < expected + window:
+            delay = window / 4
+        else:
+            delay = min((elapsed - expected) * 0.5, max_interval)
+        if jitter:
+            delay *= random.uniform(1 - jitter, 1 + jitter)
+    return max(delay, min_interval)
+
+
+class LatencyTracker:
+    """
+    Per-model completion latency history (exponentially weighted moving
+    average) used to predict when a generation will finish
+
+    Samples are folded in with an atomic read-modify-write, so concurrent
+    completions all count; each one also renews the key's TTL
+    (STATUS_POLL_LATENCY_TTL).
+    """
+
+    ALPHA = 0.2
+    MIN_SAMPLES = 3
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+
+    @staticmethod
+    def _key(model_id: str) -> str:
+        return f"fal:latency:{model_id}"
+
+    async def record(self, model_id: str, duration: float):
+        """Add an observed completion time for a model"""
+        def update(stats):
+            stats = stats or {"ewma": duration, "count": 0}
+            stats["ewma"] = stats["ewma"] + self.ALPHA * (duration - stats["ewma"])
+            stats["count"] += 1
+            return stats
+
+        await self.redis.update_json(self._key(model_id), update, ttl=settings.STATUS_POLL_LATENCY_TTL)
+
+    async def estimate(self, model_id: str, duration_estimate: Optional[float] = None) -> float:
+        """
+        Predicted duration for a model
+
+        Uses observed history once there are enough samples, otherwise the
+        catalog's metadata.duration_estimate, otherwise STATUS_POLL_DEFAULT_ESTIMATE.
+        """
+        stats = await self.redis.get(self._key(model_id))
+        if stats and stats.get("count", 0) >= self.MIN_SAMPLES:
+            return stats["ewma"]
+        if duration_estimate:
+            return float(duration_estimate)
+        return settings.STATUS_POLL_DEFAULT_ESTIMATE
@@ -1,9 +1,7 @@
 from app.services.redis import RedisService
 from app.core.config import get_settings
-import asyncio
 import logging
-from typing import Optional
-from datetime import datetime
+from typing import Optional, List, Tuple
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -11,72 +9,100 @@ settings = get_settings()
 class QueueService:
     """
     Manages request queuing and concurrent execution limits
+
+    Requests are entries in a Redis stream read through a consumer group:
+    - Delivery (XREADGROUP) atomically moves an entry into the group's
+      pending list, so the pending count is the number of active tasks and
+      nothing is lost if a process dies after taking an entry.
+    - Completion acknowledges and deletes the entry, and pushes a wakeup
+      token for a dispatcher waiting on a free slot.
+    - Entries left pending longer than QUEUE_RECLAIM_IDLE (their dispatcher
+      or worker died) are claimed again; running tasks touch their entry
+      on each attempt so they are not.
     """
 
+    STREAM_KEY = "generation_stream"
+    GROUP = "dispatchers"
+    CONSUMER = "dispatcher"  # Only the elected dispatcher reads, so one name
+    SLOT_KEY = "generation_stream:slots"
+
     def __init__(self, redis: RedisService):
         self.redis = redis
-        self.queue_key = "generation_queue"
-        self.active_key = "active_tasks"
         self.max_concurrent = settings.MAX_CONCURRENT_REQUESTS
 
+    async def setup(self) -> bool:
+        """Create the stream and consumer group if missing"""
+        return await self.redis.xgroup_create(self.STREAM_KEY, self.GROUP)
+
     async def enqueue(self, request_id: str) -> int:
         """
         Add request to queue
 
         Returns queue position
         """
-        await self.redis.lpush(self.queue_key, request_id)
-        queue_length = await self.redis.llen(self.queue_key)
+        await self.redis.xadd(self.STREAM_KEY, {"request_id": request_id})
+        queue_length = await self.redis.xlen(self.STREAM_KEY) - await self.active_count()
         logger.info(f"Request {request_id} added to queue. Queue length: {queue_length}")
         return queue_length
 
-    async def dequeue(self) -> Optional[str]:
+    async def dequeue(self, count: int, block: float) -> List[Tuple[str, str]]:
         """
-        Get next request from queue if capacity available
+        Take up to `count` requests, waiting up to `block` seconds for one
 
-        Returns request_id or None
+        Returns [(entry_id, request_id)]; each must be acknowledged with
+        mark_complete once processed
         """
-        # Check if we have capacity
-        active_count = await self.redis.scard(self.active_key)
-
-        if active_count >= self.max_concurrent:
-            logger.debug(f"At capacity ({active_count}/{self.max_concurrent}). Not dequeuing.")
-            return None
-
-        # Pop from queue
-        request_id = await self.redis.rpop(self.queue_key)
-
-        if request_id:
-            # Add to active set
-            await self.redis.sadd(self.active_key, request_id)
-            logger.info(f"Request {request_id} dequeued. Active: {active_count + 1}/{self.max_concurrent}")
-
-        return request_id
-
-    async def mark_complete(self, request_id: str):
+        entries = await self.redis.xreadgroup(
+            self.STREAM_KEY, self.GROUP, self.CONSUMER, count, int(block * 1000)
+        )
+        taken = [(entry_id, fields.get("request_id")) for entry_id, fields in entries]
+        for entry_id, request_id in taken:
+            logger.info(f"Request {request_id} dequeued ({entry_id})")
+        return taken
+
+    async def reclaim(self, count: int) -> List[Tuple[str, str]]:
+        """Take over up to `count` requests whose dispatch or worker was lost"""
+        entries = await self.redis.xautoclaim(
+            self.STREAM_KEY, self.GROUP, self.CONSUMER, int(settings.QUEUE_RECLAIM_IDLE * 1000), count
+        )
+        taken = [(entry_id, fields.get("request_id")) for entry_id, fields in entries]
+        for entry_id, request_id in taken:
+            logger.warning(f"Request {request_id} reclaimed after {settings.QUEUE_RECLAIM_IDLE}s idle ({entry_id})")
+        return taken
+
+    async def touch(self, entry_id: str) -> bool:
+        """Mark a dequeued request as still being worked on"""
+        return await self.redis.xtouch(self.STREAM_KEY, self.GROUP, self.CONSUMER, entry_id)
+
+    async def mark_complete(self, request_id: str, entry_id: Optional[str]):
         """
-        Mark request as complete and remove from active set
+        Acknowledge a processed request and free its slot
         """
-        await self.redis.srem(self.active_key, request_id)
-        active_count = await self.redis.scard(self.active_key)
+        if not entry_id:
+            return
+        if await self.redis.xack_delete(self.STREAM_KEY, self.GROUP, entry_id):
+            await self.redis.signal(self.SLOT_KEY, self.max_concurrent)
+        active_count = await self.active_count()
         logger.info(f"Request {request_id} completed. Active: {active_count}/{self.max_concurrent}")
 
+    async def wait_for_slot(self, timeout: float) -> bool:
+        """Block until a request completes (True) or `timeout` passes"""
+        return await self.redis.wait_signal(self.SLOT_KEY, timeout)
+
+    async def active_count(self) -> int:
+        """Requests dequeued but not yet completed"""
+        return await self.redis.xpending_count(self.STREAM_KEY, self.GROUP)
+
     async def get_queue_position(self, request_id: str) -> Optional[int]:
         """
         Get position of request in queue (1-indexed)
         Returns None if not in queue
         """
         try:
-            queue_length = await self.redis.llen(self.queue_key)
-
-            for i in range(queue_length):
-                item = await self.redis.lindex(self.queue_key, i)
-                if item:
-                    # Handle both string and dict responses
-                    queued_id = item if isinstance(item, str) else item
-                    if queued_id == request_id:
-                        return queue_length - i
-
+            waiting = await self.redis.xrange_after(self.STREAM_KEY, self.GROUP)
+            for position, (_, fields) in enumerate(waiting, start=1):
+                if fields.get("request_id") == request_id:
+                    return position
             return None
         except Exception as e:
             logger.error(f"Error getting queue position: {e}")
@@ -84,9 +110,10 @@ class QueueService:
 
     async def get_metrics(self) -> dict:
         """Get current queue metrics"""
+        active = await self.active_count()
         return {
-            "queued": await self.redis.llen(self.queue_key),
-            "active": await self.redis.scard(self.active_key),
+            "queued": max(await self.redis.xlen(self.STREAM_KEY) - active, 0),
+            "active": active,
             "capacity": self.max_concurrent,
-            "available_slots": self.max_concurrent - await self.redis.scard(self.active_key)
+            "available_slots": self.max_concurrent - active
         }
@@ -0,0 +1,201 @@
+from app.services.redis import RedisService
+from app.core.config import get_settings
+from typing import Optional, NamedTuple, Tuple, Dict
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int  # Requests per minute for the caller's tier
+    remaining: int  # Cost units that could be spent right now
+    retry_after: float  # Seconds until this request would be allowed (0 if allowed)
+    reset_after: float  # Seconds until the bucket is full again
+
+
+class _Lease:
+    """Tokens taken from one identity's bucket, spent in-process"""
+
+    __slots__ = ("tokens", "result", "expires", "denied_until")
+
+    def __init__(self):
+        self.tokens = 0
+        self.result: Optional[RateLimitResult] = None  # Bucket state when last leased
+        self.expires = 0.0
+        self.denied_until = 0.0
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter backed by Redis
+
+    Each identity (key:<API key hash>, user:<X-User-ID> or ip:<address>) has
+    one key holding its theoretical arrival time; a Lua script reads it,
+    decides and writes it back in a single round trip, using the Redis clock.
+    Unlike a fixed window, the rate is enforced smoothly: at most
+    RATE_LIMIT_BURST_SECONDS' worth of requests can be spent at once, then
+    they are admitted at the steady rate. Requests are charged by route
+    (RATE_LIMIT_ROUTE_COSTS), and API keys listed in the rate_limit:tiers hash
+    get their tier's rate. Other identities are unauthenticated (anyone can
+    send any X-User-ID), so they always get the default rate.
+
+    With RATE_LIMIT_LEASE_SIZE set, a process takes up to that many tokens
+    per identity in one call and admits requests from them locally:
+    - The next block is fetched in the background once half the lease is
+      spent, so a steady caller rarely waits on Redis.
+    - Leased tokens are already charged to the shared bucket, so replicas
+      together stay within the limit; since they may be spent up to
+      RATE_LIMIT_LEASE_TTL later, any window can over-admit by at most one
+      lease per process.
+    - A denial is remembered until its Retry-After, so 429s need no round
+      trip either.
+    - Unspent tokens go back to the bucket when the lease expires.
+    """
+
+    KEY_PREFIX = "rate_limit:gcra:"
+    TIERS_KEY = "rate_limit:tiers"
+    TIERED_PREFIX = "key:"  # Identities that may hold a tier
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+        self.route_costs = []
+        for route, cost in settings.RATE_LIMIT_ROUTE_COSTS.items():
+            method, _, path = route.partition(" ")
+            self.route_costs.append((method.upper(), settings.API_V1_PREFIX + path.strip(), cost))
+        # Longest prefix first, so /generate/sync wins over /generate
+        self.route_costs.sort(key=lambda route: len(route[1]), reverse=True)
+
+        self._leases: Dict[str, _Lease] = {}
+        self._refills: Dict[str, asyncio.Task] = {}
+        self._tasks: set = set()
+        self._next_sweep = 0.0
+
+    def cost(self, method: str, path: str) -> int:
+        """Cost of a request, from the most specific matching route"""
+        for route_method, prefix, cost in self.route_costs:
+            if method == route_method and (path == prefix or path.startswith(prefix + "/")):
+                return cost
+        return 1
+
+    async def hit(self, identity: str, cost: int = 1) -> Optional[RateLimitResult]:
+        """
+        Charge a request to `identity`
+
+        Returns:
+            The decision, or None if Redis is unavailable (callers fail open)
+        """
+        if settings.RATE_LIMIT_LEASE_SIZE <= 0:
+            charged = await self._charge(identity, cost)
+            return charged[0] if charged else None
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        # A refill may come back with fewer tokens than needed (e.g. a
+        # background one for the minimum), so try twice
+        for _ in range(2):
+            lease = self._leases.get(identity)
+            if lease is not None and lease.expires > now:
+                if lease.tokens >= cost:
+                    return self._spend(identity, lease, cost)
+                if lease.denied_until > now:
+                    return lease.result._replace(retry_after=lease.denied_until - now)
+
+            lease = await self._refill(identity, cost)
+            if lease is None:
+                return None
+            now = time.monotonic()
+            if lease.tokens < cost and lease.denied_until > now:
+                return lease.result._replace(retry_after=lease.denied_until - now)
+        if lease.tokens >= cost:
+            return self._spend(identity, lease, cost)
+        charged = await self._charge(identity, cost)
+        return charged[0] if charged else None
+
+    async def close(self):
+        """Return every unspent leased token and wait for pending calls"""
+        for identity, lease in self._leases.items():
+            self._refund(identity, lease)
+        self._leases.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _charge(self, identity: str, cost: int, lease: int = 0) -> Optional[Tuple[RateLimitResult, int]]:
+        """One round trip to the bucket: (decision, tokens granted)"""
+        result = await self.redis.gcra(
+            self.KEY_PREFIX + identity,
+            self.TIERS_KEY,
+            identity if identity.startswith(self.TIERED_PREFIX) else "",
+            cost,
+            settings.RATE_LIMIT_BURST_SECONDS,
+            settings.RATE_LIMIT_PER_MINUTE,
+            settings.RATE_LIMIT_TIERS,
+            lease=lease
+        )
+        if result is None:
+            return None
+        allowed, limit, remaining, retry_after_ms, reset_after_ms, granted = result
+        return RateLimitResult(bool(allowed), limit, remaining, retry_after_ms / 1000, reset_after_ms / 1000), granted
+
+    def _spend(self, identity: str, lease: _Lease, cost: int) -> RateLimitResult:
+        lease.tokens -= cost
+        if lease.tokens * 2 < settings.RATE_LIMIT_LEASE_SIZE and identity not in self._refills:
+            self._start_refill(identity, 1)
+        return lease.result._replace(allowed=True, remaining=lease.result.remaining + lease.tokens, retry_after=0)
+
+    async def _refill(self, identity: str, minimum: int) -> Optional[_Lease]:
+        """Wait for a lease refill, joining one already in flight"""
+        task = self._refills.get(identity) or self._start_refill(identity, minimum)
+        # Shielded: a disconnecting client must not cancel a refill others wait on
+        return await asyncio.shield(task)
+
+    def _start_refill(self, identity: str, minimum: int) -> asyncio.Task:
+        task = asyncio.create_task(self._lease(identity, minimum))
+        self._refills[identity] = task
+        task.add_done_callback(lambda _: self._refills.pop(identity, None))
+        return task
+
+    async def _lease(self, identity: str, minimum: int) -> Optional[_Lease]:
+        """Take at least `minimum` and up to RATE_LIMIT_LEASE_SIZE tokens"""
+        charged = await self._charge(identity, minimum, settings.RATE_LIMIT_LEASE_SIZE)
+        if charged is None:
+            return None
+        result, granted = charged
+
+        now = time.monotonic()
+        lease = self._leases.get(identity)
+        if lease is None or lease.expires <= now:
+            if lease is not None:
+                self._refund(identity, lease)
+            lease = self._leases[identity] = _Lease()
+        lease.tokens += granted
+        lease.result = result
+        lease.expires = now + settings.RATE_LIMIT_LEASE_TTL
+        lease.denied_until = 0.0 if result.allowed else now + result.retry_after
+        return lease
+
+    def _refund(self, identity: str, lease: _Lease):
+        """Give a lease's unspent tokens back to the bucket (in the background)"""
+        if lease.tokens <= 0 or lease.result is None:
+            return
+        task = asyncio.create_task(
+            self.redis.gcra_refund(self.KEY_PREFIX + identity, lease.tokens, 60000 / lease.result.limit)
+        )
+        lease.tokens = 0
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _sweep(self, now: float):
+        """Drop expired leases (refunding them), at most once per lease TTL"""
+        self._next_sweep = now + settings.RATE_LIMIT_LEASE_TTL
+        expired = [
+            identity for identity, lease in self._leases.items()
+            if lease.expires <= now and identity not in self._refills
+        ]
+        for identity in expired:
+            self._refund(identity, self._leases.pop(identity))
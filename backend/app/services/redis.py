@@ -1,6 +1,7 @@
 import redis.asyncio as aioredis
 from redis.asyncio import Redis
-from typing import Optional, Any
+from redis.exceptions import WatchError
+from typing import Optional, Any, Callable, Iterable, List, Dict, Tuple
 import json
 import logging
 from app.core.config import get_settings
@@ -8,10 +9,99 @@ from app.core.config import get_settings
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Compare-and-act scripts so only the lock owner can extend or release it
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Delete every key listed in the given index sets, then the sets themselves
+_DELETE_INDEXED_SCRIPT = """
+local deleted = 0
+for _, index in ipairs(KEYS) do
+    local members = redis.call('SMEMBERS', index)
+    for i = 1, #members, 1000 do
+        deleted = deleted + redis.call('DEL', unpack(members, i, math.min(i + 999, #members)))
+    end
+    redis.call('DEL', index)
+end
+return deleted
+"""
+
+# GCRA rate limiter: one round trip decides and records a request.
+# KEYS[1]: theoretical arrival time (TAT, ms); KEYS[2]: tier assignments (hash)
+# ARGV: identity ('' for none), cost, lease, burst seconds, default rate, then tier/rate
+# pairs (rates in requests per minute). Takes `cost` tokens, or as many as
+# are available up to `lease`. Uses the server clock so replicas agree.
+# Returns {allowed, rate, remaining, retry_after_ms, reset_after_ms, granted}.
+_GCRA_SCRIPT = """
+local rate = tonumber(ARGV[5])
+local tier = ARGV[1] ~= '' and redis.call('HGET', KEYS[2], ARGV[1])
+if tier then
+    for i = 6, #ARGV - 1, 2 do
+        if ARGV[i] == tier then
+            rate = tonumber(ARGV[i + 1])
+            break
+        end
+    end
+end
+
+local cost = tonumber(ARGV[2])
+local emission = 60000 / rate
+local burst = math.max(math.floor(rate * tonumber(ARGV[4]) / 60), 1)
+local tolerance = math.max(burst, cost) * emission
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+
+if tat + cost * emission - now > tolerance then
+    local remaining = math.max(math.floor((tolerance - (tat - now)) / emission), 0)
+    return {0, rate, remaining, math.ceil(tat + cost * emission - now - tolerance), math.ceil(tat - now), 0}
+end
+
+local available = math.floor((tolerance - (tat - now)) / emission)
+local granted = math.max(math.min(tonumber(ARGV[3]), available), cost)
+local new_tat = tat + granted * emission
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+local remaining = math.max(math.floor((tolerance - (new_tat - now)) / emission), 0)
+return {1, rate, remaining, 0, math.ceil(new_tat - now), granted}
+"""
+
+# Give unspent leased tokens back to a GCRA bucket
+# KEYS[1]: TAT key; ARGV: tokens, ms per token
+_GCRA_REFUND_SCRIPT = """
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat then
+    return 0
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local new_tat = tat - tonumber(ARGV[1]) * tonumber(ARGV[2])
+if new_tat <= now then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+end
+return 1
+"""
+
 class RedisService:
     def __init__(self):
         self.redis: Optional[Redis] = None
         self.connection_pool: Optional[aioredis.ConnectionPool] = None
+        # Undecoded client for raw bytes (e.g. cached HTTP responses)
+        self.binary: Optional[Redis] = None
+        self.binary_pool: Optional[aioredis.ConnectionPool] = None
 
     async def connect(self):
         """Initialize Redis connection pool"""
@@ -25,6 +115,14 @@ class RedisService:
                 decode_responses=True
             )
             self.redis = aioredis.Redis(connection_pool=self.connection_pool)
+            self.binary_pool = aioredis.ConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                max_connections=settings.REDIS_MAX_CONNECTIONS
+            )
+            self.binary = aioredis.Redis(connection_pool=self.binary_pool)
             # Test connection
             await self.redis.ping()
             logger.info("Redis connection established")
@@ -37,6 +135,9 @@ class RedisService:
         if self.redis:
             await self.redis.close()
             await self.connection_pool.disconnect()
+        if self.binary:
+            await self.binary.close()
+            await self.binary_pool.disconnect()
             logger.info("Redis connection closed")
 
     async def get(self, key: str) -> Optional[Any]:
@@ -63,6 +164,125 @@ class RedisService:
             logger.error(f"Redis SET error for key {key}: {e}")
             return False
 
+    async def set_and_publish(
+        self,
+        key: str,
+        value: Any,
+        channel: str,
+        ttl: Optional[int] = None
+    ) -> bool:
+        """Set value and publish it on a pub/sub channel in one round trip"""
+        try:
+            serialized = json.dumps(value)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if ttl:
+                    pipe.setex(key, ttl, serialized)
+                else:
+                    pipe.set(key, serialized)
+                pipe.publish(channel, serialized)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET+PUBLISH error for key {key}: {e}")
+            return False
+
+    async def set_many(
+        self,
+        mapping: dict,
+        ttl: Optional[int] = None,
+        channel: Optional[str] = None,
+        message: Any = None,
+        hashes: Optional[dict] = None
+    ) -> bool:
+        """
+        Set several JSON values (and optionally publish a message) in one
+        MULTI/EXEC transaction, so readers never see a partial update
+
+        `hashes` maps hash keys to {field: value} updates applied in the same
+        transaction; a value of None deletes the field.
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for key, value in mapping.items():
+                    serialized = json.dumps(value)
+                    if ttl:
+                        pipe.setex(key, ttl, serialized)
+                    else:
+                        pipe.set(key, serialized)
+                for key, fields in (hashes or {}).items():
+                    updates = {f: json.dumps(v) for f, v in fields.items() if v is not None}
+                    removals = [f for f, v in fields.items() if v is None]
+                    if updates:
+                        pipe.hset(key, mapping=updates)
+                    if removals:
+                        pipe.hdel(key, *removals)
+                if channel:
+                    pipe.publish(channel, json.dumps(message))
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis multi-SET error for keys {list(mapping) + list(hashes or {})}: {e}")
+            return False
+
+    async def update_json(
+        self,
+        key: str,
+        update_fn: Callable[[Any], Optional[Any]],
+        ttl: Optional[int] = None,
+        channel: Optional[str] = None,
+        retries: int = 10
+    ) -> Optional[Any]:
+        """
+        Atomically read-modify-write a JSON value (optimistic WATCH/MULTI)
+
+        Args:
+            key: Key holding the JSON value
+            update_fn: Receives the current value (None if missing) and
+                returns the new value, or None to leave the key untouched
+            ttl: Optional TTL for the new value
+            channel: If given, the new value is also published here
+                inside the same transaction
+            retries: Attempts before giving up on concurrent writers
+
+        Returns:
+            The new value, or None if nothing was written
+        """
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for _ in range(retries):
+                    try:
+                        await pipe.watch(key)
+                        current = await pipe.get(key)
+                        value = update_fn(json.loads(current) if current else None)
+                        if value is None:
+                            await pipe.unwatch()
+                            return None
+                        serialized = json.dumps(value)
+                        pipe.multi()
+                        if ttl:
+                            pipe.setex(key, ttl, serialized)
+                        else:
+                            pipe.set(key, serialized)
+                        if channel:
+                            pipe.publish(channel, serialized)
+                        await pipe.execute()
+                        return value
+                    except WatchError:
+                        continue
+            logger.warning(f"Redis update of key {key} abandoned after {retries} conflicting writes")
+            return None
+        except Exception as e:
+            logger.error(f"Redis atomic update error for key {key}: {e}")
+            return None
+
+    async def publish(self, channel: str, value: Any) -> int:
+        """Publish a JSON message on a pub/sub channel"""
+        try:
+            return await self.redis.publish(channel, json.dumps(value))
+        except Exception as e:
+            logger.error(f"Redis PUBLISH error for channel {channel}: {e}")
+            return 0
+
     async def delete(self, key: str) -> bool:
         """Delete key from Redis"""
         try:
@@ -96,57 +316,175 @@ class RedisService:
             logger.error(f"Redis EXPIRE error for key {key}: {e}")
             return False
 
-    # Queue operations
-    async def lpush(self, key: str, value: Any) -> int:
-        """Push to left of list"""
+    async def gcra(
+        self,
+        key: str,
+        tiers_key: str,
+        identity: str,
+        cost: int,
+        burst_seconds: float,
+        default_rate: int,
+        tiers: Dict[str, int],
+        lease: int = 0
+    ) -> Optional[List[int]]:
+        """
+        Charge `cost` against a GCRA bucket in one round trip
+
+        Args:
+            key: Bucket (theoretical arrival time) key
+            tiers_key: Hash of identity -> tier name
+            identity: Field looked up in `tiers_key` ('' for the default rate)
+            burst_seconds: Burst allowance, as seconds' worth of the rate
+            default_rate: Requests per minute for identities without a tier
+            tiers: Requests per minute per tier name
+            lease: Take up to this many tokens if available (at least `cost`)
+
+        Returns:
+            [allowed, rate, remaining, retry_after_ms, reset_after_ms, granted],
+            or None if Redis is unavailable
+        """
+        tier_args = [arg for tier, rate in tiers.items() for arg in (tier, rate)]
         try:
-            # If value is already a string, use it directly
-            if isinstance(value, str):
-                serialized = value
-            else:
-                serialized = json.dumps(value)
-            return await self.redis.lpush(key, serialized)
+            return await self.redis.eval(
+                _GCRA_SCRIPT, 2, key, tiers_key,
+                identity, cost, max(lease, cost), burst_seconds, default_rate, *tier_args
+            )
         except Exception as e:
-            logger.error(f"Redis LPUSH error for key {key}: {e}")
-            return 0
+            logger.error(f"Redis rate limit error for key {key}: {e}")
+            return None
 
-    async def rpop(self, key: str) -> Optional[Any]:
-        """Pop from right of list"""
+    async def gcra_refund(self, key: str, tokens: int, emission_ms: float) -> bool:
+        """Return unspent tokens to a GCRA bucket (`emission_ms` per token)"""
         try:
-            value = await self.redis.rpop(key)
-            if value:
-                # Try to parse as JSON, if fails return as string
-                try:
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    return value
-            return None
+            return bool(await self.redis.eval(_GCRA_REFUND_SCRIPT, 1, key, tokens, emission_ms))
         except Exception as e:
-            logger.error(f"Redis RPOP error for key {key}: {e}")
-            return None
-    
-    async def lindex(self, key: str, index: int) -> Optional[Any]:
-        """Get element at index in list"""
+            logger.error(f"Redis rate limit refund error for key {key}: {e}")
+            return False
+
+    # Stream operations (generation queue)
+    async def xadd(self, key: str, fields: dict) -> Optional[str]:
+        """Append an entry to a stream; returns its ID"""
         try:
-            value = await self.redis.lindex(key, index)
-            if value:
-                try:
-                    return json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    return value
-            return None
+            return await self.redis.xadd(key, fields)
         except Exception as e:
-            logger.error(f"Redis LINDEX error for key {key}: {e}")
+            logger.error(f"Redis XADD error for key {key}: {e}")
             return None
 
-    async def llen(self, key: str) -> int:
-        """Get list length"""
+    async def xlen(self, key: str) -> int:
+        """Get stream length"""
+        try:
+            return await self.redis.xlen(key)
+        except Exception as e:
+            logger.error(f"Redis XLEN error for key {key}: {e}")
+            return 0
+
+    async def xgroup_create(self, key: str, group: str) -> bool:
+        """Create a consumer group reading from the start (and the stream if missing)"""
+        try:
+            await self.redis.xgroup_create(key, group, id="0", mkstream=True)
+            return True
+        except Exception as e:
+            if "BUSYGROUP" in str(e):
+                return True
+            logger.error(f"Redis XGROUP CREATE error for key {key}: {e}")
+            return False
+
+    async def xreadgroup(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        count: int,
+        block_ms: int
+    ) -> List[Tuple[str, dict]]:
+        """
+        Read new entries for a consumer group, blocking until one arrives
+
+        Returns:
+            [(entry_id, fields)], empty if `block_ms` passed first
+        """
+        try:
+            response = await self.redis.xreadgroup(group, consumer, {key: ">"}, count=count, block=block_ms)
+            return [tuple(entry) for _, entries in response or [] for entry in entries]
+        except Exception as e:
+            logger.error(f"Redis XREADGROUP error for key {key}: {e}")
+            return []
+
+    async def xautoclaim(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        min_idle_ms: int,
+        count: int
+    ) -> List[Tuple[str, dict]]:
+        """Claim entries delivered but not acknowledged for `min_idle_ms`"""
+        try:
+            response = await self.redis.xautoclaim(key, group, consumer, min_idle_ms, start_id="0-0", count=count)
+            return [tuple(entry) for entry in response[1] if entry and entry[1] is not None]
+        except Exception as e:
+            logger.error(f"Redis XAUTOCLAIM error for key {key}: {e}")
+            return []
+
+    async def xtouch(self, key: str, group: str, consumer: str, entry_id: str) -> bool:
+        """Reset a pending entry's idle time (XCLAIM JUSTID), so it isn't reclaimed"""
+        try:
+            return bool(await self.redis.xclaim(key, group, consumer, 0, [entry_id], justid=True))
+        except Exception as e:
+            logger.error(f"Redis XCLAIM error for key {key}: {e}")
+            return False
+
+    async def xack_delete(self, key: str, group: str, entry_id: str) -> bool:
+        """Acknowledge an entry and remove it from the stream"""
         try:
-            return await self.redis.llen(key)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xack(key, group, entry_id)
+                pipe.xdel(key, entry_id)
+                acked, _ = await pipe.execute()
+            return acked > 0
         except Exception as e:
-            logger.error(f"Redis LLEN error for key {key}: {e}")
+            logger.error(f"Redis XACK error for key {key}: {e}")
+            return False
+
+    async def xpending_count(self, key: str, group: str) -> int:
+        """Number of entries delivered to a group but not yet acknowledged"""
+        try:
+            return (await self.redis.xpending(key, group))["pending"]
+        except Exception as e:
+            logger.error(f"Redis XPENDING error for key {key}: {e}")
             return 0
 
+    async def xrange_after(self, key: str, group: str) -> List[Tuple[str, dict]]:
+        """Entries not yet delivered to a group, oldest first"""
+        try:
+            groups = await self.redis.xinfo_groups(key)
+            last = next((g["last-delivered-id"] for g in groups if g["name"] == group), "0-0")
+            return [tuple(entry) for entry in await self.redis.xrange(key, min=f"({last}", max="+")]
+        except Exception as e:
+            logger.error(f"Redis XRANGE error for key {key}: {e}")
+            return []
+
+    # Blocking signals
+    async def signal(self, key: str, cap: int) -> bool:
+        """Push a wakeup token for wait_signal (keeping at most `cap` queued)"""
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.lpush(key, 1)
+                pipe.ltrim(key, 0, max(cap, 1) - 1)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis signal error for key {key}: {e}")
+            return False
+
+    async def wait_signal(self, key: str, timeout: float) -> bool:
+        """Block until a token is pushed to `key` (True) or `timeout` passes"""
+        try:
+            return await self.redis.blpop([key], timeout=timeout) is not None
+        except Exception as e:
+            logger.error(f"Redis BLPOP error for key {key}: {e}")
+            return False
+
     # Set operations
     async def sadd(self, key: str, *values: Any) -> int:
         """Add to set"""
@@ -183,6 +521,139 @@ class RedisService:
             logger.error(f"Redis SMEMBERS error for key {key}: {e}")
             return set()
 
+    # Sorted set operations
+    async def zadd(self, key: str, mapping: dict) -> int:
+        """Add members with scores to sorted set (updates existing scores)"""
+        try:
+            return await self.redis.zadd(key, mapping)
+        except Exception as e:
+            logger.error(f"Redis ZADD error for key {key}: {e}")
+            return 0
+
+    async def zrem(self, key: str, *members: str) -> int:
+        """Remove members from sorted set"""
+        try:
+            return await self.redis.zrem(key, *members)
+        except Exception as e:
+            logger.error(f"Redis ZREM error for key {key}: {e}")
+            return 0
+
+    async def zrangebyscore(
+        self,
+        key: str,
+        min_score: float,
+        max_score: float,
+        start: Optional[int] = None,
+        num: Optional[int] = None
+    ) -> list:
+        """Get sorted set members with scores in [min_score, max_score]"""
+        try:
+            return await self.redis.zrangebyscore(key, min_score, max_score, start=start, num=num)
+        except Exception as e:
+            logger.error(f"Redis ZRANGEBYSCORE error for key {key}: {e}")
+            return []
+
+    async def zcard(self, key: str) -> int:
+        """Get sorted set cardinality"""
+        try:
+            return await self.redis.zcard(key)
+        except Exception as e:
+            logger.error(f"Redis ZCARD error for key {key}: {e}")
+            return 0
+
+    # Hash operations (JSON values)
+    async def hgetall(self, key: str) -> dict:
+        """Get all fields of a hash"""
+        try:
+            values = await self.redis.hgetall(key)
+            return {field: json.loads(value) for field, value in values.items()}
+        except Exception as e:
+            logger.error(f"Redis HGETALL error for key {key}: {e}")
+            return {}
+
+    async def hmget(self, key: str, fields: list) -> list:
+        """Get several fields of a hash (None for missing fields)"""
+        if not fields:
+            return []
+        try:
+            values = await self.redis.hmget(key, fields)
+            return [json.loads(value) if value is not None else None for value in values]
+        except Exception as e:
+            logger.error(f"Redis HMGET error for key {key}: {e}")
+            return [None] * len(fields)
+
+    # Raw bytes (binary client, no JSON)
+    async def get_raw(self, key: str) -> Optional[bytes]:
+        """Get a value as stored"""
+        try:
+            return await self.binary.get(key)
+        except Exception as e:
+            logger.error(f"Redis GET error for key {key}: {e}")
+            return None
+
+    async def set_raw(
+        self,
+        key: str,
+        value: bytes,
+        ttl: int,
+        index_keys: Iterable[str] = (),
+        index_ttl: Optional[int] = None
+    ) -> bool:
+        """
+        Store bytes with a TTL and record the key in each index set
+
+        Args:
+            index_keys: Sets to add `key` to (for delete_indexed)
+            index_ttl: TTL of the index sets; should be at least the longest
+                member TTL so members never outlive their index
+        """
+        try:
+            async with self.binary.pipeline(transaction=True) as pipe:
+                pipe.setex(key, ttl, value)
+                for index in index_keys:
+                    pipe.sadd(index, key)
+                    pipe.expire(index, index_ttl or ttl)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis SET error for key {key}: {e}")
+            return False
+
+    async def delete_indexed(self, index_keys: List[str]) -> int:
+        """Delete all keys recorded in the index sets (and the sets); returns keys deleted"""
+        if not index_keys:
+            return 0
+        try:
+            return await self.binary.eval(_DELETE_INDEXED_SCRIPT, len(index_keys), *index_keys)
+        except Exception as e:
+            logger.error(f"Redis indexed delete error for {index_keys}: {e}")
+            return 0
+
+    # Distributed locks
+    async def acquire_lock(self, key: str, token: str, ttl: int) -> bool:
+        """Acquire a lock (SET NX EX); returns True if this token now holds it"""
+        try:
+            return bool(await self.redis.set(key, token, nx=True, ex=ttl))
+        except Exception as e:
+            logger.error(f"Redis lock acquire error for key {key}: {e}")
+            return False
+
+    async def extend_lock(self, key: str, token: str, ttl: int) -> bool:
+        """Extend a lock's TTL if it is still held by this token"""
+        try:
+            return bool(await self.redis.eval(_EXTEND_LOCK_SCRIPT, 1, key, token, ttl))
+        except Exception as e:
+            logger.error(f"Redis lock extend error for key {key}: {e}")
+            return False
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Release a lock if it is still held by this token"""
+        try:
+            return bool(await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, key, token))
+        except Exception as e:
+            logger.error(f"Redis lock release error for key {key}: {e}")
+            return False
+
 # Dependency for FastAPI
 async def get_redis_service() -> RedisService:
     """Dependency to get Redis service from app state"""
@@ -0,0 +1,81 @@
+from app.services.redis import RedisService
+from app.core.config import get_settings
+from typing import Optional, List, Tuple, Iterable, Dict, Any
+import asyncio
+import logging
+import time
+import msgpack
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# (status, raw ASGI headers, body, stored_at)
+CachedResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes, float]
+
+
+class ResponseCache:
+    """
+    Shared HTTP response cache in Redis
+
+    Entries are stored as msgpack-packed (status, headers, body, stored_at)
+    under httpcache:{key}, so a hit is one GET and no JSON work. Each entry
+    is also recorded in an index set per tag (httpcache:tag:{tag}, taken
+    from the response's Surrogate-Key header), and invalidate() drops every
+    entry carrying a tag, e.g. all catalog responses when the catalog
+    changes. Catalog responses are keyed by catalog version as well
+    (CacheMiddleware), so invalidation only frees memory early: a response
+    from an older version stored after it has run is never read.
+    """
+
+    KEY_PREFIX = "httpcache:"
+    TAG_PREFIX = "httpcache:tag:"
+    CATALOG_TAG = "catalog"
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+        self._tasks: set = set()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Cached response for `key`, or None"""
+        data = await self.redis.get_raw(self.KEY_PREFIX + key)
+        if data is None:
+            return None
+        try:
+            status, headers, body, stored_at = msgpack.unpackb(data, use_list=True)
+            return status, [tuple(h) for h in headers], body, stored_at
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cached response {key}: {e}")
+            return None
+
+    async def put(
+        self,
+        key: str,
+        status: int,
+        headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        ttl: int,
+        tags: Iterable[str] = ()
+    ) -> bool:
+        """Store a response for `ttl` seconds under `key`, indexed by `tags`"""
+        data = msgpack.packb((status, headers, body, time.time()), use_bin_type=True)
+        return await self.redis.set_raw(
+            self.KEY_PREFIX + key,
+            data,
+            ttl,
+            index_keys=[self.TAG_PREFIX + tag for tag in tags],
+            index_ttl=settings.RESPONSE_CACHE_MAX_TTL
+        )
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every cached response carrying any of `tags`"""
+        tags = list(tags)
+        deleted = await self.redis.delete_indexed([self.TAG_PREFIX + tag for tag in tags])
+        if deleted:
+            logger.info(f"Invalidated {deleted} cached responses tagged {tags}")
+        return deleted
+
+    def on_catalog_event(self, event: Dict[str, Any]):
+        """Pub/sub callback: a new catalog version was published; drop the old entries"""
+        task = asyncio.create_task(self.invalidate([self.CATALOG_TAG]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,297 @@
+from typing import Optional, List, Dict, Any, Tuple
+import bisect
+import heapq
+import math
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split on anything that isn't a letter or digit"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """
+    Inverted index over the model catalog with BM25F ranking
+
+    Indexes endpoint_id, display_name, description and tags. Term
+    frequencies are combined across fields with per-field weights and
+    length normalisation (BM25F), then saturated with k1. Everything that
+    doesn't depend on the query is computed at build time, so each posting
+    already holds the term's final score contribution for that model and a
+    query only sums the postings of its terms.
+
+    Query behaviour:
+    - Multi-term queries sum per-term scores (models matching more terms rank higher)
+    - The last term also matches as a prefix ("flu" finds "flux") while the user is typing
+    - Terms present in most models (e.g. "fal", "ai") are ignored when the
+      query has other terms
+    - Only each term's top CHAMPION_LIST_SIZE postings are scored (champion
+      lists), so query cost stays bounded as the catalog grows
+    - An exact endpoint_id match always ranks first
+    """
+
+    FIELD_WEIGHTS = {
+        'endpoint_id': 3.0,
+        'display_name': 2.5,
+        'tags': 2.0,
+        'description': 1.0
+    }
+    FIELD_B = {
+        'endpoint_id': 0.5,
+        'display_name': 0.5,
+        'tags': 0.3,
+        'description': 0.75
+    }
+    K1 = 1.2
+    COMMON_TERM_RATIO = 0.5
+    PREFIX_EXPANSIONS = 20
+    PREFIX_WEIGHT = 0.7
+    CHAMPION_LIST_SIZE = 1000
+
+    def __init__(self, models: List[Dict[str, Any]]):
+        self.models = models
+        self.endpoints: Dict[str, int] = {}
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+
+        docs = []
+        lengths = {field: 0 for field in self.FIELD_WEIGHTS}
+        for doc_id, model in enumerate(models):
+            fields = self._fields(model)
+            for field, tokens in fields.items():
+                lengths[field] += len(tokens)
+            docs.append(fields)
+            endpoint_id = (model.get('endpoint_id') or '').lower()
+            if endpoint_id:
+                self.endpoints.setdefault(endpoint_id, doc_id)
+
+        count = max(len(models), 1)
+        avg_lengths = {field: max(total / count, 1.0) for field, total in lengths.items()}
+
+        # Weighted, length-normalised term frequency per (term, doc)
+        frequencies: Dict[str, Dict[int, float]] = {}
+        for doc_id, fields in enumerate(docs):
+            for field, tokens in fields.items():
+                if not tokens:
+                    continue
+                b = self.FIELD_B[field]
+                norm = 1 - b + b * len(tokens) / avg_lengths[field]
+                weight = self.FIELD_WEIGHTS[field] / norm
+                for token in tokens:
+                    doc_tf = frequencies.setdefault(token, {})
+                    doc_tf[doc_id] = doc_tf.get(doc_id, 0.0) + weight
+
+        for term, doc_tf in frequencies.items():
+            df = len(doc_tf)
+            idf = math.log(1 + (len(models) - df + 0.5) / (df + 0.5))
+            postings = [
+                (doc_id, idf * tf * (self.K1 + 1) / (tf + self.K1))
+                for doc_id, tf in doc_tf.items()
+            ]
+            postings.sort(key=lambda p: p[1], reverse=True)
+            self.postings[term] = postings
+
+        self.vocabulary: List[str] = sorted(self.postings)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form of the built index (for snapshots)"""
+        return {"endpoints": self.endpoints, "postings": self.postings}
+
+    @classmethod
+    def from_state(cls, models: List[Dict[str, Any]], state: Dict[str, Any]) -> "SearchIndex":
+        """Restore an index from to_state() output without re-tokenizing"""
+        index = cls.__new__(cls)
+        index.models = models
+        index.endpoints = state["endpoints"]
+        index.postings = state["postings"]
+        index.vocabulary = state["vocabulary"] if "vocabulary" in state else sorted(index.postings)
+        return index
+
+    @staticmethod
+    def _fields(model: Dict[str, Any]) -> Dict[str, List[str]]:
+        metadata = model.get('metadata') or {}
+        return {
+            'endpoint_id': tokenize(model.get('endpoint_id') or ''),
+            'display_name': tokenize(metadata.get('display_name') or ''),
+            'tags': [t for tag in metadata.get('tags') or [] for t in tokenize(tag)],
+            'description': tokenize(metadata.get('description') or '')
+        }
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for i in range(start, len(self.vocabulary)):
+            term = self.vocabulary[i]
+            if not term.startswith(prefix) or len(terms) >= self.PREFIX_EXPANSIONS:
+                break
+            if term != prefix:
+                terms.append(term)
+        return terms
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Rank models against a free-text query
+
+        Args:
+            query: Search query string
+            limit: Maximum number of results to return
+
+        Returns:
+            List of matching models sorted by relevance
+        """
+        if not query or not query.strip():
+            return self.models[:limit]
+
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        weighted_terms: Dict[str, float] = {}
+        for token in dict.fromkeys(tokens):
+            if token in self.postings:
+                weighted_terms[token] = 1.0
+        for term in self._expand_prefix(tokens[-1]):
+            weighted_terms.setdefault(term, self.PREFIX_WEIGHT)
+
+        common_df = self.COMMON_TERM_RATIO * len(self.models)
+        selective = {t: w for t, w in weighted_terms.items() if len(self.postings[t]) <= common_df}
+        if selective:
+            weighted_terms = selective
+
+        if len(weighted_terms) == 1:
+            # Postings are pre-sorted by score: a single term is a slice
+            (term, _), = weighted_terms.items()
+            ranked = [doc_id for doc_id, _ in self.postings[term][:limit]]
+        else:
+            scores: Dict[int, float] = {}
+            for term, weight in weighted_terms.items():
+                for doc_id, score in self.postings[term][:self.CHAMPION_LIST_SIZE]:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * score
+            ranked = [
+                doc_id for doc_id, _ in
+                heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+            ]
+
+        exact = self.endpoints.get(query.strip().lower())
+        if exact is not None:
+            ranked = [exact] + [doc_id for doc_id in ranked if doc_id != exact][:limit - 1]
+
+        return [self.models[doc_id] for doc_id in ranked]
+
+
+class SuggestIndex:
+    """
+    Prefix completion over endpoint ids, display names and tags
+
+    Every completion key is stored once in a sorted array, so the keys
+    starting with a prefix are one contiguous range found with two binary
+    searches. Keys per model:
+    - endpoint_id and each of its path suffixes ("fal-ai/flux/dev", "flux/dev", "dev")
+    - display_name and each word-start suffix ("flux.1 [dev]", "1 [dev]", "dev]")
+    - each tag
+    Short prefixes match large ranges, so answers are memoised per prefix;
+    the index is rebuilt with every catalog version, which bounds the memo's
+    lifetime as well.
+    """
+
+    # Lower ranks first: a whole-name match beats a suffix or tag match
+    KIND_RANKS = {
+        'endpoint_id': 0,
+        'display_name': 0,
+        'endpoint_suffix': 1,
+        'name_suffix': 2,
+        'tag': 3
+    }
+    MEMO_SIZE = 4096
+
+    def __init__(self, models: List[Dict[str, Any]]):
+        self.models = models
+        entries = []
+        for doc_id, model in enumerate(models):
+            metadata = model.get('metadata') or {}
+            endpoint_id = (model.get('endpoint_id') or '').lower()
+            display_name = (metadata.get('display_name') or '').lower().strip()
+
+            if endpoint_id:
+                entries.append((endpoint_id, 'endpoint_id', doc_id))
+                parts = endpoint_id.split('/')
+                for i in range(1, len(parts)):
+                    entries.append(('/'.join(parts[i:]), 'endpoint_suffix', doc_id))
+            if display_name:
+                entries.append((display_name, 'display_name', doc_id))
+                for match in _TOKEN_RE.finditer(display_name):
+                    if match.start() > 0:
+                        entries.append((display_name[match.start():], 'name_suffix', doc_id))
+            for tag in metadata.get('tags') or []:
+                entries.append((tag.lower(), 'tag', doc_id))
+
+        entries.sort()
+        self._set_entries(entries)
+
+    def _set_entries(self, entries: List[Tuple[str, str, int]], keys: Optional[List[str]] = None):
+        self.entries = entries
+        self.keys: List[str] = keys if keys is not None else [key for key, _, _ in entries]
+        self._memo: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form of the built index (for snapshots)"""
+        return {"entries": self.entries}
+
+    @classmethod
+    def from_state(cls, models: List[Dict[str, Any]], state: Dict[str, Any]) -> "SuggestIndex":
+        """Restore an index from to_state() output without re-sorting"""
+        index = cls.__new__(cls)
+        index.models = models
+        index._set_entries(state["entries"], state.get("keys"))
+        return index
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        Top completions for a prefix, at most one per model
+
+        Args:
+            prefix: What the user has typed so far
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of {"endpoint_id", "display_name", "category", "match", "kind"}
+        """
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+
+        memo_key = (prefix, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+
+        # Best-ranked matching key per model
+        best: Dict[int, Tuple[Tuple[int, int, int], str, str]] = {}
+        for key, kind, doc_id in self.entries[start:end]:
+            rank = (0 if key == prefix else 1, self.KIND_RANKS[kind], len(key))
+            current = best.get(doc_id)
+            if current is None or rank < current[0]:
+                best[doc_id] = (rank, key, kind)
+
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (item[1][0], item[0]))
+        suggestions = []
+        for doc_id, (_, key, kind) in top:
+            model = self.models[doc_id]
+            metadata = model.get('metadata') or {}
+            suggestions.append({
+                "endpoint_id": model.get('endpoint_id'),
+                "display_name": metadata.get('display_name'),
+                "category": metadata.get('category'),
+                "match": key,
+                "kind": kind
+            })
+
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[memo_key] = suggestions
+        return suggestions
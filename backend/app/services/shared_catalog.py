@@ -0,0 +1,379 @@
+from app.services.model_catalog import ModelCatalog
+from app.services.search import SearchIndex, SuggestIndex
+from collections.abc import Sequence
+from array import array
+from typing import Optional, List, Dict, Any
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+# File layout: header (magic, length of the table of contents), msgpack
+# table of contents, then 8-byte aligned sections. Sections are either
+# utf-8/msgpack blobs with a 'Q' offsets array, or native typed arrays
+# ('I' doc ids, 'Q' ranges, 'd' scores, 'B' kinds), so every lookup reads
+# the mapped pages directly and only the models it returns are decoded.
+MAGIC = b"FALCAT\x00\x01"
+HEADER = struct.Struct("<8sQ")
+ALIGN = 8
+FORMAT = 1
+
+
+class _Writer:
+    def __init__(self):
+        self.data = bytearray()
+        self.sections: Dict[str, List[int]] = {}
+
+    def add(self, name: str, data: bytes):
+        self.data += b"\0" * (-len(self.data) % ALIGN)
+        self.sections[name] = [len(self.data), len(data)]
+        self.data += data
+
+    def add_array(self, name: str, typecode: str, values):
+        self.add(name, array(typecode, values).tobytes())
+
+    def add_blobs(self, name: str, blobs: List[bytes]):
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        self.add(f"{name}.data", b"".join(blobs))
+        self.add_array(f"{name}.offsets", "Q", offsets)
+
+    def add_strings(self, name: str, strings: List[str]):
+        self.add_blobs(name, [s.encode("utf-8") for s in strings])
+
+    def add_lists(self, name: str, lists: Dict[str, List[int]]):
+        keys = sorted(lists)
+        ranges = [0]
+        ids: List[int] = []
+        for key in keys:
+            ids.extend(lists[key])
+            ranges.append(len(ids))
+        self.add_strings(f"{name}.keys", keys)
+        self.add_array(f"{name}.ranges", "Q", ranges)
+        self.add_array(f"{name}.ids", "I", ids)
+
+
+def _build(catalog: ModelCatalog) -> bytes:
+    """Serialize a ModelCatalog and its prebuilt indexes into the mapped file format"""
+    doc_ids = {id(model): doc_id for doc_id, model in enumerate(catalog.models)}
+    writer = _Writer()
+    writer.add_blobs("models", [msgpack.packb(m, use_bin_type=True) for m in catalog.models])
+
+    by_endpoint = sorted(catalog.by_endpoint.items())
+    writer.add_strings("endpoint.keys", [key for key, _ in by_endpoint])
+    writer.add_array("endpoint.ids", "I", [doc_ids[id(model)] for _, model in by_endpoint])
+    for name, lists in (
+        ("category", catalog.by_category),
+        ("status", catalog.by_status),
+        ("tag", catalog.by_tag)
+    ):
+        writer.add_lists(name, {key: [doc_ids[id(m)] for m in models] for key, models in lists.items()})
+
+    search = catalog.search_index
+    endpoints = sorted(search.endpoints.items())
+    writer.add_strings("search.endpoint.keys", [key for key, _ in endpoints])
+    writer.add_array("search.endpoint.ids", "I", [doc_id for _, doc_id in endpoints])
+    postings = [search.postings[term] for term in search.vocabulary]
+    writer.add_lists("postings", {
+        term: [doc_id for doc_id, _ in posting] for term, posting in zip(search.vocabulary, postings)
+    })
+    writer.add_array("postings.scores", "d", [score for posting in postings for _, score in posting])
+
+    kinds = list(SuggestIndex.KIND_RANKS)
+    entries = catalog.suggest_index.entries
+    writer.add_strings("suggest.keys", [key for key, _, _ in entries])
+    writer.add_array("suggest.kinds", "B", [kinds.index(kind) for _, kind, _ in entries])
+    writer.add_array("suggest.ids", "I", [doc_id for _, _, doc_id in entries])
+
+    toc = msgpack.packb({
+        "format": FORMAT,
+        "version": catalog.version,
+        "categories": catalog.categories,
+        "kinds": kinds,
+        "sections": writer.sections
+    }, use_bin_type=True)
+    head = HEADER.pack(MAGIC, len(toc)) + toc
+    return head + b"\0" * (-len(head) % ALIGN) + bytes(writer.data)
+
+
+class _Strings(Sequence):
+    """Sorted string table; supports bisect without decoding the whole table"""
+
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def find(self, key: str) -> Optional[int]:
+        i = bisect.bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+
+class _Records(Sequence):
+    """Models in catalog order, decoded on access"""
+
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return msgpack.unpackb(
+            self._data[self._offsets[i]:self._offsets[i + 1]], raw=False, strict_map_key=False
+        )
+
+
+class _DocList(Sequence):
+    """Posting list of doc ids, read as models"""
+
+    def __init__(self, records: _Records, ids: memoryview):
+        self._records = records
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._records[doc_id] for doc_id in self._ids[i]]
+        return self._records[self._ids[i]]
+
+
+class _KeyIndex:
+    """Unique key -> doc id (or the model itself when `records` is given)"""
+
+    def __init__(self, keys: _Strings, ids: memoryview, records: Optional[_Records] = None):
+        self._keys = keys
+        self._ids = ids
+        self._records = records
+
+    def get(self, key: str, default=None):
+        i = self._keys.find(key)
+        if i is None:
+            return default
+        return self._records[self._ids[i]] if self._records is not None else self._ids[i]
+
+
+class _ListIndex:
+    """Key -> posting list of models"""
+
+    def __init__(self, keys: _Strings, ranges: memoryview, ids: memoryview, records: _Records):
+        self._keys = keys
+        self._ranges = ranges
+        self._ids = ids
+        self._records = records
+
+    def get(self, key: str, default=None):
+        i = self._keys.find(key)
+        if i is None:
+            return default
+        return _DocList(self._records, self._ids[self._ranges[i]:self._ranges[i + 1]])
+
+
+class _Pairs(Sequence):
+    """One term's (doc_id, score) postings"""
+
+    def __init__(self, ids: memoryview, scores: memoryview):
+        self._ids = ids
+        self._scores = scores
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(zip(self._ids[i], self._scores[i]))
+        return self._ids[i], self._scores[i]
+
+
+class _Postings:
+    """Term -> postings, shaped like SearchIndex.postings"""
+
+    def __init__(self, terms: _Strings, ranges: memoryview, ids: memoryview, scores: memoryview):
+        self.terms = terms
+        self._ranges = ranges
+        self._ids = ids
+        self._scores = scores
+
+    def __contains__(self, term: str) -> bool:
+        return self.terms.find(term) is not None
+
+    def __getitem__(self, term: str) -> _Pairs:
+        i = self.terms.find(term)
+        if i is None:
+            raise KeyError(term)
+        start, end = self._ranges[i], self._ranges[i + 1]
+        return _Pairs(self._ids[start:end], self._scores[start:end])
+
+
+class _SuggestEntries(Sequence):
+    """(key, kind, doc_id) completion entries, shaped like SuggestIndex.entries"""
+
+    def __init__(self, keys: _Strings, kinds: memoryview, ids: memoryview, names: List[str]):
+        self._keys = keys
+        self._kinds = kinds
+        self._ids = ids
+        self._names = names
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._keys[i], self._names[self._kinds[i]], self._ids[i]
+
+
+class MappedCatalog(ModelCatalog):
+    """
+    ModelCatalog read from a memory-mapped catalog file
+
+    Same interface as ModelCatalog, but the models, lookup tables and text
+    indexes stay in the mapped file: every worker on the host shares the
+    same page-cache pages, and only the models a lookup returns are decoded
+    (as fresh dicts). Only the suggest and render memos are per process.
+    """
+
+    def __init__(self, buffer: mmap.mmap, toc: Dict[str, Any], offset: int):
+        view = memoryview(buffer)[offset:]
+
+        def section(name: str, typecode: str = "B") -> memoryview:
+            start, length = toc["sections"][name]
+            return view[start:start + length].cast(typecode)
+
+        def strings(name: str) -> _Strings:
+            return _Strings(section(f"{name}.data"), section(f"{name}.offsets", "Q"))
+
+        def lists(name: str) -> _ListIndex:
+            return _ListIndex(
+                strings(f"{name}.keys"), section(f"{name}.ranges", "Q"), section(f"{name}.ids", "I"), records
+            )
+
+        records = _Records(section("models.data"), section("models.offsets", "Q"))
+        self.models = records
+        self.version = toc["version"]
+        self.by_endpoint = _KeyIndex(strings("endpoint.keys"), section("endpoint.ids", "I"), records)
+        self.by_category = lists("category")
+        self.by_status = lists("status")
+        self.by_tag = lists("tag")
+        self.categories = toc["categories"]
+        self._rendered = {}
+
+        postings = _Postings(
+            strings("postings.keys"),
+            section("postings.ranges", "Q"),
+            section("postings.ids", "I"),
+            section("postings.scores", "d")
+        )
+        self.search_index = SearchIndex.from_state(records, {
+            "endpoints": _KeyIndex(strings("search.endpoint.keys"), section("search.endpoint.ids", "I")),
+            "postings": postings,
+            "vocabulary": postings.terms
+        })
+        keys = strings("suggest.keys")
+        self.suggest_index = SuggestIndex.from_state(records, {
+            "entries": _SuggestEntries(keys, section("suggest.kinds"), section("suggest.ids", "I"), toc["kinds"]),
+            "keys": keys
+        })
+
+
+class SharedCatalogFile:
+    """
+    Host-wide catalog file that all worker processes map read-only
+
+    publish() writes a new version to a temp file and renames it over the
+    path, so the swap is atomic: workers that mapped the previous file keep
+    a consistent view until they switch, and the old pages are released once
+    no worker maps them any more. An advisory flock on `{path}.lock` lets
+    one worker build a version while the others wait and map its result.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_file = None
+
+    def open(self, version: Optional[int] = None) -> Optional[MappedCatalog]:
+        """
+        Map the current file
+
+        Args:
+            version: Only return the catalog if the file holds this version
+
+        Returns:
+            MappedCatalog, or None if the file is missing, unreadable or another version
+        """
+        try:
+            with open(self.path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable shared catalog {self.path}: {e}")
+            return None
+
+        try:
+            magic, toc_length = HEADER.unpack_from(buffer)
+            if magic != MAGIC:
+                raise ValueError("not a catalog file")
+            toc = msgpack.unpackb(buffer[HEADER.size:HEADER.size + toc_length], raw=False)
+            if toc["format"] != FORMAT or (version is not None and toc["version"] != version):
+                buffer.close()
+                return None
+            offset = HEADER.size + toc_length
+            return MappedCatalog(buffer, toc, offset + -offset % ALIGN)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable shared catalog {self.path}: {e}")
+            return None
+
+    def publish(self, catalog: ModelCatalog) -> Optional[MappedCatalog]:
+        """Atomically replace the file with `catalog` and map the result"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_build(catalog))
+        os.replace(tmp_path, self.path)
+        return self.open(catalog.version)
+
+    def try_lock(self) -> bool:
+        """Take the host-wide build lock without blocking"""
+        if self._lock_file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(f"{self.path}.lock", "a+b")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def unlock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
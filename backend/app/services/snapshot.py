@@ -0,0 +1,35 @@
+from typing import Optional, Dict, Any
+import logging
+import os
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+
+def write_snapshot(path: str, state: Dict[str, Any]):
+    """
+    Atomically write a msgpack snapshot
+
+    The data goes to a per-process temp file that is renamed over `path`,
+    so concurrent writers (e.g. several workers) and readers never see a
+    partial file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        msgpack.pack(state, f, use_bin_type=True)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Read a msgpack snapshot; None if missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            return msgpack.unpack(f, raw=False, strict_map_key=False)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
@@ -1,8 +1,11 @@
 import asyncio
+import time
+import uuid
 from app.services.redis import RedisService
 from app.services.queue_service import QueueService
 from app.workers.tasks import process_generation
 from app.core.config import get_settings
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,60 +14,105 @@ settings = get_settings()
 class WorkerManager:
     """
     Manages worker pool and task distribution
+
+    One manager across all API replicas (elected through a Redis lease)
+    dispatches queued requests to Celery workers. It waits in blocking Redis
+    calls rather than polling: for new entries with XREADGROUP BLOCK while
+    there are free slots, and for a completion signal while at capacity, so
+    a request is dispatched as soon as it is queued or a slot frees up.
+    Entries lost by a dead dispatcher or worker are reclaimed every
+    QUEUE_RECLAIM_INTERVAL seconds.
     """
 
+    LEADER_KEY = "queue:dispatcher"
+
     def __init__(self):
         self.redis = None
         self.queue_service = None
         self.running = False
+        self.token = uuid.uuid4().hex
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._next_reclaim = 0.0
 
     async def start(self):
         """Start worker manager"""
         self.redis = RedisService()
         await self.redis.connect()
         self.queue_service = QueueService(self.redis)
+        await self.queue_service.setup()
         self.running = True
 
         logger.info("Worker manager started")
 
         # Start processing loop in background
-        asyncio.create_task(self.process_queue())
+        self._task = asyncio.create_task(self.process_queue())
 
     async def stop(self):
         """Stop worker manager"""
         self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
         if self.redis:
+            if self.is_leader:
+                await self.redis.release_lock(self.LEADER_KEY, self.token)
             await self.redis.disconnect()
         logger.info("Worker manager stopped")
 
+    async def _ensure_leadership(self) -> bool:
+        """Acquire or renew the dispatcher lease"""
+        ttl = settings.QUEUE_LEADER_TTL
+        if self.is_leader:
+            self.is_leader = await self.redis.extend_lock(self.LEADER_KEY, self.token, ttl)
+        if not self.is_leader:
+            self.is_leader = await self.redis.acquire_lock(self.LEADER_KEY, self.token, ttl)
+            if self.is_leader:
+                logger.info("Worker manager acquired dispatcher leadership")
+        return self.is_leader
+
     async def process_queue(self):
         """
         Main processing loop
 
-        Continuously checks queue and dispatches tasks to Celery workers
+        Dispatches queued requests to Celery workers, up to
+        MAX_CONCURRENT_REQUESTS at a time. Each wait is bounded by
+        QUEUE_BLOCK_TIMEOUT so the lease is renewed in time.
         """
         while self.running:
             try:
-                # Try to dequeue next request
-                request_id = await self.queue_service.dequeue()
-
-                if request_id:
-                    # Dispatch to Celery worker
-                    logger.info(f"Dispatching {request_id} to Celery worker")
-                    process_generation.apply_async(
-                        args=[request_id],
-                        countdown=0
-                    )
-
-                    # Wait a bit before checking again
-                    await asyncio.sleep(1)
-                else:
-                    # No capacity or empty queue, wait longer
-                    await asyncio.sleep(5)
+                if not await self._ensure_leadership():
+                    await asyncio.sleep(settings.QUEUE_LEADER_TTL / 2)
+                    continue
 
+                # Lost entries still hold their slots, so this runs even at capacity
+                if time.monotonic() >= self._next_reclaim:
+                    self._next_reclaim = time.monotonic() + settings.QUEUE_RECLAIM_INTERVAL
+                    self._dispatch(await self.queue_service.reclaim(self.queue_service.max_concurrent))
+
+                slots = self.queue_service.max_concurrent - await self.queue_service.active_count()
+                if slots <= 0:
+                    # At capacity: wake up when a request completes
+                    await self.queue_service.wait_for_slot(settings.QUEUE_BLOCK_TIMEOUT)
+                    continue
+
+                # Wait for new requests
+                self._dispatch(await self.queue_service.dequeue(slots, settings.QUEUE_BLOCK_TIMEOUT))
+
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Error in processing loop: {e}")
-                await asyncio.sleep(5)
+                logger.error(f"Error in processing loop: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    def _dispatch(self, entries):
+        """Hand dequeued requests to Celery workers"""
+        for entry_id, request_id in entries:
+            logger.info(f"Dispatching {request_id} to Celery worker")
+            process_generation.apply_async(args=[request_id, entry_id], countdown=0)
 
 # Global worker manager instance
 worker_manager = None
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+from app.services.redis import RedisService
+from app.services.fal_client import FalAIClient
+from app.services.generation_store import GenerationStore, TERMINAL_STATUSES
+from app.services.poll_schedule import LatencyTracker, next_poll_delay
+from app.models.schema import GenerationStatus
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class StatusPoller:
+    """
+    Central Fal.ai status poller
+
+    Every in-flight generation is tracked in a Redis sorted set scored by
+    its next poll time. One poller across all API replicas (elected through
+    a Redis lease) polls due requests in batched rounds with bounded
+    concurrency and writes status transitions back to generation:{id}.
+
+    Next poll times come from each request's expected duration (see
+    poll_schedule.next_poll_delay), and completion times feed back into the
+    per-model latency history. Requests submitted with a Fal.ai webhook are
+    only swept every FAL_WEBHOOK_SWEEP_INTERVAL seconds in case the
+    callback never arrives.
+    """
+
+    LEADER_KEY = "poller:leader"
+
+    def __init__(self, redis: RedisService):
+        self.redis = redis
+        self.store = GenerationStore(redis)
+        self.latency = LatencyTracker(redis)
+        self.fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
+        self.semaphore = asyncio.Semaphore(settings.STATUS_POLL_CONCURRENCY)
+        self.token = uuid.uuid4().hex
+        self.is_leader = False
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the polling loop"""
+        self.running = True
+        self._task = asyncio.create_task(self.run())
+        logger.info("Status poller started")
+
+    async def stop(self):
+        """Stop the polling loop and give up leadership"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await self.redis.release_lock(self.LEADER_KEY, self.token)
+        logger.info("Status poller stopped")
+
+    async def _ensure_leadership(self) -> bool:
+        """Acquire or renew the poller lease"""
+        ttl = settings.STATUS_POLL_LEADER_TTL
+        if self.is_leader:
+            self.is_leader = await self.redis.extend_lock(self.LEADER_KEY, self.token, ttl)
+        if not self.is_leader:
+            self.is_leader = await self.redis.acquire_lock(self.LEADER_KEY, self.token, ttl)
+            if self.is_leader:
+                logger.info("Status poller acquired leadership")
+        return self.is_leader
+
+    async def run(self):
+        """
+        Main polling loop
+
+        Each round picks up to STATUS_POLL_BATCH_SIZE due requests and polls
+        them concurrently; a full batch means there is backlog, so the next
+        round starts immediately.
+        """
+        while self.running:
+            try:
+                if not await self._ensure_leadership():
+                    await asyncio.sleep(settings.STATUS_POLL_LEADER_TTL / 2)
+                    continue
+
+                due = await self.store.due(time.time(), settings.STATUS_POLL_BATCH_SIZE)
+                if due:
+                    await asyncio.gather(*(self._poll_one(request_id) for request_id in due))
+
+                if len(due) < settings.STATUS_POLL_BATCH_SIZE:
+                    await asyncio.sleep(settings.STATUS_POLL_TICK)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in status poller loop: {e}", exc_info=True)
+                await asyncio.sleep(settings.STATUS_POLL_TICK)
+
+    async def _poll_one(self, request_id: str):
+        """Poll Fal.ai for a single request and record any transition"""
+        async with self.semaphore:
+            request_data = await self.store.get(request_id)
+            fal_request_id = request_data.get("fal_request_id") if request_data else None
+
+            if not fal_request_id or request_data.get("status") in TERMINAL_STATUSES:
+                await self.store.untrack(request_id)
+                return
+
+            try:
+                fal_response = await self.fal_client.get_request_status(fal_request_id)
+            except Exception as e:
+                logger.warning(f"Status poll failed for {request_id} ({fal_request_id}): {e}")
+                fal_response = None
+
+            elapsed = self._elapsed(request_data)
+            changes = self._transition(request_data, fal_response, elapsed)
+            if changes:
+                updated = await self.store.update(request_id, changes, if_active=True)
+                if updated is None:
+                    # Finished elsewhere (webhook) or expired in the meantime
+                    await self.store.untrack(request_id)
+                    return
+                request_data = updated
+
+            if request_data.get("status") in TERMINAL_STATUSES:
+                await self.store.untrack(request_id)
+                if request_data["status"] == GenerationStatus.COMPLETED.value:
+                    await self.latency.record(request_data["model_id"], elapsed)
+                logger.info(f"Generation {request_id} reached status {request_data['status']}")
+            else:
+                expected = request_data.get("expected_duration") or settings.STATUS_POLL_DEFAULT_ESTIMATE
+                delay = next_poll_delay(elapsed, expected)
+                if request_data.get("webhook"):
+                    # Completion normally arrives by webhook; this is only a sweep for missed callbacks
+                    delay = max(delay, settings.FAL_WEBHOOK_SWEEP_INTERVAL)
+                await self.store.track(request_id, time.time() + delay)
+
+    @staticmethod
+    def _elapsed(request_data: Dict[str, Any]) -> float:
+        """Seconds since the request was created"""
+        created_at = datetime.fromisoformat(request_data["created_at"])
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+    def _transition(
+        self,
+        request_data: Dict[str, Any],
+        fal_response: Optional[Dict[str, Any]],
+        elapsed: float
+    ) -> Dict[str, Any]:
+        """
+        Work out which fields of the record change after a poll
+
+        Returns:
+            Dict of changed fields (empty if nothing changed)
+        """
+        now = datetime.utcnow()
+
+        if fal_response is None:
+            # Give up on requests that stay unreachable past the poll timeout
+            if elapsed > settings.STATUS_POLL_TIMEOUT:
+                return {
+                    "status": GenerationStatus.FAILED.value,
+                    "completed_at": now.isoformat(),
+                    "error": "Status polling timed out"
+                }
+            return {}
+
+        status = self.fal_client.normalize_status(fal_response.get("status"))
+        changes = {}
+
+        if status != request_data.get("status"):
+            changes["status"] = status
+        queue_position = fal_response.get("queue_position")
+        if queue_position != request_data.get("queue_position"):
+            changes["queue_position"] = queue_position
+
+        if status == GenerationStatus.COMPLETED.value:
+            changes["result"] = fal_response.get("result") or fal_response.get("response")
+            changes["completed_at"] = now.isoformat()
+        elif status == GenerationStatus.FAILED.value:
+            changes["error"] = fal_response.get("error") or "Unknown error"
+            changes["completed_at"] = now.isoformat()
+
+        return changes
+
+
+# Global status poller instance
+status_poller = None
+
+async def start_status_poller(redis: RedisService):
+    """Start the status poller"""
+    global status_poller
+    status_poller = StatusPoller(redis)
+    await status_poller.start()
+
+async def stop_status_poller():
+    """Stop the status poller"""
+    global status_poller
+    if status_poller:
+        await status_poller.stop()
@@ -2,54 +2,107 @@ from app.workers.celery_app import celery_app
 from app.services.fal_client import FalAIClient
 from app.services.redis import RedisService
 from app.services.queue_service import QueueService
+from app.services.generation_store import GenerationStore
 from app.models.schema import GenerationStatus
 from app.core.config import get_settings
+from app.core.connection_pool import get_http_session, prewarm_http_session, close_http_session
+from celery.signals import worker_process_init, worker_process_shutdown
 from datetime import datetime
+from typing import Optional
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Event loop owned by this worker process. Tasks run on it instead of a fresh
+# asyncio.run() loop so the pooled HTTP session survives between tasks.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run(coro):
+    """Run a coroutine on the worker process event loop"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Create and prewarm the pooled HTTP session for this worker process"""
+    async def _init():
+        get_http_session()
+        await prewarm_http_session(FalAIClient.API_URLS)
+
+    _run(_init())
+    logger.info("Worker process HTTP connection pool initialized")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Close the pooled HTTP session for this worker process"""
+    if _loop is not None and not _loop.is_closed():
+        _loop.run_until_complete(close_http_session())
+        _loop.close()
+
 @celery_app.task(name="app.workers.tasks.process_generation", bind=True, max_retries=3)
-def process_generation(self, request_id: str):
+def process_generation(self, request_id: str, entry_id: Optional[str] = None):
     """
     Celery task to process generation request
 
-    This runs in a separate worker process
+    This runs in a separate worker process. `entry_id` is the request's
+    queue entry, acknowledged once it is done.
     """
     try:
         logger.info(f"Processing generation request: {request_id}")
 
         # Run async code in sync context
-        return asyncio.run(_process_generation_async(request_id))
+        return _run(_process_generation_async(request_id, entry_id))
 
     except Exception as e:
         logger.error(f"Error processing {request_id}: {e}", exc_info=True)
-        # Update status to failed
-        asyncio.run(_mark_failed(request_id, str(e)))
-        # Retry on certain errors
+        # Retry on certain errors. The queue entry stays pending meanwhile: it
+        # keeps its slot, the retry touches it, and if the retry is lost it is
+        # reclaimed and re-dispatched.
         if self.request.retries < self.max_retries:
             raise self.retry(exc=e, countdown=60)
+        # Out of retries: update status to failed and release the entry
+        _run(_mark_failed(request_id, entry_id, str(e)))
         raise
 
-async def _process_generation_async(request_id: str) -> dict:
+async def _process_generation_async(request_id: str, entry_id: Optional[str]) -> Optional[dict]:
     """Async implementation of generation processing"""
     redis = RedisService()
     await redis.connect()
+    store = GenerationStore(redis)
+    queue_service = QueueService(redis)
 
     try:
-        # Get request data
-        request_data = await redis.get(f"generation:{request_id}")
+        # Keep the queue entry from being reclaimed while this attempt runs
+        if entry_id:
+            await queue_service.touch(entry_id)
+
+        # Get request data; a missing (expired) record can't be processed,
+        # so drop its queue entry instead of retrying or leaving it pending
+        request_data = await store.get(request_id)
         if not request_data:
-            raise Exception(f"Request {request_id} not found in Redis")
+            logger.warning(f"Request {request_id} not found in Redis, dropping it from the queue")
+            await queue_service.mark_complete(request_id, entry_id)
+            return None
+
+        # Reclaimed entry whose first dispatch already finished
+        if request_data.get("status") == GenerationStatus.COMPLETED.value:
+            await queue_service.mark_complete(request_id, entry_id)
+            return request_data
 
         # Update status to processing
         request_data["status"] = GenerationStatus.PROCESSING.value
-        await redis.set(f"generation:{request_id}", request_data)
+        await store.save(request_data)
 
         # Call Fal.ai API
-        fal_client = FalAIClient()
+        fal_client = FalAIClient(api_key=settings.FAL_API_KEY)
 
         # Prepare input data - prompt is required, merge with parameters
         input_data = {
@@ -70,15 +123,10 @@ async def _process_generation_async(request_id: str) -> dict:
         request_data["error"] = None
 
         # Store updated data with TTL
-        await redis.set(
-            f"generation:{request_id}",
-            request_data,
-            ttl=settings.CACHE_TTL_GENERATION
-        )
+        await store.save(request_data)
 
         # Mark as complete in queue service
-        queue_service = QueueService(redis)
-        await queue_service.mark_complete(request_id)
+        await queue_service.mark_complete(request_id, entry_id)
 
         logger.info(f"Generation {request_id} completed successfully")
         return request_data
@@ -89,23 +137,27 @@ async def _process_generation_async(request_id: str) -> dict:
     finally:
         await redis.disconnect()
 
-async def _mark_failed(request_id: str, error: str):
+async def _mark_failed(request_id: str, entry_id: Optional[str], error: str):
     """Mark request as failed"""
     redis = RedisService()
     await redis.connect()
 
     try:
-        request_data = await redis.get(f"generation:{request_id}")
-        if request_data:
-            request_data["status"] = GenerationStatus.FAILED.value
-            request_data["completed_at"] = datetime.utcnow().isoformat()
-            request_data["error"] = error
-            await redis.set(f"generation:{request_id}", request_data)
-            
-            # Mark as complete in queue service (even if failed)
-            queue_service = QueueService(redis)
-            await queue_service.mark_complete(request_id)
+        request_data = await GenerationStore(redis).update(request_id, {
+            "status": GenerationStatus.FAILED.value,
+            "completed_at": datetime.utcnow().isoformat(),
+            "error": error
+        })
+        if not request_data:
+            logger.warning(f"Request {request_id} not found in Redis while marking it failed")
     except Exception as e:
         logger.error(f"Error marking request as failed: {e}", exc_info=True)
+
+    try:
+        # Release the queue entry (even if failed, or the record is gone), or
+        # it would hold a slot and be reclaimed forever
+        await QueueService(redis).mark_complete(request_id, entry_id)
+    except Exception as e:
+        logger.error(f"Error releasing queue entry of {request_id}: {e}", exc_info=True)
     finally:
         await redis.disconnect()
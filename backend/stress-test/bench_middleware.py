@@ -0,0 +1,220 @@
+"""
+Per-request overhead of the API middleware pipeline.
+
+Drives ASGI apps in-process (no sockets) with the same trivial endpoint
+and reports the mean time per request and the overhead over the bare app:
+
+    bare         - the endpoint, no middleware
+    passthrough  - one BaseHTTPMiddleware that only calls call_next: the
+                   dispatch cost of a single legacy layer, without its work
+    legacy       - the previous stack: logging, rate limiting, cache and
+                   timing as BaseHTTPMiddleware layers around CORS
+    pipeline     - the current pure-ASGI stages from app.middleware
+
+Rate limiting uses an in-process stand-in instead of Redis and the cache
+stage sees a non-cacheable path, so only middleware cost is measured.
+
+Reading the legacy figure: like a server, receive() blocks after the body
+until the response is done. Each BaseHTTPMiddleware layer streams its
+response through a task group that also runs a disconnect listener on
+receive(), and tears both down per request. Most of the legacy overhead
+is that per-layer machinery (compare passthrough), not the layers' own
+work. Its cost depends heavily on the installed Starlette and anyio
+versions, so compare absolute overheads on one machine and environment;
+the legacy/pipeline ratio is not a portable number.
+
+Usage (from backend/):
+    python stress-test/bench_middleware.py [--requests 20000] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("FAL_API_KEY", "bench")
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import get_settings
+from app.middleware.cache import CacheMiddleware
+from app.middleware.logging import RequestLoggingMiddleware
+from app.middleware.rate_limiter import RateLimitMiddleware
+from app.services.rate_limit import RateLimiter
+
+settings = get_settings()
+PATH = f"{settings.API_V1_PREFIX}/ping"
+
+
+class CounterStore:
+    """Stands in for RedisService.increment / expire / gcra"""
+
+    def __init__(self):
+        self.counts = {}
+
+    async def increment(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return self.counts[key]
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def gcra(self, key, tiers_key, identity, cost, burst_seconds, default_rate, tiers, lease=0):
+        await self.increment(key)
+        return [1, default_rate, default_rate, 0, 1000, max(lease, cost)]
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+    app.state.redis = CounterStore()
+    app.state.rate_limiter = RateLimiter(app.state.redis)
+
+    @app.get(PATH)
+    async def ping():
+        return PlainTextResponse("pong")
+
+    cors = dict(allow_origins=settings.CORS_ORIGINS, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+    if variant == "pipeline":
+        app.add_middleware(CacheMiddleware, cacheable_paths=[f"{settings.API_V1_PREFIX}/models"])
+        app.add_middleware(RateLimitMiddleware)
+        app.add_middleware(CORSMiddleware, **cors)
+        app.add_middleware(RequestLoggingMiddleware)
+    elif variant == "passthrough":
+        async def passthrough(request: Request, call_next):
+            return await call_next(request)
+
+        app.add_middleware(BaseHTTPMiddleware, dispatch=passthrough)
+    elif variant == "legacy":
+        add_legacy_stack(app, cors)
+    return app
+
+
+def add_legacy_stack(app: FastAPI, cors: dict):
+    """The BaseHTTPMiddleware layers main.py registered before the pure-ASGI rewrite"""
+
+    class LegacyLogging(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            start = time.time()
+            request_id = request.headers.get("X-Request-ID", f"req_{start}")
+            logging.getLogger("bench").info(json.dumps({"event": "request_started", "path": request.url.path}))
+            response = await call_next(request)
+            duration = time.time() - start
+            logging.getLogger("bench").info(json.dumps({"event": "request_completed", "status": response.status_code}))
+            response.headers["X-Request-ID"] = request_id
+            response.headers["X-Response-Time"] = f"{duration:.3f}"
+            return response
+
+    class LegacyCache(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            if request.method != "GET" or not request.url.path.startswith(f"{settings.API_V1_PREFIX}/models"):
+                return await call_next(request)
+            return await call_next(request)
+
+    class LegacyRateLimit(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            now = int(time.time() / 60)
+            count = await request.app.state.redis.increment(f"rate_limit:ip:{request.client.host}:{now}")
+            if count == 1:
+                await request.app.state.redis.expire(f"rate_limit:ip:{request.client.host}:{now}", 60)
+            if count > settings.RATE_LIMIT_PER_MINUTE:
+                raise HTTPException(status_code=429)
+            response = await call_next(request)
+            response.headers["X-RateLimit-Limit"] = str(settings.RATE_LIMIT_PER_MINUTE)
+            response.headers["X-RateLimit-Remaining"] = str(max(0, settings.RATE_LIMIT_PER_MINUTE - count))
+            response.headers["X-RateLimit-Reset"] = str((now + 1) * 60)
+            return response
+
+    async def timing(request: Request, call_next):
+        start = time.time()
+        try:
+            response = await call_next(request)
+        except Exception as exc:
+            return JSONResponse(status_code=500, content={"error": str(exc)})
+        response.headers["X-Process-Time"] = str(time.time() - start)
+        return response
+
+    app.add_middleware(LegacyLogging)
+    app.add_middleware(CORSMiddleware, **cors)
+    app.add_middleware(LegacyCache)
+    app.add_middleware(LegacyRateLimit)
+    app.add_middleware(BaseHTTPMiddleware, dispatch=timing)
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    """Mean seconds per request"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+    request = {"type": "http.request", "body": b"", "more_body": False}
+    disconnect = {"type": "http.disconnect"}
+
+    async def one(done: asyncio.Event):
+        body_sent = False
+
+        async def receive():
+            # Body first; after that block until the response is done, as a server would
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return request
+            await done.wait()
+            return disconnect
+
+        async def send(message):
+            if message["type"] == "http.response.start" and message["status"] != 200:
+                raise RuntimeError(f"Unexpected status {message['status']}")
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                done.set()
+
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await one(asyncio.Event())
+    return (time.perf_counter() - start) / requests
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Middleware pipeline overhead benchmark")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Log records are filtered out in all variants; formatting work that
+    # happens before the level check still counts
+    logging.basicConfig(level=logging.WARNING)
+    settings.RATE_LIMIT_PER_MINUTE = args.requests * args.rounds * 2
+
+    apps = {variant: build_app(variant) for variant in ("bare", "passthrough", "legacy", "pipeline")}
+    results = {}
+    for variant, app in apps.items():
+        await run(app, min(args.requests, 1000))  # warm up
+        results[variant] = min([await run(app, args.requests) for _ in range(args.rounds)])
+
+    bare = results["bare"]
+    print(f"{'variant':<12} {'us/request':>12} {'overhead us':>12}")
+    for variant, seconds in results.items():
+        print(f"{variant:<12} {seconds * 1e6:>12.1f} {(seconds - bare) * 1e6:>12.1f}")
+    print("\npassthrough is the dispatch cost of one BaseHTTPMiddleware layer (see the module docstring)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Stand-in Fal.ai queue server for exercising webhooks locally.
+
+Accepts queue submissions, answers status polls and, after a random delay,
+fires a signed completion callback at the `fal_webhook` URL - the same way
+Fal.ai does. Point the backend at it with:
+
+    FAL_QUEUE_API_URL=http://localhost:8900
+    FAL_WEBHOOK_URL=http://localhost:8000/api/v1/webhooks/fal
+    FAL_WEBHOOK_JWKS_URL=http://localhost:8900/.well-known/jwks.json
+
+Usage:
+    python fake_fal.py [--port 8900] [--min-delay 1] [--max-delay 5] [--fail-rate 0.05]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+import uuid
+
+import aiohttp
+from aiohttp import web
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+SIGNING_KEY = Ed25519PrivateKey.generate()
+USER_ID = "fake-user"
+REQUESTS = {}
+
+
+def jwks() -> dict:
+    raw = SIGNING_KEY.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+    x = base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+    return {"keys": [{"kty": "OKP", "crv": "Ed25519", "x": x}]}
+
+
+def sign(request_id: str, body: bytes) -> dict:
+    timestamp = str(int(time.time()))
+    message = "\n".join([request_id, USER_ID, timestamp, hashlib.sha256(body).hexdigest()]).encode()
+    return {
+        "Content-Type": "application/json",
+        "X-Fal-Webhook-Request-Id": request_id,
+        "X-Fal-Webhook-User-Id": USER_ID,
+        "X-Fal-Webhook-Timestamp": timestamp,
+        "X-Fal-Webhook-Signature": SIGNING_KEY.sign(message).hex(),
+    }
+
+
+async def complete(app: web.Application, request_id: str, webhook_url: str):
+    await asyncio.sleep(random.uniform(app["min_delay"], app["max_delay"]))
+    failed = random.random() < app["fail_rate"]
+    state = REQUESTS[request_id]
+    if failed:
+        state.update(status="FAILED", error="Simulated failure")
+        payload = {"request_id": request_id, "status": "ERROR", "error": "Simulated failure", "payload": None}
+    else:
+        result = {"images": [{"url": f"https://example.com/{request_id}.png", "content_type": "image/png"}]}
+        state.update(status="COMPLETED", result=result)
+        payload = {"request_id": request_id, "status": "OK", "payload": result}
+
+    if webhook_url:
+        body = json.dumps(payload).encode()
+        try:
+            async with app["session"].post(webhook_url, data=body, headers=sign(request_id, body)) as response:
+                print(f"Webhook {request_id} -> {response.status}")
+        except aiohttp.ClientError as e:
+            print(f"Webhook {request_id} failed: {e}")
+
+
+async def submit(request: web.Request) -> web.Response:
+    request_id = uuid.uuid4().hex
+    REQUESTS[request_id] = {"request_id": request_id, "status": "IN_QUEUE", "queue_position": 0}
+    asyncio.create_task(complete(request.app, request_id, request.query.get("fal_webhook")))
+    return web.json_response({"request_id": request_id, "status": "IN_QUEUE", "queue_position": 0})
+
+
+async def status(request: web.Request) -> web.Response:
+    state = REQUESTS.get(request.match_info["request_id"])
+    if state is None:
+        return web.json_response({"detail": "Not found"}, status=404)
+    return web.json_response(state)
+
+
+async def jwks_handler(request: web.Request) -> web.Response:
+    return web.json_response(jwks())
+
+
+async def on_startup(app: web.Application):
+    app["session"] = aiohttp.ClientSession()
+
+
+async def on_cleanup(app: web.Application):
+    await app["session"].close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Fal.ai queue server")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--min-delay", type=float, default=1.0)
+    parser.add_argument("--max-delay", type=float, default=5.0)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    app = web.Application()
+    app["min_delay"], app["max_delay"], app["fail_rate"] = args.min_delay, args.max_delay, args.fail_rate
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/.well-known/jwks.json", jwks_handler)
+    app.router.add_get("/requests/{request_id}", status)
+    app.router.add_post("/{model_id:.+}", submit)
+    web.run_app(app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("FAL_API_KEY", "test")
+os.environ.setdefault("CATALOG_SNAPSHOT_PATH", "")
+
+import fakeredis.aioredis  # noqa: E402
+
+from app.services.redis import RedisService  # noqa: E402
+
+
+@pytest.fixture
+def redis_service():
+    """RedisService backed by an in-memory fakeredis server"""
+    server = fakeredis.FakeServer()
+    service = RedisService()
+    service.redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    service.binary = fakeredis.aioredis.FakeRedis(server=server)
+    return service
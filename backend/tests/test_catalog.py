@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from app.core.config import get_settings
+from app.services.catalog import CatalogService
+from app.services.model_catalog import ModelCatalog
+from app.services.shared_catalog import SharedCatalogFile
+
+settings = get_settings()
+
+
+def model(endpoint_id, display_name=None):
+    return {
+        "endpoint_id": endpoint_id,
+        "metadata": {"display_name": display_name or endpoint_id, "category": "text-to-image"}
+    }
+
+
+class FakeFal:
+    """Serves catalog pages; raises after `fail_after` pages"""
+
+    def __init__(self, pages, fail_after=None):
+        self.pages = pages
+        self.fail_after = fail_after
+
+    async def iter_model_pages(self):
+        for i, page in enumerate(self.pages):
+            if i == self.fail_after:
+                raise Exception("Fal.ai page request failed")
+            yield page
+
+
+def test_shared_build_elsewhere_keeps_serving_installed_version(redis_service, monkeypatch, tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    monkeypatch.setattr(settings, "CATALOG_SHARED_PATH", path)
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_WAIT_INTERVAL", 0.01)
+
+    async def scenario():
+        service = CatalogService(redis_service)
+        service.catalog = service.shared.publish(ModelCatalog([model("a")], 1))
+
+        # v2 is stamped in Redis while another worker holds the build lock
+        await redis_service.set_many(
+            {
+                CatalogService.ORDER_KEY: ["a", "b"],
+                CatalogService.VERSION_KEY: {"version": 2, "fresh_until": time.time() + 3600}
+            },
+            hashes={CatalogService.ENTRIES_KEY: {"a": model("a"), "b": model("b")}}
+        )
+        other = SharedCatalogFile(path)
+        assert other.try_lock()
+
+        started = time.monotonic()
+        during = await service.get_catalog()
+        waited = time.monotonic() - started
+
+        # The other worker gives up without publishing: this one builds v2
+        other.unlock()
+        await service._shared_task
+        after = await service.get_catalog()
+        await service.close()
+        return during.version, waited, after.version
+
+    during, waited, after = asyncio.run(scenario())
+    assert during == 1
+    assert waited < 1
+    assert after == 2
+
+
+def test_failed_sync_leaves_stored_version_intact(redis_service, monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_PATH", None)
+
+    async def scenario():
+        service = CatalogService(redis_service)
+        service.fal_client = FakeFal([[model("a")], [model("b")]])
+        first = await service._refresh("token")
+
+        # The next sync changes both pages but fails after the first one
+        service.fal_client = FakeFal([[model("a", "A v2")], [model("b", "B v2")]], fail_after=1)
+        try:
+            await service._refresh("token")
+        except Exception:
+            pass
+
+        # A cold worker loading the stamped version gets its original content
+        cold = CatalogService(redis_service)
+        stamp = await cold._stamp()
+        loaded = await cold._load_full(stamp["version"])
+        return first, loaded
+
+    first, loaded = asyncio.run(scenario())
+    assert loaded.version == first.version
+    assert loaded.models == first.models
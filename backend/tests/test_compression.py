@@ -0,0 +1,23 @@
+import asyncio
+import gzip
+
+from app.core import compression
+from app.core.compression import EncodedBody
+
+
+def test_concurrent_requests_share_one_compression(monkeypatch):
+    calls = []
+
+    def encode(data):
+        calls.append(data)
+        return gzip.compress(data, mtime=0)
+
+    monkeypatch.setitem(compression.ENCODERS, "gzip", encode)
+    body = EncodedBody(b"x" * 4096)
+
+    async def scenario():
+        return await asyncio.gather(*(body.get("gzip") for _ in range(5)))
+
+    variants = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(gzip.decompress(variant) == body.raw for variant in variants)
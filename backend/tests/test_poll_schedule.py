@@ -0,0 +1,19 @@
+import asyncio
+
+from app.core.config import get_settings
+from app.services.poll_schedule import LatencyTracker
+
+settings = get_settings()
+
+
+def test_concurrent_samples_are_all_recorded_with_a_ttl(redis_service):
+    tracker = LatencyTracker(redis_service)
+
+    async def scenario():
+        await asyncio.gather(*(tracker.record("fal-ai/flux/dev", 8.0) for _ in range(10)))
+        key = tracker._key("fal-ai/flux/dev")
+        return await redis_service.get(key), await redis_service.redis.ttl(key)
+
+    stats, ttl = asyncio.run(scenario())
+    assert stats == {"ewma": 8.0, "count": 10}
+    assert 0 < ttl <= settings.STATUS_POLL_LATENCY_TTL
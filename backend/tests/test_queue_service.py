@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+
+from app.core.config import get_settings
+from app.services.queue_service import QueueService
+from app.services.redis import RedisService
+from app.workers import tasks
+
+settings = get_settings()
+
+
+@pytest.fixture
+def queue(redis_service, monkeypatch):
+    """
+    QueueService on fakeredis, with workers' own connections sharing it
+
+    Tests call setup() inside their event loop (clients bind to the first one)
+    """
+    async def connect(self):
+        self.redis, self.binary = redis_service.redis, redis_service.binary
+
+    async def disconnect(self):
+        pass
+
+    monkeypatch.setattr(RedisService, "connect", connect)
+    monkeypatch.setattr(RedisService, "disconnect", disconnect)
+    monkeypatch.setattr(settings, "QUEUE_RECLAIM_IDLE", 0.2)
+    return QueueService(redis_service)
+
+
+def test_unacknowledged_entry_is_reclaimed(queue):
+    async def scenario():
+        await queue.setup()
+        await queue.enqueue("req-1")
+        taken = await queue.dequeue(5, 0.1)
+        assert [request_id for _, request_id in taken] == ["req-1"]
+        # Nothing to reclaim while the entry is fresh
+        assert await queue.reclaim(5) == []
+
+        # The dispatcher or worker dies: the entry keeps its slot...
+        await asyncio.sleep(0.3)
+        assert await queue.active_count() == 1
+        # ...until it is reclaimed for re-dispatch
+        reclaimed = await queue.reclaim(5)
+        assert reclaimed == taken
+
+        # Completing it frees the slot for good
+        await queue.mark_complete("req-1", taken[0][0])
+        await asyncio.sleep(0.3)
+        return await queue.reclaim(5), await queue.get_metrics()
+
+    reclaimed, metrics = asyncio.run(scenario())
+    assert reclaimed == []
+    assert metrics["active"] == 0 and metrics["queued"] == 0
+
+
+def test_touched_entry_is_not_reclaimed(queue):
+    async def scenario():
+        await queue.setup()
+        await queue.enqueue("req-1")
+        (entry_id, _), = await queue.dequeue(5, 0.1)
+        await asyncio.sleep(0.3)
+        await queue.touch(entry_id)
+        return await queue.reclaim(5)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_missing_record_is_dropped_from_queue(queue):
+    async def scenario():
+        await queue.setup()
+        await queue.enqueue("gone")
+        (entry_id, _), = await queue.dequeue(5, 0.1)
+        result = await tasks._process_generation_async("gone", entry_id)
+        await asyncio.sleep(0.3)
+        return result, await queue.active_count(), await queue.reclaim(5)
+
+    result, active, reclaimed = asyncio.run(scenario())
+    assert result is None
+    assert active == 0
+    assert reclaimed == []
+
+
+def test_mark_failed_releases_entry_without_record(queue):
+    async def scenario():
+        await queue.setup()
+        await queue.enqueue("gone")
+        (entry_id, _), = await queue.dequeue(5, 0.1)
+        await tasks._mark_failed("gone", entry_id, "boom")
+        await asyncio.sleep(0.3)
+        return await queue.active_count(), await queue.reclaim(5)
+
+    active, reclaimed = asyncio.run(scenario())
+    assert active == 0
+    assert reclaimed == []
+
+
+def test_failed_attempt_keeps_entry_until_retries_are_exhausted(queue, monkeypatch):
+    class Retry(Exception):
+        pass
+
+    async def fail(request_id, entry_id):
+        raise RuntimeError("fal.ai unavailable")
+
+    monkeypatch.setattr(tasks, "_process_generation_async", fail)
+    monkeypatch.setattr(tasks.process_generation, "retry", lambda exc, countdown: Retry())
+
+    async def dispatch():
+        await queue.setup()
+        await queue.enqueue("req-1")
+        (entry_id, _), = await queue.dequeue(5, 0.1)
+        return entry_id
+
+    # The task runs on the worker's own loop, so the whole test does too
+    entry_id = tasks._run(dispatch())
+
+    tasks.process_generation.push_request(retries=0)
+    try:
+        with pytest.raises(Retry):
+            tasks.process_generation.run("req-1", entry_id)
+    finally:
+        tasks.process_generation.pop_request()
+    assert tasks._run(queue.active_count()) == 1
+
+    tasks.process_generation.push_request(retries=tasks.process_generation.max_retries)
+    try:
+        with pytest.raises(RuntimeError):
+            tasks.process_generation.run("req-1", entry_id)
+    finally:
+        tasks.process_generation.pop_request()
+    assert tasks._run(queue.active_count()) == 0
@@ -0,0 +1,53 @@
+import asyncio
+import hashlib
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware.rate_limiter import RateLimitMiddleware
+from app.services.rate_limit import RateLimiter
+
+
+def build_app(redis_service):
+    async def ping(request):
+        return PlainTextResponse("pong")
+
+    app = Starlette(routes=[Route("/api/v1/ping", ping)])
+    app.add_middleware(RateLimitMiddleware)
+    app.state.rate_limiter = RateLimiter(redis_service)
+    return app
+
+
+def limit_for(redis_service, headers):
+    async def scenario():
+        transport = httpx.ASGITransport(app=build_app(redis_service))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await redis_service.redis.hset(RateLimiter.TIERS_KEY, mapping={
+                "user:alice": "pro",
+                f"key:{hashlib.sha256(b'secret').hexdigest()}": "pro",
+            })
+            response = await client.get("/api/v1/ping", headers=headers)
+        return int(response.headers["x-ratelimit-limit"])
+
+    return asyncio.run(scenario())
+
+
+def test_api_key_gets_its_tier(redis_service):
+    assert limit_for(redis_service, {"Authorization": "Bearer secret"}) == 600
+
+
+def test_unauthenticated_user_header_gets_default_rate(redis_service):
+    assert limit_for(redis_service, {"X-User-ID": "alice"}) == 60
+
+
+def test_default_burst_allows_a_minute_of_requests(redis_service):
+    async def scenario():
+        transport = httpx.ASGITransport(app=build_app(redis_service))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.get("/api/v1/ping")).status_code for _ in range(61)]
+
+    statuses = asyncio.run(scenario())
+    assert statuses[:60] == [200] * 60
+    assert statuses[60] == 429
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.middleware.cache import CacheMiddleware
+from app.services.response_cache import ResponseCache
+
+
+def build_app(redis_service, release: asyncio.Event):
+    """
+    Catalog-like route whose v1 render is held until `release` is set
+
+    Returns the app and the catalog stand-in, whose version tests can bump
+    """
+    catalog = SimpleNamespace(version=1)
+
+    async def get_catalog():
+        return catalog
+
+    async def models(request):
+        version = catalog.version
+        if version == 1:
+            await release.wait()
+        return Response(
+            f"v{version}".encode(),
+            headers={
+                "Cache-Control": "public, max-age=60, s-maxage=300",
+                "Surrogate-Key": f"catalog catalog-v{version}",
+            }
+        )
+
+    app = Starlette(routes=[Route("/api/v1/models", models)])
+    app.add_middleware(CacheMiddleware, cacheable_paths=["/api/v1/models"], catalog_paths=["/api/v1/models"])
+    app.state.catalog = SimpleNamespace(get_catalog=get_catalog)
+    app.state.response_cache = ResponseCache(redis_service)
+    return app, catalog
+
+
+def test_stale_store_after_invalidation_is_not_served(redis_service):
+    async def scenario():
+        release = asyncio.Event()
+        app, catalog = build_app(redis_service, release)
+        cache = app.state.response_cache
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # A v1 render is in flight when the catalog moves to v2 and is invalidated
+            slow = asyncio.create_task(client.get("/api/v1/models"))
+            await asyncio.sleep(0.05)
+            catalog.version = 2
+            await cache.invalidate([ResponseCache.CATALOG_TAG])
+
+            # ...and its response is stored only afterwards
+            release.set()
+            stale = await slow
+            assert stale.text == "v1"
+            assert stale.headers["x-cache"] == "MISS"
+
+            first = await client.get("/api/v1/models")
+            second = await client.get("/api/v1/models")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert (first.text, first.headers["x-cache"]) == ("v2", "MISS")
+    assert (second.text, second.headers["x-cache"]) == ("v2", "HIT")
+
+
+def test_catalog_event_drops_tagged_entries(redis_service):
+    async def scenario():
+        release = asyncio.Event()
+        release.set()
+        app, _ = build_app(redis_service, release)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/api/v1/models")
+            stored = await redis_service.binary.keys(f"{ResponseCache.KEY_PREFIX}v1:*")
+            deleted = await app.state.response_cache.invalidate([ResponseCache.CATALOG_TAG])
+            remaining = await redis_service.binary.keys(f"{ResponseCache.KEY_PREFIX}v1:*")
+        return stored, deleted, remaining
+
+    stored, deleted, remaining = asyncio.run(scenario())
+    assert len(stored) == 1
+    assert deleted == 1
+    assert remaining == []
@@ -0,0 +1,77 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import generate
+from app.services.events import EventHub
+from app.services.generation_store import GenerationStore
+
+
+def test_malformed_messages_get_an_error_and_keep_the_connection(redis_service):
+    app = FastAPI()
+    app.include_router(generate.router)
+    app.state.redis = redis_service
+    app.state.events = EventHub(redis_service)
+
+    with TestClient(app).websocket_connect("/status/ws") as websocket:
+        replies = []
+        for message in ("not json", "[1, 2]", '{"action": "watch", "request_ids": "req_1"}'):
+            websocket.send_text(message)
+            replies.append(websocket.receive_json())
+        websocket.send_bytes(b"\x00")
+        replies.append(websocket.receive_json())
+
+        # Still serving requests
+        websocket.send_json({"action": "watch", "request_ids": ["req_missing"]})
+        reply = websocket.receive_json()
+
+    assert [r["type"] for r in replies] == ["error"] * 4
+    assert reply == {"type": "error", "request_id": "req_missing", "message": "Request 'req_missing' not found"}
+
+
+def record(request_id, status, step=0):
+    return {
+        "request_id": request_id,
+        "model_id": "fal-ai/flux/dev",
+        "prompt": "a cat",
+        "parameters": {},
+        "status": status,
+        "created_at": "2026-01-01T00:00:00",
+        "queue_position": step,
+    }
+
+
+def test_terminal_record_survives_a_flood_of_updates(redis_service):
+    app = FastAPI()
+    app.include_router(generate.router)
+    app.state.redis = redis_service
+    app.state.events = events = EventHub(redis_service)
+    flood = 3 * EventHub.QUEUE_SIZE
+
+    @app.post("/flood")
+    async def publish_burst():
+        # Delivered back to back, before the WebSocket sender can drain any
+        for step in range(flood):
+            events._dispatch(record("req_busy", "processing", step))
+            if step == 10:
+                events._dispatch(record("req_done", "completed"))
+        events._dispatch(record("req_last", "processing"))
+        return {}
+
+    with TestClient(app) as client:
+        store = GenerationStore(redis_service)
+        client.portal.call(store.save, record("req_busy", "queued"))
+        client.portal.call(store.save, record("req_done", "queued"))
+        client.portal.call(store.save, record("req_last", "queued"))
+
+        with client.websocket_connect("/status/ws") as websocket:
+            websocket.send_json({"action": "watch", "request_ids": ["req_busy", "req_done", "req_last"]})
+            initial = [websocket.receive_json()["data"]["request_id"] for _ in range(3)]
+            client.post("/flood")
+
+            # req_last's update is the final one delivered either way
+            received = []
+            while not received or received[-1]["request_id"] != "req_last":
+                received.append(websocket.receive_json()["data"])
+
+    assert sorted(initial) == ["req_busy", "req_done", "req_last"]
+    assert ("req_done", "completed") in {(r["request_id"], r["status"]) for r in received}
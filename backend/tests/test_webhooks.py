@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.routes import webhooks
+from app.core.config import get_settings
+from app.services.generation_store import GenerationStore
+
+settings = get_settings()
+
+
+def post_webhook(redis_service, payload, setup=None):
+    app = FastAPI()
+    app.include_router(webhooks.router)
+    app.state.redis = redis_service
+
+    async def scenario():
+        if setup:
+            await setup()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/webhooks/fal", content=json.dumps(payload))
+
+    return asyncio.run(scenario())
+
+
+def test_unknown_fal_request_is_retried(redis_service, monkeypatch):
+    monkeypatch.setattr(settings, "FAL_WEBHOOK_VERIFY", False)
+    response = post_webhook(redis_service, {"request_id": "fal-1", "status": "OK", "payload": {}})
+    assert response.status_code == 404
+
+
+def test_linked_fal_request_is_accepted(redis_service, monkeypatch):
+    monkeypatch.setattr(settings, "FAL_WEBHOOK_VERIFY", False)
+    store = GenerationStore(redis_service)
+
+    async def setup():
+        await store.save({
+            "request_id": "req-1",
+            "model_id": "fal-ai/flux/dev",
+            "status": "queued",
+            "created_at": "2026-01-01T00:00:00",
+        })
+        await store.link_fal_request("fal-1", "req-1")
+
+    response = post_webhook(redis_service, {"request_id": "fal-1", "status": "OK", "payload": {"images": []}}, setup)
+    assert response.status_code == 200
+    assert response.json() == {"status": "accepted"}
@@ -4,10 +4,10 @@ import { useState, useEffect } from "react"
 import { ArrowRight, Loader2 } from "lucide-react"
 import { Button } from "@/components/ui/button"
 import Link from "next/link"
-import { getModels, type Model } from "@/lib/api"
+import { getModelSummaries, type ModelSummary } from "@/lib/api"
 
 export function ModelsSection() {
-  const [models, setModels] = useState<Model[]>([])
+  const [models, setModels] = useState<ModelSummary[]>([])
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
@@ -15,7 +15,7 @@ export function ModelsSection() {
       try {
         setLoading(true)
         // Fetch pinned/featured models first, then other popular ones
-        const { models: allModels } = await getModels(4, 0)
+        const { models: allModels } = await getModelSummaries(4, 0)
         setModels(allModels.slice(0, 4))
       } catch (error) {
         console.error("Failed to fetch models:", error)
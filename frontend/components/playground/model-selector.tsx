@@ -1,9 +1,9 @@
 "use client"
 
 import { useState, useEffect } from "react"
-import { ChevronDown, ImageIcon, Video, AudioLines, Box, Loader2 } from "lucide-react"
+import { ChevronDown, ImageIcon, Video, AudioLines, Box, Loader2, Search } from "lucide-react"
 import { cn } from "@/lib/utils"
-import { getCategories, getModels, type Model } from "@/lib/api"
+import { getCategories, getModelSummaries, suggestModels, type ModelSummary, type ModelSuggestion } from "@/lib/api"
 
 const categoryIcons: Record<string, any> = {
   "text-to-image": ImageIcon,
@@ -25,9 +25,11 @@ export function ModelSelector({ selectedModel, onSelectModel }: ModelSelectorPro
   const [isOpen, setIsOpen] = useState(false)
   const [activeCategory, setActiveCategory] = useState<string | null>(null)
   const [categories, setCategories] = useState<string[]>([])
-  const [modelsByCategory, setModelsByCategory] = useState<Record<string, Model[]>>({})
+  const [modelsByCategory, setModelsByCategory] = useState<Record<string, ModelSummary[]>>({})
   const [loading, setLoading] = useState(true)
-  const [selectedModelData, setSelectedModelData] = useState<Model | null>(null)
+  const [selectedModelData, setSelectedModelData] = useState<ModelSummary | null>(null)
+  const [query, setQuery] = useState("")
+  const [suggestions, setSuggestions] = useState<ModelSuggestion[]>([])
 
   // Fetch categories and models on mount
   useEffect(() => {
@@ -41,10 +43,10 @@ export function ModelSelector({ selectedModel, onSelectModel }: ModelSelectorPro
           setActiveCategory(cats[0])
 
           // Fetch models for each category
-          const byCategory: Record<string, Model[]> = {}
+          const byCategory: Record<string, ModelSummary[]> = {}
           for (const cat of cats) {
             try {
-              const { models } = await getModels(50, 0, cat)
+              const { models } = await getModelSummaries(50, 0, cat)
               byCategory[cat] = models
             } catch (error) {
               console.error(`Failed to fetch models for ${cat}:`, error)
@@ -64,9 +66,26 @@ export function ModelSelector({ selectedModel, onSelectModel }: ModelSelectorPro
     fetchData()
   }, [])
 
+  // Typeahead: one in-memory lookup per keystroke, stale requests are aborted
+  useEffect(() => {
+    const prefix = query.trim()
+    if (!prefix) {
+      setSuggestions([])
+      return
+    }
+
+    const controller = new AbortController()
+    suggestModels(prefix, 8, controller.signal)
+      .then(({ suggestions }) => setSuggestions(suggestions))
+      .catch((error) => {
+        if (error.name !== "AbortError") console.error("Failed to fetch suggestions:", error)
+      })
+    return () => controller.abort()
+  }, [query])
+
   // Update selected model data when selectedModel changes
   useEffect(() => {
-    const findModel = (): Model | null => {
+    const findModel = (): ModelSummary | null => {
       for (const models of Object.values(modelsByCategory)) {
         const model = models.find((m) => m.endpoint_id === selectedModel)
         if (model) return model
@@ -100,63 +119,109 @@ export function ModelSelector({ selectedModel, onSelectModel }: ModelSelectorPro
             </div>
           ) : (
             <>
-              {/* Category tabs */}
-              <div className="flex border-b-4 border-foreground overflow-x-auto">
-                {categories.map((category) => {
-                  const Icon = categoryIcons[category] || Box
-                  return (
-                    <button
-                      key={category}
-                      onClick={() => setActiveCategory(category)}
-                      className={cn(
-                        "flex-shrink-0 flex items-center justify-center gap-1 p-3 text-xs font-bold transition-colors",
-                        activeCategory === category
-                          ? "bg-primary text-primary-foreground"
-                          : "hover:bg-muted",
-                      )}
-                      title={category}
-                    >
-                      <Icon className="w-4 h-4" />
-                      <span className="hidden sm:inline line-clamp-1">{category}</span>
-                    </button>
-                  )
-                })}
+              {/* Typeahead */}
+              <div className="relative border-b-4 border-foreground">
+                <Search className="absolute left-3 top-3 w-4 h-4 text-muted-foreground" />
+                <input
+                  type="text"
+                  placeholder="Search models..."
+                  value={query}
+                  onChange={(e) => setQuery(e.target.value)}
+                  className="w-full pl-9 pr-3 py-2 bg-card text-sm focus:outline-none"
+                  autoFocus
+                />
               </div>
 
-              {/* Model list */}
-              <div className="flex-1 p-2 overflow-y-auto">
-                {activeCategory && modelsByCategory[activeCategory]?.length > 0 ? (
-                  modelsByCategory[activeCategory].map((model) => (
-                    <button
-                      key={model.endpoint_id}
-                      onClick={() => {
-                        onSelectModel(model.endpoint_id)
-                        setIsOpen(false)
-                      }}
-                      className={cn(
-                        "w-full flex items-center justify-between gap-2 p-3 text-left transition-colors text-sm",
-                        selectedModel === model.endpoint_id
-                          ? "bg-primary/20 border-l-4 border-primary"
-                          : "hover:bg-muted",
-                      )}
-                    >
-                      <div className="flex-1 min-w-0">
-                        <div className="font-medium truncate">{model.metadata.display_name}</div>
-                        <div className="text-xs text-muted-foreground truncate">{model.endpoint_id}</div>
+              {query.trim() ? (
+                <div className="flex-1 p-2 overflow-y-auto">
+                  {suggestions.length > 0 ? (
+                    suggestions.map((suggestion) => (
+                      <button
+                        key={suggestion.endpoint_id}
+                        onClick={() => {
+                          onSelectModel(suggestion.endpoint_id)
+                          setQuery("")
+                          setIsOpen(false)
+                        }}
+                        className={cn(
+                          "w-full flex items-center justify-between gap-2 p-3 text-left transition-colors text-sm",
+                          selectedModel === suggestion.endpoint_id
+                            ? "bg-primary/20 border-l-4 border-primary"
+                            : "hover:bg-muted",
+                        )}
+                      >
+                        <div className="flex-1 min-w-0">
+                          <div className="font-medium truncate">{suggestion.display_name}</div>
+                          <div className="text-xs text-muted-foreground truncate">{suggestion.endpoint_id}</div>
+                        </div>
+                        <span className="text-xs text-muted-foreground flex-shrink-0">{suggestion.category}</span>
+                      </button>
+                    ))
+                  ) : (
+                    <div className="p-4 text-center text-sm text-muted-foreground">No matching models</div>
+                  )}
+                </div>
+              ) : (
+                <>
+                  {/* Category tabs */}
+                  <div className="flex border-b-4 border-foreground overflow-x-auto">
+                    {categories.map((category) => {
+                      const Icon = categoryIcons[category] || Box
+                      return (
+                        <button
+                          key={category}
+                          onClick={() => setActiveCategory(category)}
+                          className={cn(
+                            "flex-shrink-0 flex items-center justify-center gap-1 p-3 text-xs font-bold transition-colors",
+                            activeCategory === category
+                              ? "bg-primary text-primary-foreground"
+                              : "hover:bg-muted",
+                          )}
+                          title={category}
+                        >
+                          <Icon className="w-4 h-4" />
+                          <span className="hidden sm:inline line-clamp-1">{category}</span>
+                        </button>
+                      )
+                    })}
+                  </div>
+
+                  {/* Model list */}
+                  <div className="flex-1 p-2 overflow-y-auto">
+                    {activeCategory && modelsByCategory[activeCategory]?.length > 0 ? (
+                      modelsByCategory[activeCategory].map((model) => (
+                        <button
+                          key={model.endpoint_id}
+                          onClick={() => {
+                            onSelectModel(model.endpoint_id)
+                            setIsOpen(false)
+                          }}
+                          className={cn(
+                            "w-full flex items-center justify-between gap-2 p-3 text-left transition-colors text-sm",
+                            selectedModel === model.endpoint_id
+                              ? "bg-primary/20 border-l-4 border-primary"
+                              : "hover:bg-muted",
+                          )}
+                        >
+                          <div className="flex-1 min-w-0">
+                            <div className="font-medium truncate">{model.metadata.display_name}</div>
+                            <div className="text-xs text-muted-foreground truncate">{model.endpoint_id}</div>
+                          </div>
+                          {model.metadata.pinned && (
+                            <span className="px-2 py-0.5 bg-secondary text-secondary-foreground text-xs font-bold flex-shrink-0">
+                              ★
+                            </span>
+                          )}
+                        </button>
+                      ))
+                    ) : (
+                      <div className="p-4 text-center text-sm text-muted-foreground">
+                        No models available
                       </div>
-                      {model.metadata.pinned && (
-                        <span className="px-2 py-0.5 bg-secondary text-secondary-foreground text-xs font-bold flex-shrink-0">
-                          ★
-                        </span>
-                      )}
-                    </button>
-                  ))
-                ) : (
-                  <div className="p-4 text-center text-sm text-muted-foreground">
-                    No models available
+                    )}
                   </div>
-                )}
-              </div>
+                </>
+              )}
             </>
           )}
         </div>
@@ -22,6 +22,13 @@ export interface Model {
   }
 }
 
+// Compact model returned by /models?view=lite (grid and selector views);
+// pinned drives their "pinned" badge
+export interface ModelSummary {
+  endpoint_id: string
+  metadata: Pick<Model["metadata"], "display_name" | "category" | "thumbnail_url" | "pinned">
+}
+
 export interface GenerationRequest {
   model_id: string
   prompt: string
@@ -83,6 +90,28 @@ export async function getModels(limit = 50, skip = 0, category?: string): Promis
   }
 }
 
+export async function getModelSummaries(limit = 50, skip = 0, category?: string): Promise<{
+  models: ModelSummary[]
+  total: number
+  next_cursor: string | null
+}> {
+  try {
+    const params = new URLSearchParams({
+      limit: limit.toString(),
+      skip: skip.toString(),
+      view: "lite",
+      ...(category && { category }),
+    })
+
+    const response = await fetch(`${API_BASE_URL}/models?${params}`)
+    if (!response.ok) throw new Error(`HTTP ${response.status}`)
+    return await response.json()
+  } catch (error) {
+    console.error("Failed to fetch models:", error)
+    throw error
+  }
+}
+
 export async function searchModels(query: string, limit = 20): Promise<{
   models: Model[]
   total: number
@@ -103,6 +132,29 @@ export async function searchModels(query: string, limit = 20): Promise<{
   }
 }
 
+export interface ModelSuggestion {
+  endpoint_id: string
+  display_name: string
+  category: string
+  match: string
+  kind: "endpoint_id" | "display_name" | "endpoint_suffix" | "name_suffix" | "tag"
+}
+
+export async function suggestModels(prefix: string, limit = 8, signal?: AbortSignal): Promise<{
+  suggestions: ModelSuggestion[]
+  total: number
+  prefix: string
+}> {
+  const params = new URLSearchParams({
+    prefix,
+    limit: limit.toString(),
+  })
+
+  const response = await fetch(`${API_BASE_URL}/models/suggest?${params}`, { signal })
+  if (!response.ok) throw new Error(`HTTP ${response.status}`)
+  return await response.json()
+}
+
 export async function getCategories(): Promise<{
   categories: string[]
   total: number
@@ -202,7 +254,36 @@ export async function getGenerationStatus(requestId: string): Promise<Generation
   }
 }
 
-// Polling utility
+// Server-sent events stream of status updates (resolves on completion/failure)
+export function streamGenerationUntilComplete(
+  requestId: string,
+  maxWaitMs = 600000,
+): Promise<GenerationResponse> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE_URL}/status/${requestId}/stream`)
+    const timeout = setTimeout(() => {
+      source.close()
+      reject(new Error("Generation request timeout"))
+    }, maxWaitMs)
+
+    source.addEventListener("status", (event) => {
+      const status: GenerationResponse = JSON.parse((event as MessageEvent).data)
+      if (status.status === "completed" || status.status === "failed") {
+        clearTimeout(timeout)
+        source.close()
+        resolve(status)
+      }
+    })
+
+    source.onerror = () => {
+      clearTimeout(timeout)
+      source.close()
+      reject(new Error("Status stream error"))
+    }
+  })
+}
+
+// Polling utility (uses the status stream when available, falls back to polling)
 export async function pollGenerationUntilComplete(
   requestId: string,
   maxWaitMs = 600000,
@@ -210,6 +291,14 @@ export async function pollGenerationUntilComplete(
 ): Promise<GenerationResponse> {
   const startTime = Date.now()
 
+  if (typeof EventSource !== "undefined") {
+    try {
+      return await streamGenerationUntilComplete(requestId, maxWaitMs)
+    } catch (error) {
+      console.error("Status stream failed, falling back to polling:", error)
+    }
+  }
+
   while (Date.now() - startTime < maxWaitMs) {
     try {
       const status = await getGenerationStatus(requestId)